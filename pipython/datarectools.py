@@ -3,13 +3,28 @@
 """Tools for setting up and using the data recorder of a PI device."""
 
 from __future__ import print_function
-from logging import debug, warning
+from collections import OrderedDict
+from logging import debug, error, warning
+from threading import Event, Lock, Thread
 from time import sleep, time
 
+from pipython.gcsdata import ChainedSink
 from pipython.pitools import FrozenClass
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 __signature__ = 0x5b021be6068b79913c1270289282b79
 
+RESOLVEDSIZE = 256  # number of resolved option names that are remembered by getrecopt() and gettrigsources()
+RESOLVED = OrderedDict()  # {(enumclass, name): value}, least recently used first
+RESOLVEDLOCK = Lock()  # guards RESOLVED, getrecopt() and gettrigsources() can be called by several threads
+OPTINDEX = {}  # {enumclass: [(item, [(index, part)])]}, see __getoptindex()
+
+STREAMINTERVAL = 0.05  # seconds between two polls of the record tables in a continuous recording
+
 # seconds
 SERVOTIMES = {
     'C-413K011': 0.00003333333,
@@ -186,18 +201,35 @@ def __getopt(name, enumclass):
      @param enumclass : Class name that contains enums.
      @return : According enum value as integer.
      """
-    for item in dir(enumclass):
-        match = []
-        for i, itempart in enumerate(item.split('_')):
-            if itempart.isdigit():
-                continue
-            try:
-                namepart = name.split('_')[i]
-            except IndexError:
-                continue
-            match.append(__isabbreviation(namepart.upper(), itempart.upper()))
-        if all(match):
-            return getattr(enumclass, item)
+    key = (enumclass, name)
+    with RESOLVEDLOCK:
+        if key in RESOLVED:
+            RESOLVED[key] = RESOLVED.pop(key)
+            return RESOLVED[key]
+    nameparts = name.upper().split('_')
+    value = None
+    for item, itemparts in __getoptindex(enumclass):
+        if all(__isabbreviation(nameparts[i], itempart) for i, itempart in itemparts if i < len(nameparts)):
+            value = getattr(enumclass, item)
+            break
+    with RESOLVEDLOCK:
+        RESOLVED[key] = value
+        if len(RESOLVED) > RESOLVEDSIZE:
+            RESOLVED.popitem(last=False)
+    return value
+
+
+def __getoptindex(enumclass):
+    """Return list of (item, [(index, part)]) with the upper case name parts of the items of 'enumclass' that
+    are not digits, in the order of dir(enumclass). The list is built once per class.
+    @param enumclass : Class name that contains enums.
+    @return : List of tuples.
+    """
+    if enumclass not in OPTINDEX:
+        OPTINDEX[enumclass] = [
+            (item, [(i, part.upper()) for i, part in enumerate(item.split('_')) if not part.isdigit()])
+            for item in dir(enumclass)]
+    return OPTINDEX[enumclass]
 
 
 def __isabbreviation(abbrev, item):
@@ -208,11 +240,14 @@ def __isabbreviation(abbrev, item):
     """
     if not abbrev:
         return True
-    if not item:
-        return False
-    if abbrev[0] != item[0]:
+    if not item or abbrev[0] != item[0]:
         return False
-    return any(__isabbreviation(abbrev[1:], item[i + 1:]) for i in range(len(item)))
+    pos = 1
+    for char in abbrev[1:]:
+        pos = item.find(char, pos) + 1
+        if not pos:
+            return False
+    return True
 
 
 def getrecopt(name):
@@ -232,11 +267,13 @@ def gettrigsources(name):
 
 
 def getservotime(gcs):
-    """Return current servo cycle time in seconds as float.
+    """Return current servo cycle time in seconds as float. It is kept in gcs.capabilities.
     @type gcs : pipython.gcscommands.GCSCommands
     @return : Current servo cycle time in seconds as float.
     """
-    servotime = None
+    servotime = gcs.capabilities.get('servotime')
+    if servotime is not None:
+        return float(servotime)
     if gcs.devname in ['C-702.00']:
         servotime = SERVOTIMES[gcs.devname]
     if servotime is None:
@@ -246,15 +283,18 @@ def getservotime(gcs):
             servotime = SERVOTIMES[gcs.devname]
     if servotime is None:
         raise NotImplementedError('servo cycle time for %r is unknown' % gcs.devname)
+    gcs.capabilities = {'servotime': float(servotime)}
     return float(servotime)
 
 
 def getmaxnumvalues(gcs):  # 'getmaxnumvalues' is too complex (11) pylint: disable=C0901
-    """Return maximum possible number of data recorder values as integer.
+    """Return maximum possible number of data recorder values as integer. It is kept in gcs.capabilities.
     @type gcs : pipython.gcscommands.GCSCommands
     @return : Maximum possible number of data recorder values as integer.
     """
-    maxnumvalues = None
+    maxnumvalues = gcs.capabilities.get('maxnumvalues')
+    if maxnumvalues:
+        return int(maxnumvalues)
     if gcs.devname in ['C-702.00']:
         maxnumvalues = MAXNUMVALUES[gcs.devname]
     if not maxnumvalues:
@@ -279,6 +319,7 @@ def getmaxnumvalues(gcs):  # 'getmaxnumvalues' is too complex (11) pylint: disab
             maxnumvalues = MAXNUMVALUES[gcs.devname]
     if not maxnumvalues:
         raise NotImplementedError('maximum number of data recorder values for %r is unknown' % gcs.devname)
+    gcs.capabilities = {'maxnumvalues': int(maxnumvalues)}
     return maxnumvalues
 
 
@@ -302,6 +343,8 @@ class Datarecorder(FrozenClass):
             'options': None,
             'trigsources': None,
             'rectables': [],
+            'timescale': None,
+            'verified': False,
         }
         self._freeze()
 
@@ -318,6 +361,7 @@ class Datarecorder(FrozenClass):
         """Set current servo cycle time in seconds as float."""
         value = float(value)
         self.__cfg['servotime'] = value
+        self.__cfg['timescale'] = None
         debug('Datarecorder.servotime set to %g secs', self.__cfg['servotime'])
 
     @property
@@ -334,6 +378,7 @@ class Datarecorder(FrozenClass):
         if value > self.maxnumvalues:
             raise ValueError('%d exceeds the maximum number of data recorder values %d' % (value, self.maxnumvalues))
         self.__cfg['numvalues'] = value
+        self.__cfg['timescale'] = None
         debug('Datarecorder.numvalues: set to %d', self.__cfg['numvalues'])
 
     @property
@@ -381,12 +426,15 @@ class Datarecorder(FrozenClass):
     def samplerate(self, value):
         """Set current sampling rate to 'value' in multiples of servo cycle time as integer."""
         value = max(1, int(value))
-        if self.__gcs.HasRTR():
+        if value == self.__cfg['samplerate']:
+            debug('Datarecorder.samplerate: is %d servo cycles already', value)
+        elif self.__gcs.HasRTR():
             self.__gcs.RTR(value)
             self.__cfg['samplerate'] = value
         else:
             warning('device %r does not support the RTR command', self.__gcs.devname)
             self.__cfg['samplerate'] = 1
+        self.__cfg['timescale'] = None
         debug('Datarecorder.samplerate: set to %d servo cycles', self.__cfg['samplerate'])
 
     @property
@@ -527,42 +575,109 @@ class Datarecorder(FrozenClass):
             debug('Datarecorder.wait: wait %.2f secs for data recording', waittime)
             sleep(waittime)
 
-    def read(self, offset=None, numvalues=None, verbose=False):
-        """Read out the data and return it.
+    def __getdrr(self, offset, numvalues):
+        """Return the DRR? command to read out the data.
         @param offset : Start point in the table as integer, starts with index 1, overwrites self.offset.
         @param numvalues : Number of points to be read per table as integer, overwrites self.numvalues.
-        @param verbose : If True print a line that shows how many values have been read out already.
-        @return : Tuple of (header, data), see qDRR command.
+        @return : Tuple of (command string, number of values).
         """
         if not self.rectables:
             raise SystemError('rectables are not set')
-        header = self.__gcs.qDRR(self.rectables, offset or self.offset, numvalues or self.numvalues)
-        while self.__gcs.bufstate is not True:
-            if verbose:
-                print(('\rread data {:.1f}%...'.format(self.__gcs.bufstate * 100)), end='')
-                sleep(0.05)
+        offset = offset or self.offset
+        numvalues = numvalues or self.numvalues
+        tables = ' '.join([str(table) for table in self.rectables])
+        return 'DRR? %d %d %s' % (offset, numvalues, tables), numvalues
+
+    # Too many arguments (6/5) pylint: disable=R0913
+    def read(self, offset=None, numvalues=None, verbose=False, sink=None, withtime=False):
+        """Read out the data and return it.
+        @param offset : Start point in the table as integer, starts with index 1, overwrites self.offset.
+        @param numvalues : Number of points to be read per table as integer, overwrites self.numvalues.
+        @param verbose : If True print a line that shows how many values have been read out already.
+        @param sink : Object that gets the data while it is read instead of keeping it in memory, e.g.
+        pipython.gcsdata.NpyFileSink or pipython.gcsdata.filesink(filename) or the reducers of pipython.gcsreducers.
+        @param withtime : If True return data as numpy structured array with one record per point, see
+        self.addtimescale(). Requires numpy, is ignored if 'sink' is given.
+        @return : Tuple of (header, data), see qDRR command. If 'sink' is given then data is 'sink'.
+        """
+        cmdstr, numvalues = self.__getdrr(offset, numvalues)
+        transfer = self.__gcs.submit_gcsdata(cmdstr, numvalues, sink)
+        transfer.waitheader()
+        header = transfer.header
+        while not transfer.wait(0.05 if verbose else None):
+            print(('\rread data {:.1f}%...'.format((transfer.progress or 0) * 100)), end='')
         if verbose:
             print(('\r%s\r' % (' ' * 20)), end='')
-        data = self.__gcs.bufdata
+        if transfer.error is not None:
+            raise transfer.error
+        data = transfer.data if sink is None else sink
+        if withtime and sink is None:
+            data = self.addtimescale(header, data, offset or self.offset)
         return header, data
 
-    def getdata(self, timeout=0, offset=None, numvalues=None):
+    def addtimescale(self, header, data, offset=1):
+        """Return 'data' as numpy structured array with one record per point. The first field "time" holds
+        self.timescale, the other fields are named like the record tables in 'header' or "table<n>".
+        @param header : Header information from qDRR() as dictionary.
+        @param data : Datarecorder data as list of columns or 2-dimensional numpy array with one row per column.
+        @param offset : Start point of 'data' in the table as integer, starts with index 1.
+        @return : Numpy structured array.
+        """
+        if numpy is None:
+            raise ImportError('numpy is required for data with time scale')
+        names = ['time']
+        for i in range(len(data)):
+            name = str(header.get('NAME%d' % i, 'table%d' % (i + 1)))
+            names.append(name if name not in names else 'table%d' % (i + 1))
+        numpoints = len(data[0]) if len(data) else 0
+        records = numpy.empty(numpoints, dtype=[(name, numpy.float64) for name in names])
+        timescale = self.timescale[offset - 1:offset - 1 + numpoints]
+        if len(timescale) < numpoints:
+            timescale = numpy.arange(offset - 1, offset - 1 + numpoints, dtype=numpy.float64) * (1. / self.samplerate)
+        records['time'] = timescale
+        for name, column in zip(names[1:], data):
+            records[name] = column
+        return records
+
+    def iterdata(self, offset=None, numvalues=None, blocksize=4096):
+        """Read out the data and iterate over it in blocks of rows while it is read.
+        @param offset : Start point in the table as integer, starts with index 1, overwrites self.offset.
+        @param numvalues : Number of points to be read per table as integer, overwrites self.numvalues.
+        @param blocksize : Number of rows per block as integer, only the last block can be smaller.
+        @return : Iterator over the blocks, its "header" attribute is the header, see GCSCommands.iter_gcsdata().
+        """
+        cmdstr, numvalues = self.__getdrr(offset, numvalues)
+        return self.__gcs.iter_gcsdata(cmdstr, blocksize, numvalues)
+
+    # Too many arguments (6/5) pylint: disable=R0913
+    def getdata(self, timeout=0, offset=None, numvalues=None, sink=None, withtime=False):
         """Wait for end of data recording, start reading out the data and return the data.
         @param timeout : Timeout in seconds, is disabled by default.
         @param offset : Start point in the table as integer, starts with index 1, overwrites self.offset.
         @param numvalues : Number of points to be read per table as integer, overwrites self.numvalues.
+        @param sink : Object that gets the data while it is read instead of keeping it in memory, see self.read().
+        @param withtime : If True return data as numpy structured array with time scale, see self.read().
         @return : Tuple of (header, data), see qDRR command.
         """
         self.wait(timeout)
-        return self.read(offset, numvalues)
+        return self.read(offset, numvalues, sink=sink, withtime=withtime)
 
     def arm(self):
         """Ready the data recorder with given options and activate the trigger.
+        Only record tables whose configuration differs from gcs.recorderconfig are set, with one DRC command.
+        Tables that are not known yet are queried with qDRC first. On the first call and whenever
+        gcs.recorderconfig has been cleared, e.g. by a new connection, all record tables are queried with qDRC
+        and the sampling rate that has been set is checked with qRTR, since the device could have been changed
+        meanwhile. The trigger sources of all record tables are always set with one DRT command, since this
+        activates the trigger.
         If TriggerSources.NEXT_COMMAND_WITH_RESET_2 is used then the error check will be disabled.
         """
+        verify = not self.__cfg['verified'] or any(table not in self.__gcs.recorderconfig
+                                                   for table in self.rectables)
+        if verify:
+            self.__verifysamplerate()
         if self.__gcs.HasDRC():
-            for i in range(len(self.rectables)):
-                self.__gcs.DRC(self.rectables[i], self.sources[i], self.options[i])
+            self.__configure(verify)
         else:
             warning('device %r does not support the DRC command', self.__gcs.devname)
         if self.__gcs.HasDRT():
@@ -573,8 +688,7 @@ class Datarecorder(FrozenClass):
                     self.__gcs.errcheck = False
                 if len(self.trigsources) == 1:
                     self.trigsources = [self.trigsources[0]] * len(self.rectables)
-                for i in range(len(self.rectables)):
-                    self.__gcs.DRT(self.rectables[i], self.trigsources[i])
+                self.__gcs.DRT(self.rectables, self.trigsources)
             else:
                 if TriggerSources.NEXT_COMMAND_WITH_RESET_2 == self.trigsources:
                     errcheck = self.__gcs.errcheck
@@ -584,8 +698,201 @@ class Datarecorder(FrozenClass):
                 self.__gcs.errcheck = errcheck
         else:
             warning('device %r does not support the DRT command', self.__gcs.devname)
+        self.__cfg['verified'] = True
+
+    def __verifysamplerate(self):
+        """Set the sampling rate again if the device does not use the one that has been set or queried before."""
+        samplerate = self.__cfg['samplerate']
+        if samplerate is None or not self.__gcs.HasqRTR():
+            return
+        if self.__gcs.qRTR() != samplerate:
+            debug('Datarecorder.arm: sampling rate has changed on the device')
+            self.__cfg['samplerate'] = None
+            self.samplerate = samplerate
+
+    def __configure(self, verify):
+        """Set the record sources and options of the record tables that have changed with one DRC command.
+        @param verify : If True query all record tables with qDRC, else only those not in gcs.recorderconfig.
+        """
+        config = self.__gcs.recorderconfig
+        unknown = [table for table in self.rectables if verify or table not in config]
+        if unknown and self.__gcs.HasqDRC():
+            for table in unknown:
+                config.pop(table, None)
+            self.__gcs.qDRC(unknown)
+        changed = [i for i, table in enumerate(self.rectables)
+                   if config.get(table) != (str(self.sources[i]), int(self.options[i]))]
+        if not changed:
+            debug('Datarecorder.arm: record tables %r are configured already', self.rectables)
+            return
+        self.__gcs.DRC([self.rectables[i] for i in changed], [self.sources[i] for i in changed],
+                       [self.options[i] for i in changed])
+
+    def stream(self, sink=None, callback=None, interval=STREAMINTERVAL):
+        """Return a RecorderStream that reads the data while the recorder keeps running, see there.
+        Call self.arm() first. self.numvalues is the length of the ring buffer in the record tables.
+        @param sink : Object that gets the data, e.g. pipython.gcsdata.NpyFileSink, see self.read().
+        @param callback : Callable 'callback(block)' that gets each block of rows or None.
+        @param interval : Time between two polls of the record tables in seconds as float.
+        @return : Instance of RecorderStream.
+        """
+        return RecorderStream(self.__gcs, self.rectables, self.numvalues, self.samplefreq, sink, callback, interval)
 
     @property
     def timescale(self):
-        """Return list of values for time scale of recorded data."""
-        return [1. / self.samplerate * x for x in range(self.numvalues)]
+        """Return values for time scale of recorded data as read-only numpy array, or as list if numpy is not
+        installed. It is calculated once and again after samplerate, numvalues or servotime have been set.
+        """
+        if self.__cfg['timescale'] is None:
+            if numpy is None:
+                self.__cfg['timescale'] = [1. / self.samplerate * x for x in range(self.numvalues)]
+            else:
+                self.__cfg['timescale'] = numpy.arange(self.numvalues, dtype=numpy.float64) * (1. / self.samplerate)
+                self.__cfg['timescale'].flags.writeable = False
+        return self.__cfg['timescale']
+
+
+# Too many instance attributes pylint: disable=R0902
+class RecorderStream(object):
+    """Read the record tables in chunks while the data recorder keeps running, can be used as context manager.
+    The device must record cyclically, i.e. start again at the first point of the record tables when they
+    are full, and qDRL must return the number of points up to the current write position. Each poll queries
+    qDRL and reads the new points with qDRR, in two parts if the write position has wrapped around. The
+    chunks are passed to one sink and/or callback as a gapless stream. If more points than the length of the
+    record tables have been recorded since the previous poll until the end of reading, data may have been
+    overwritten before it was read and self.overruns is counted up.
+    """
+
+    # Too many arguments (8/5) pylint: disable=R0913
+    def __init__(self, gcs, rectables, numvalues, samplefreq, sink=None, callback=None, interval=STREAMINTERVAL):
+        """Read 'rectables' of 'gcs' continuously after self.start() or self.run() has been called.
+        @type gcs : pipython.gcscommands.GCSCommands
+        @param rectables : Record table IDs as list of integers.
+        @param numvalues : Length of the ring buffer of each record table as integer.
+        @param samplefreq : Sampling frequency in Hz as float.
+        @param sink : Object with methods start(header), write(block) and close(error) or None.
+        @param callback : Callable 'callback(block)' that gets each block of rows or None.
+        @param interval : Time between two polls of the record tables in seconds as float.
+        """
+        debug('create an instance of RecorderStream(gcs=%s, rectables=%r, numvalues=%r)', gcs, rectables, numvalues)
+        self.__gcs = gcs
+        self.__rectables = list(rectables)
+        self.__numvalues = int(numvalues)
+        self.__samplefreq = float(samplefreq)
+        self.__chain = ChainedSink(sink, callback)
+        self.interval = interval
+        self.readpos = 0
+        self.overruns = 0
+        self.error = None
+        self.__stats = {'rows': 0, 'time': 0., 'readtime': 0.}
+        self.__lastpoll = None
+        self.__stop = Event()
+        self.__thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __str__(self):
+        return 'RecorderStream(gcs=%s, rectables=%r)' % (self.__gcs, self.__rectables)
+
+    @property
+    def running(self):
+        """Return True if the background task is reading the record tables."""
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def report(self):
+        """Return dictionary {'rows': int, 'time': float, 'rowspersecond': float, 'readrate': float,
+        'samplefreq': float, 'overruns': int}. 'rowspersecond' is the rate of rows read per time of the stream,
+        'readrate' is the rate of rows per time spent in qDRR, i.e. the highest sampling frequency the link
+        can sustain with the current number of record tables.
+        """
+        stats = self.__stats
+        return {'rows': stats['rows'], 'time': stats['time'],
+                'rowspersecond': stats['rows'] / stats['time'] if stats['time'] else 0.,
+                'readrate': stats['rows'] / stats['readtime'] if stats['readtime'] else 0.,
+                'samplefreq': self.__samplefreq, 'overruns': self.overruns}
+
+    def start(self):
+        """Start the background task that reads the record tables."""
+        if self.running:
+            return
+        debug('RecorderStream.start()')
+        self.__stop.clear()
+        self.__thread = Thread(target=self.__run, name=str(self))
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """Read the remaining data, close the sink and wait until the background task has finished."""
+        debug('RecorderStream.stop()')
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def run(self, duration=None):
+        """Read the record tables until self.stop() is called or 'duration' has passed, then close the sink.
+        @param duration : Time in seconds as float or None to read until self.stop() is called.
+        """
+        starttime = time()
+        try:
+            while True:
+                self.poll()
+                self.__stats['time'] = time() - starttime
+                if duration is not None and self.__stats['time'] >= duration:
+                    break
+                if self.__stop.wait(self.interval):
+                    self.poll()
+                    break
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            self.__chain.finish(exc)
+            raise
+        else:
+            self.__chain.finish()
+        finally:
+            self.__stats['time'] = time() - starttime
+            debug('RecorderStream.run: %r', self.report)
+
+    def poll(self):
+        """Query the write position and read the points that have been recorded since the previous poll."""
+        now = time()
+        answer = self.__gcs.qDRL(self.__rectables)
+        level = min([answer[table] for table in self.__rectables])
+        if level >= self.readpos:
+            self.__read(self.readpos, level)
+        else:
+            self.__read(self.readpos, self.__numvalues)
+            self.__read(0, level)
+        self.readpos = level
+        if self.__lastpoll is not None and (time() - self.__lastpoll) * self.__samplefreq > self.__numvalues:
+            self.overruns += 1
+            warning('RecorderStream: data lost, the record tables have been overwritten while they were read')
+        self.__lastpoll = now
+
+    def __read(self, start, stop):
+        """Read the points 'start' + 1 to 'stop' of the record tables into the sink."""
+        numvalues = stop - start
+        if numvalues <= 0:
+            return
+        readtime = time()
+        tables = ' '.join([str(table) for table in self.__rectables])
+        transfer = self.__gcs.submit_gcsdata('DRR? %d %d %s' % (start + 1, numvalues, tables), numvalues,
+                                             self.__chain)
+        transfer.wait()
+        if transfer.error is not None:
+            raise transfer.error
+        self.__stats['rows'] += numvalues
+        self.__stats['readtime'] += time() - readtime
+
+    def __run(self):
+        """Call self.run() in the background task. Errors are logged and saved in self.error."""
+        try:
+            self.run()
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            error('RecorderStream: reading failed: %s', exc)
+            self.error = exc
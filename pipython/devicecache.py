@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Keep the capabilities of PI devices in a file to connect to them again without querying them."""
+
+import json
+import os
+from logging import debug, warning
+
+from pipython import GCSError
+from pipython.datarectools import getmaxnumvalues, getservotime
+
+__signature__ = 0x2f6b0c8e51d7a94e3b1c6f0d82a5e714
+
+DEVICECACHE = os.path.join(os.path.expanduser('~'), '.pipython', 'devicecache.json')
+
+
+class DeviceCache(object):
+    """Save GCSCommands.capabilities, i.e. devname, axes, supported functions (qHLP), servo cycle time and
+    maximum number of data recorder values, in a JSON file and restore them on the next connection. Entries
+    are identified by the qIDN answer, which contains the serial number and the firmware version, and by the
+    qVER answer if the device supports qVER. Use it after the device has been connected, e.g.
+        cache = DeviceCache()
+        pidevice.ConnectUSB(serialnum)
+        cache.load(pidevice)
+        ...
+        cache.save(pidevice)
+    Call self.forget() after parameters that are kept, e.g. the servo cycle time, have been changed.
+    """
+
+    def __init__(self, filename=DEVICECACHE):
+        """Keep the capabilities in 'filename'.
+        @param filename : Full path to the JSON file as string, the folder is created if necessary.
+        """
+        debug('create an instance of DeviceCache(filename=%r)', filename)
+        self.filename = filename
+        self.__entries = None
+
+    def __str__(self):
+        return 'DeviceCache(filename=%r)' % self.filename
+
+    @property
+    def entries(self):
+        """Return dictionary {qIDN answer: {'version': qVER answer or None, 'capabilities': dict}}."""
+        if self.__entries is None:
+            self.__entries = self.__read()
+        return self.__entries
+
+    def load(self, pidevice):
+        """Populate the capabilities of 'pidevice' from the file if its identification has not changed.
+        Costs one qIDN and, if the device supports it, one qVER query.
+        @type pidevice : pipython.gcscommands.GCSCommands
+        @return : True if the capabilities have been restored.
+        """
+        idn = pidevice.qIDN().strip()
+        entry = self.entries.get(idn)
+        if entry is None:
+            debug('DeviceCache.load: %r is unknown', idn)
+            return False
+        if entry.get('version') is not None and pidevice.qVER().strip() != entry['version']:
+            debug('DeviceCache.load: firmware of %r has changed', idn)
+            return False
+        pidevice.capabilities = entry['capabilities']
+        debug('DeviceCache.load: restored %r', idn)
+        return True
+
+    def save(self, pidevice):
+        """Query the capabilities of 'pidevice' that are not known yet and save them to the file.
+        @type pidevice : pipython.gcscommands.GCSCommands
+        """
+        for func in (getservotime, getmaxnumvalues):
+            try:
+                func(pidevice)
+            except (GCSError, NotImplementedError) as exc:
+                debug('DeviceCache.save: %s: %s', func.__name__, exc)
+        capabilities = pidevice.capabilities
+        capabilities.update({'devname': pidevice.devname, 'axes': pidevice.axes, 'funcs': pidevice.funcs})
+        idn = pidevice.qIDN().strip()
+        version = pidevice.qVER().strip() if pidevice.HasqVER() else None
+        self.__entries = self.__read()
+        self.__entries[idn] = {'version': version, 'capabilities': capabilities}
+        self.__write()
+        debug('DeviceCache.save: saved %r', idn)
+
+    def forget(self, pidevice=None):
+        """Remove the entry of 'pidevice' from the file.
+        @type pidevice : pipython.gcscommands.GCSCommands or None to remove all entries.
+        """
+        self.__entries = {} if pidevice is None else self.__read()
+        if pidevice is not None:
+            self.__entries.pop(pidevice.qIDN().strip(), None)
+        self.__write()
+
+    def __read(self):
+        """Return the entries in the file or an empty dictionary if the file does not exist or is invalid."""
+        if not os.path.isfile(self.filename):
+            return {}
+        try:
+            with open(self.filename) as fobj:
+                entries = json.load(fobj)
+        except ValueError as exc:
+            warning('device cache %r is invalid and is ignored: %s', self.filename, exc)
+            return {}
+        return dict((str(idn), entry) for idn, entry in entries.items())
+
+    def __write(self):
+        """Write the entries into the file."""
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(self.filename, 'w') as fobj:
+            json.dump(self.__entries, fobj, indent=2, sort_keys=True)
@@ -0,0 +1,538 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Provide the GCS functions as coroutines for an asyncio event loop, requires Python 3.6 or newer."""
+
+import asyncio
+from logging import debug, error
+
+from pipython import gcserror
+from pipython.gcserror import GCSError  # prevents cyclic import
+from pipython.gcscommands import GCSCommands
+from pipython.gcsdata import BLOCKSIZE, ENDHEADER, BlockQueue, GCSDataTransfer, appendlines, endofanswer, splitheader
+from pipython.gcspipeline import DeferredRead
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__signature__ = 0x7a41c09e5d2b38f6e1d4c7b90a3f5e26
+
+
+class AsyncGCSMessages(object):
+    """Provide a GCS communication layer for an asyncio event loop."""
+
+    def __init__(self, interface):
+        """Provide a GCS communication layer for an asyncio event loop.
+        @type interface : pipython.interfaces.asyncsocket.AsyncPISocket
+        """
+        debug('create an instance of AsyncGCSMessages(interface=%s)', str(interface))
+        self.__lock = None
+        self.__interface = interface
+        self.__errcheck = True
+        self.__timeout = 7000  # milliseconds
+        self.__usenumpy = False
+        self.__transfer = None
+
+    def __str__(self):
+        return 'AsyncGCSMessages(interface=%s)' % str(self.__interface)
+
+    @property
+    def connectionid(self):
+        """Get ID of current connection as integer."""
+        return self.__interface.connectionid
+
+    @property
+    def errcheck(self):
+        """Get current error check setting, i.e. if the devices error state is always queried."""
+        return self.__errcheck
+
+    @errcheck.setter
+    def errcheck(self, value):
+        """Set error check property.
+        @param value : True means that after each command the error is queried.
+        """
+        self.__errcheck = bool(value)
+        debug('AsyncGCSMessages.errcheck set to %s', self.__errcheck)
+
+    @property
+    def timeout(self):
+        """Get current timeout setting in milliseconds."""
+        return self.__timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        """Set timeout.
+        @param value : Timeout in milliseconds as integer.
+        """
+        self.__timeout = int(value)
+        debug('AsyncGCSMessages.timeout set to %d milliseconds', self.__timeout)
+
+    @property
+    def usenumpy(self):
+        """Get current numpy setting, i.e. if GCS data is stored in a numpy array instead of lists."""
+        return self.__usenumpy
+
+    @usenumpy.setter
+    def usenumpy(self, value):
+        """Set numpy property.
+        @param value : True means that GCS data is stored in a numpy array.
+        """
+        if value and numpy is None:
+            raise ImportError('numpy is required to store GCS data in a numpy array')
+        self.__usenumpy = bool(value)
+        debug('AsyncGCSMessages.usenumpy set to %s', self.__usenumpy)
+
+    @property
+    def bufstate(self):
+        """False if no buffered data is available. True if buffered data is ready to use.
+        Float value 0..1 indicates read progress.
+        """
+        transfer = self.__transfer
+        if transfer is None:
+            return False
+        if transfer.error:
+            raise transfer.error
+        if transfer.done():
+            return True
+        if not transfer.size or transfer.header is None:
+            return False
+        return float(transfer.index) / float(transfer.size)
+
+    @property
+    def bufdata(self):
+        """Get buffered data as 2-dimensional list of float values or as numpy array if self.usenumpy is True."""
+        if self.__transfer is None:
+            return []
+        return self.__transfer.data
+
+    @property
+    def transfer(self):
+        """Get the GCSDataTransfer of the last GCS data read or None."""
+        return self.__transfer
+
+    @property
+    def locked(self):
+        """Return True if instance is locked, i.e. is communicating with the device."""
+        return self.__lock is not None and self.__lock.locked()
+
+    def __getlock(self):
+        """Return the asyncio lock, it is created in the running event loop."""
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    async def send(self, tosend, errcheck=None):
+        """Send 'tosend' to device and check for error. Answers that are still in the receive buffer, e.g. of a
+        query that has timed out, are discarded before, as they are before each query.
+        @param tosend : String to send to device, with or without trailing linefeed.
+        @param errcheck : Overrides self.errcheck if not None.
+        """
+        async with self.__getlock():
+            await self.__interface.flush()
+            await self.__send(tosend)
+            if self.__errcheck if errcheck is None else errcheck:
+                await self.__checkerror()
+
+    async def read(self, tosend, gcsdata=0, sink=None, errcheck=None):
+        """Send 'tosend' to device, read answer and check for error.
+        If 'gcsdata' is not 0 the GCS data is read completely before the GCS header is returned. It is then
+        available in self.bufdata or has been passed to 'sink', see pipython.gcsmessages.GCSMessages.read().
+        @param tosend : String to send to device.
+        @param gcsdata : Number of lines of GCS data, None or < 0 if not known.
+        @param sink : Object with methods start(header), write(block) and close(error) that gets the GCS data.
+        @param errcheck : Overrides self.errcheck if not None.
+        @return : Device answer as string.
+        """
+        gcsdata = None if gcsdata is None or gcsdata < 0 else gcsdata
+        async with self.__getlock():
+            if 0 != gcsdata:
+                transfer = GCSDataTransfer(tosend, gcsdata, sink)
+                self.__transfer = transfer
+                async for _ in self.__readdata(transfer):
+                    pass
+                if transfer.error is not None:
+                    raise transfer.error
+                return transfer.waitheader()
+            await self.__interface.flush()
+            await self.__send(tosend)
+            answer = await self.__read()
+            if self.__errcheck if errcheck is None else errcheck:
+                await self.__checkerror()
+        return answer
+
+    async def iterdata(self, tosend, numvalues=None, blocksize=BLOCKSIZE):
+        """Send 'tosend' and yield the GCS data of the answer in blocks of rows while it is read.
+        The GCS header is available in self.transfer.header. If the iteration is stopped early
+        the remaining data is read and dropped so that the connection can be used further.
+        @param tosend : String to send to device.
+        @param numvalues : Number of lines of GCS data as integer or None if not known.
+        @param blocksize : Number of rows per block as integer, only the last block can be smaller.
+        @return : Asynchronous generator of numpy arrays or lists of lists of float values.
+        """
+        blocks = BlockQueue(blocksize, maxblocks=0)
+        transfer = GCSDataTransfer(tosend, numvalues, blocks)
+        async with self.__getlock():
+            self.__transfer = transfer
+            chunks = self.__readdata(transfer)
+            try:
+                async for _ in chunks:
+                    while len(blocks):
+                        block = blocks.get()
+                        if block is None:
+                            return
+                        yield block
+            finally:
+                if not transfer.done():
+                    blocks.discard()
+                    async for _ in chunks:
+                        pass
+
+    async def __send(self, tosend):
+        """Send 'tosend' to device.
+        @param tosend : String to send to device, with or without trailing linefeed.
+        """
+        if len(tosend) > 1 and not tosend.endswith('\n'):
+            tosend += '\n'
+        await self.__interface.send(tosend)
+
+    async def __getlines(self):
+        """Wait for complete answer lines of the device.
+        @return : Received lines as string.
+        """
+        try:
+            return await asyncio.wait_for(self.__interface.getlines(), self.__timeout / 1000.)
+        except asyncio.TimeoutError:
+            raise GCSError(gcserror.E_7_COM_TIMEOUT)
+
+    async def __read(self):
+        """Read answer from device until this ends with linefeed with no preceeding space.
+        @return : Received data as string.
+        """
+        answer = await self.__getlines()
+        while not endofanswer(answer):
+            answer += await self.__getlines()
+        return answer
+
+    async def __readheader(self, transfer):
+        """Send the query of 'transfer' and read the GCS header.
+        @type transfer : pipython.gcsdata.GCSDataTransfer
+        @return : String of already readout answer or None if no GCS data follows the header.
+        """
+        await self.__interface.flush()
+        await self.__send(transfer.tosend)
+        answer = await self.__getlines()
+        while ENDHEADER not in answer.upper() and not endofanswer(answer):
+            answer += await self.__getlines()
+        parts = splitheader(answer)
+        if parts is None:
+            await self.__send('ERR?\n')
+            err = int((await self.__read()).strip())
+            err = err or gcserror.E_1004_PI_UNEXPECTED_RESPONSE
+            raise GCSError(err, 'no stop string in %r' % answer)
+        header, strbuf = parts
+        transfer.start(header)
+        if strbuf is None:  # "# END HEADER\n" will not start reading GCS data
+            return None
+        if not strbuf:
+            strbuf = await self.__getlines()
+        return strbuf
+
+    async def __readdata(self, transfer):
+        """Read the GCS header and the GCS data of 'transfer', yield after each received chunk.
+        Invalid answer lines set the error of 'transfer', see pipython.gcsdata.appendlines().
+        @type transfer : pipython.gcsdata.GCSDataTransfer
+        """
+        try:
+            answer = await self.__readheader(transfer)
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            transfer.finish(exc)
+            raise
+        if answer is None:
+            transfer.finish(None)
+            return
+        numcolumns = len(answer.split('\n')[0].split())
+        transfer.allocate(numcolumns, self.__usenumpy)
+        while True:
+            answer, isend = appendlines(transfer, answer, numcolumns, self.__usenumpy)
+            if isend:
+                try:
+                    err = await self.__checkerror(doraise=False)
+                except Exception as exc:  # Catching too general exception pylint: disable=W0703
+                    transfer.finish(exc)
+                    raise
+                transfer.finish(err or transfer.error)
+                yield transfer
+                return
+            transfer.update()
+            yield transfer
+            try:
+                answer += await self.__getlines()
+            except Exception as exc:  # Catching too general exception pylint: disable=W0703
+                exc = GCSError(gcserror.E_1090_PI_GCS_DATA_READ_ERROR, exc)
+                error('AsyncGCSMessages: end GCS data transfer with GCSError: %s', exc)
+                transfer.finish(exc)
+                raise exc
+
+    async def __checkerror(self, doraise=True):
+        """Query error from device and raise GCSError exception.
+        @param doraise : If True an error is raised, else the GCS exception is returned.
+        @return : If doraise is False the GCS exception if an error occured else None.
+        """
+        if not self.__errcheck:
+            return None
+        await self.__send('ERR?\n')
+        answer = await self.__read()
+        try:
+            err = int(answer)
+        except ValueError:
+            exc = GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, 'invalid answer on "ERR?": %r' % answer)
+        else:
+            exc = GCSError(err) if err else None
+        if exc and doraise:
+            raise exc
+        return exc
+
+
+class ReplayMessages(object):
+    """Let GCSCommands run in an event loop. The commands are recorded, AsyncGCSCommands executes them
+    asynchronously and runs the GCS function again with the answers until it has got all it needs.
+    """
+
+    def __init__(self, msgs):
+        """Record the commands of GCSCommands and replay the answers of 'msgs'.
+        @type msgs : AsyncGCSMessages
+        """
+        self.__msgs = msgs
+        self.__errcheck = msgs.errcheck
+        self.__answers = []
+        self.__index = 0
+        self.__pending = []
+
+    def __str__(self):
+        return 'ReplayMessages(msgs=%s)' % str(self.__msgs)
+
+    @property
+    def connectionid(self):
+        """Get ID of current connection as integer."""
+        return self.__msgs.connectionid
+
+    @property
+    def errcheck(self):
+        """Get error check setting of the commands that are recorded now."""
+        return self.__errcheck
+
+    @errcheck.setter
+    def errcheck(self, value):
+        """Set error check setting of the commands that are recorded now."""
+        self.__errcheck = bool(value)
+
+    @property
+    def deferred(self):
+        """Return True, the recorded commands are sent after the GCS function has returned."""
+        return True
+
+    @property
+    def embederr(self):
+        """Embedding the error query is not supported."""
+        return False
+
+    @embederr.setter
+    def embederr(self, value):
+        """Embedding the error query is not supported."""
+        debug('ReplayMessages.embederr: ignore %r', value)
+
+    @property
+    def timeout(self):
+        """Get current timeout setting in milliseconds."""
+        return self.__msgs.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        """Set timeout.
+        @param value : Timeout in milliseconds as integer.
+        """
+        self.__msgs.timeout = value
+
+    @property
+    def usenumpy(self):
+        """Get current numpy setting."""
+        return self.__msgs.usenumpy
+
+    @usenumpy.setter
+    def usenumpy(self, value):
+        """Set numpy setting."""
+        self.__msgs.usenumpy = value
+
+    @property
+    def bufstate(self):
+        """False if no buffered data is available. True if buffered data is ready to use."""
+        return self.__msgs.bufstate
+
+    @property
+    def bufdata(self):
+        """Get buffered data as 2-dimensional list of float values or as numpy array."""
+        return self.__msgs.bufdata
+
+    @property
+    def transfer(self):
+        """Get the GCSDataTransfer of the last GCS data read or None."""
+        return self.__msgs.transfer
+
+    @property
+    def locked(self):
+        """Return True if the underlying AsyncGCSMessages instance is locked."""
+        return self.__msgs.locked
+
+    def replay(self, answers):
+        """Start to run a GCS function with the 'answers' of the commands it has sent before.
+        @param answers : List of answers as strings, None for commands without answer.
+        """
+        self.__errcheck = self.__msgs.errcheck
+        self.__answers = answers
+        self.__index = 0
+        self.__pending = []
+
+    @property
+    def pending(self):
+        """Return list of (command, gcsdata, sink, errcheck) tuples recorded since self.replay() has been called.
+        'gcsdata' is False for commands without answer.
+        """
+        return self.__pending
+
+    def send(self, tosend):
+        """Skip 'tosend' if it has been sent before, else record it.
+        @param tosend : String to send to device, with or without trailing linefeed.
+        """
+        if self.__index < len(self.__answers):
+            self.__index += 1
+            return
+        self.__pending.append((tosend, False, None, self.__errcheck))
+
+    def read(self, tosend, gcsdata=0, sink=None):
+        """Return the answer to 'tosend' if it has been read before, else record it and interrupt the GCS function.
+        @param tosend : String to send to device.
+        @param gcsdata : Number of lines of GCS data, see AsyncGCSMessages.read().
+        @param sink : Object that gets the GCS data, see AsyncGCSMessages.read().
+        @return : Device answer as string.
+        """
+        if self.__index < len(self.__answers):
+            self.__index += 1
+            return self.__answers[self.__index - 1]
+        self.__pending.append((tosend, gcsdata, sink, self.__errcheck))
+        raise DeferredRead(tosend)
+
+    def submit(self, tosend, gcsdata=None, sink=None):
+        """GCS data cannot be read in the background, use AsyncGCSMessages.iterdata() instead."""
+        raise NotImplementedError('use AsyncGCSMessages.iterdata() to read %r' % tosend)
+
+
+class AsyncGCSCommands(object):
+    """Provide the GCS functions of GCSCommands as coroutines, e.g. "pos = await pidevice.qPOS('1')".
+    The command strings and the answer parsers of GCSCommands are reused. Properties of GCSCommands
+    that query the device are not available, call the according GCS function instead.
+    """
+
+    def __init__(self, msgs):
+        """Provide the GCS functions of GCSCommands as coroutines.
+        @type msgs : AsyncGCSMessages
+        """
+        debug('create an instance of AsyncGCSCommands(msgs=%s)', str(msgs))
+        self.__msgs = msgs
+        self.__replay = ReplayMessages(msgs)
+        self.__gcs = GCSCommands(self.__replay)
+        self.__lock = None
+
+    def __str__(self):
+        return 'AsyncGCSCommands(msgs=%s)' % str(self.__msgs)
+
+    def __getattr__(self, name):
+        attr = getattr(self.__gcs, name)
+        if not callable(attr):
+            return attr
+
+        async def gcsfunction(*args, **kwargs):
+            """Run the GCS function 'name' and execute its commands asynchronously."""
+            return await self.__call(attr, args, kwargs)
+
+        gcsfunction.__name__ = name
+        gcsfunction.__doc__ = attr.__doc__
+        return gcsfunction
+
+    @property
+    def msgs(self):
+        """Get the AsyncGCSMessages instance."""
+        return self.__msgs
+
+    @property
+    def errcheck(self):
+        """Get current error check setting, i.e. if the devices error state is always queried."""
+        return self.__msgs.errcheck
+
+    @errcheck.setter
+    def errcheck(self, value):
+        """Set error check property."""
+        self.__msgs.errcheck = value
+
+    @property
+    def timeout(self):
+        """Get current timeout setting in milliseconds."""
+        return self.__msgs.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        """Set timeout in milliseconds."""
+        self.__msgs.timeout = value
+
+    @property
+    def usenumpy(self):
+        """Get current numpy setting, i.e. if GCS data is stored in a numpy array instead of lists."""
+        return self.__msgs.usenumpy
+
+    @usenumpy.setter
+    def usenumpy(self, value):
+        """Set numpy setting."""
+        self.__msgs.usenumpy = value
+
+    def iter_gcsdata(self, tosend, blocksize=BLOCKSIZE, numvalues=None):
+        """Send 'tosend' and iterate over the GCS data of the answer in blocks of rows while it is read, e.g.
+            async for block in pidevice.iter_gcsdata('DRR? 1 10000 1 2', numvalues=10000):
+                process(block)
+        @param tosend : GCS query that is answered with GCS data as string, e.g. "DRR? 1 1000 1 2".
+        @param blocksize : Number of rows per block as integer, only the last block can be smaller.
+        @param numvalues : Number of lines of GCS data as integer or None if not known.
+        @return : Asynchronous generator, see AsyncGCSMessages.iterdata().
+        """
+        debug('AsyncGCSCommands.iter_gcsdata(%r, blocksize=%r, numvalues=%r)', tosend, blocksize, numvalues)
+        return self.__msgs.iterdata(tosend, numvalues, blocksize)
+
+    def __getlock(self):
+        """Return the asyncio lock, it is created in the running event loop."""
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    async def __call(self, func, args, kwargs):
+        """Run 'func' until it returns, execute the commands it has recorded and replay the answers.
+        @param func : Bound method of the GCSCommands instance.
+        @param args : Positional arguments of 'func' as tuple.
+        @param kwargs : Keyword arguments of 'func' as dictionary.
+        @return : Return value of 'func'.
+        """
+        answers = []
+        async with self.__getlock():
+            while True:
+                self.__replay.replay(answers)
+                try:
+                    value = func(*args, **kwargs)
+                    done = True
+                except DeferredRead:
+                    done = False
+                for tosend, gcsdata, sink, errcheck in self.__replay.pending:
+                    if gcsdata is False:
+                        await self.__msgs.send(tosend, errcheck=errcheck)
+                        answers.append(None)
+                    else:
+                        answers.append(await self.__msgs.read(tosend, gcsdata, sink, errcheck=errcheck))
+                if done:
+                    return value
@@ -7,6 +7,9 @@ from collections import OrderedDict
 from logging import debug, warning
 
 import pipython
+from pipython.gcsdata import BLOCKSIZE, BlockQueue, GCSDataIterator
+from pipython.gcsmessages import DEFERREDCMDS, DeferredErrorCheck
+from pipython.gcspipeline import GCSPipeline, PipelineMessages
 
 # Invalid class name "basestring"  pylint: disable=C0103
 # Redefining built-in 'basestring' pylint: disable=W0622
@@ -547,6 +550,81 @@ class GCSCommands(object):
         debug('set float format specifier to %r', value)
         self.__settings['floatformat'] = value
 
+    @property
+    def wavetables(self):
+        """Get dictionary {wave table ID: list of formatted wavepoints} with the content that has been written
+        by pitools.writewavetables(). A table is removed when it is changed by a WAV or WCL command, RBT
+        and opening or closing a connection remove all of them.
+        """
+        if 'wavetables' not in self.__settings:
+            self.__settings['wavetables'] = {}
+        return self.__settings['wavetables']
+
+    @property
+    def recorderconfig(self):
+        """Get dictionary {record table: (source, option)} with the data recorder configuration that has been
+        set with DRC or queried with qDRC, source is str, option is int. DRC updates it only if the error is
+        checked at once, i.e. not with errcheck disabled, in deferred mode or in a pipeline. RBT and opening or
+        closing a connection clear it.
+        """
+        if 'recorderconfig' not in self.__settings:
+            self.__settings['recorderconfig'] = {}
+        return self.__settings['recorderconfig']
+
+    @property
+    def capabilities(self):
+        """Get dictionary with the facts about the connected device that are derived from queries, e.g. to save
+        them with pipython.devicecache.DeviceCache: 'devname', 'axes' and 'funcs' as far as they are known and
+        the values that tools have determined, e.g. 'servotime' and 'maxnumvalues' from pipython.datarectools.
+        """
+        capabilities = dict(self.__settings.get('capabilities', {}))
+        if self.__name is not None:
+            capabilities['devname'] = self.__name
+        if self.__axes:
+            capabilities['axes'] = list(self.__axes)
+        if self.__funcs is not None:
+            capabilities['funcs'] = list(self.__funcs)
+        return capabilities
+
+    @capabilities.setter
+    def capabilities(self, capabilities):
+        """Populate devname, axes, funcs and the other capabilities so that they are not queried again.
+        @param capabilities : Dictionary like self.capabilities, missing keys are left unchanged.
+        """
+        capabilities = dict(capabilities)
+        if 'devname' in capabilities:
+            self.__name = str(capabilities.pop('devname'))
+        if 'axes' in capabilities:
+            self.__axes = [str(axis) for axis in capabilities.pop('axes')]
+        if 'funcs' in capabilities:
+            self.__funcs = [str(func) for func in capabilities.pop('funcs')]
+        if 'capabilities' not in self.__settings:
+            self.__settings['capabilities'] = {}
+        self.__settings['capabilities'].update(capabilities)
+        debug('GCSCommands.capabilities: set to %r', sorted(self.capabilities))
+
+    @capabilities.deleter
+    def capabilities(self):
+        """Reset devname, axes, funcs and the other capabilities."""
+        self.__name = None
+        self.__axes = []
+        self.__funcs = None
+        self.__settings.pop('capabilities', None)
+        debug('GCSCommands.capabilities: reset')
+
+    def __errorchecked(self):
+        """Return True if the error of a sent command has been queried when send() has returned."""
+        return self.__msgs.errcheck and not self.__msgs.deferred
+
+    def __forgetwavetables(self, tables=None):
+        """Remove 'tables' from self.wavetables.
+        @param tables : Wave table ID as integer convertible or list of them or None for all tables.
+        """
+        if tables is None:
+            self.wavetables.clear()
+        for table in getitemslist(tables):
+            self.wavetables.pop(int(table), None)
+
     def __getcmdstr(self, cmd, *args):
         """Convert 'cmd' and all 'args' into a GCS1 or GCS2 string.
         @param cmd : Command as string.
@@ -655,6 +733,49 @@ class GCSCommands(object):
         """
         return self.__msgs.bufdata
 
+    @property
+    def transfer(self):
+        """Get the GCSDataTransfer of the last GCS data read or None, e.g. use "self.transfer.wait()"
+        instead of "while self.bufstate is not True". See pipython.gcsdata.GCSDataTransfer.
+        """
+        return self.__msgs.transfer
+
+    @property
+    def usenumpy(self):
+        """Get current numpy setting, i.e. if self.bufdata is a numpy array instead of lists."""
+        return self.__msgs.usenumpy
+
+    @usenumpy.setter
+    def usenumpy(self, value):
+        """Set numpy property, requires numpy to be installed.
+        @param value : True means that GCS data is parsed in bulk into a preallocated numpy array.
+        """
+        self.__msgs.usenumpy = bool(value)
+
+    @property
+    def coalesce(self):
+        """Get the freshness window for coalesced queries in milliseconds or None if disabled."""
+        return self.__msgs.coalesce
+
+    @coalesce.setter
+    def coalesce(self, value):
+        """Coalesce identical queries of several threads, see pipython.gcsmessages.GCSMessages.coalesce.
+        @param value : Accepted age of an answer in milliseconds as float, 0 for queries in flight, None to disable.
+        """
+        self.__msgs.coalesce = value
+
+    @property
+    def batchgap(self):
+        """Get the time in milliseconds a pipeline waits for a further answer or None for self.timeout."""
+        return self.__msgs.batchgap
+
+    @batchgap.setter
+    def batchgap(self, value):
+        """Set the time a pipeline waits for a further answer, see pipython.gcsmessages.GCSMessages.batchgap.
+        @param value : Time in milliseconds as integer or None to wait up to self.timeout.
+        """
+        self.__msgs.batchgap = value
+
     def GcsCommandset(self, tosend):
         """Send 'tosend' to device, there will not be any check for error.
         @param tosend : String to send to device, with or without trailing linefeed.
@@ -699,19 +820,55 @@ class GCSCommands(object):
         debug('GCSCommands.read = %r', answer)
         return answer
 
-    def read_gcsdata(self, tosend):
+    def read_gcsdata(self, tosend, numvalues=None, sink=None):
         """Send 'tosend' to the device and read GCS data to buffer.
         Use "while self.bufstate is not True" and then call self.bufdata to get the data. (see docs)
         @param tosend : String to send to device.
+        @param numvalues : Number of answer lines as integer or None if not known.
+        @param sink : Object that gets the data instead of self.bufdata, e.g. pipython.gcsdata.NpyFileSink.
         @return : Header as ordered dictionary.
         """
-        debug('GCSCommands.read_gcsdata(tosend=%r)', tosend)
+        debug('GCSCommands.read_gcsdata(tosend=%r, numvalues=%r, sink=%s)', tosend, numvalues, sink)
         checksize((1,), tosend)
-        answer = self.__msgs.read(tosend, gcsdata=None)
+        answer = self.__msgs.read(tosend, gcsdata=numvalues, sink=sink)
         answer = getgcsheader(answer)
         debug('GCSCommands.read_gcsdata = %r', answer)
         return answer
 
+    def submit_gcsdata(self, tosend, numvalues=None, sink=None):
+        """Queue reading GCS data with 'tosend' and return a handle of the transfer at once.
+        Transfers of devices that share a link, e.g. on a daisy chain, are read one after the other and each
+        one keeps its own data, e.g. "transfers = [gcs.submit_gcsdata('DRR? 1 1000 1') for gcs in devices]".
+        @param tosend : String to send to device.
+        @param numvalues : Number of answer lines as integer or None if not known.
+        @param sink : Object that gets the data instead of the transfer, e.g. pipython.gcsdata.NpyFileSink.
+        @return : Instance of pipython.gcsdata.GCSDataTransfer, use its wait(), header and data members.
+        """
+        debug('GCSCommands.submit_gcsdata(tosend=%r, numvalues=%r, sink=%s)', tosend, numvalues, sink)
+        checksize((1,), tosend)
+        return self.__msgs.submit(tosend, gcsdata=numvalues, sink=sink)
+
+    def iter_gcsdata(self, tosend, blocksize=BLOCKSIZE, numvalues=None):
+        """Send 'tosend' to the device and iterate over the GCS data in blocks of rows while it is read, e.g.
+            for block in self.iter_gcsdata('DRR? 1 100000 1 2', blocksize=4096):
+        Blocks are numpy arrays with one row per answer line if self.usenumpy is True, else lists of rows.
+        The data is not stored in self.bufdata, so memory is bounded by the block size. Reading pauses while
+        the consumer is behind. Leaving the loop early requires to call close() on the iterator, to use it
+        as context manager or to drop all references to it, the remaining data is then read out without being
+        stored. Until then the paused reading holds the connection, i.e. all other commands wait.
+        @param tosend : String to send to device.
+        @param blocksize : Number of rows per block as integer, only the last block can be smaller.
+        @param numvalues : Number of answer lines as integer or None if not known.
+        @return : Instance of pipython.gcsdata.GCSDataIterator, its "header" attribute is an ordered dictionary.
+        """
+        debug('GCSCommands.iter_gcsdata(tosend=%r, blocksize=%r, numvalues=%r)', tosend, blocksize, numvalues)
+        checksize((1,), tosend)
+        blocks = BlockQueue(blocksize)
+        answer = self.__msgs.read(tosend, gcsdata=numvalues, sink=blocks)
+        answer = getgcsheader(answer)
+        debug('GCSCommands.iter_gcsdata = %r', answer)
+        return GCSDataIterator(blocks, answer)
+
     def getparam(self, param, item=1):
         """Try to read 'param' for 'item', return None if 'param' is not available.
         @param param : Single parameter ID as integer.
@@ -732,6 +889,42 @@ class GCSCommands(object):
                 raise
         return value
 
+    def deferred(self, numcmds=DEFERREDCMDS, interval=None):
+        """Return a context manager that sends set commands without querying the error each time.
+        The error is queried every 'numcmds' commands, at the first command after 'interval' milliseconds,
+        with the next query and on exit. A GCSError lists the commands that could have caused it, e.g.
+            with pidevice.deferred(numcmds=50):
+                for target in targets:
+                    pidevice.MOV('1', target)
+        Nested context managers keep the settings of the outermost one, which queries the error on exit.
+        The deferred mode applies to all threads that use this instance.
+        @param numcmds : Number of commands as integer or None.
+        @param interval : Time in milliseconds as integer or None.
+        @return : Instance of pipython.gcsmessages.DeferredErrorCheck.
+        """
+        debug('GCSCommands.deferred(numcmds=%r, interval=%r)', numcmds, interval)
+        return DeferredErrorCheck(self.__msgs, numcmds, interval)
+
+    def pipeline(self):
+        """Return a context manager that collects GCS functions and sends them at once on exit.
+        Each GCS function called on the returned object returns a PipelineResult. All commands are
+        written in a single send and the error is queried only once for the whole pipeline, e.g.
+            with pidevice.pipeline() as pipe:
+                pos, ont = pipe.qPOS(), pipe.qONT()
+            print(pos.result(), ont.result())
+        Functions that read GCS data (e.g. qDRR) and single character commands (e.g. IsMoving) cannot be
+        pipelined. If the device does not answer a query, e.g. an invalid one, the device error is raised.
+        @return : Instance of pipython.gcspipeline.GCSPipeline.
+        """
+        debug('GCSCommands.pipeline()')
+        pipemsgs = PipelineMessages(self.__msgs)
+        gcscommands = GCSCommands(pipemsgs)
+        gcscommands.__funcs = self.__funcs
+        gcscommands.__name = self.__name
+        gcscommands.__axes = self.__axes
+        gcscommands.__settings = self.__settings
+        return GCSPipeline(gcscommands, pipemsgs, self.__msgs)
+
     # GCS FUNCTIONS ### DO NOT MODIFY THIS LINE !!! ###############################################
 
     def FDG(self, routinename, scanaxis, stepaxis, minlevel=None, aligninputchannel=None, minampl=None, maxampl=None,
@@ -1964,6 +2157,7 @@ class GCSCommands(object):
               append, amplitude, offset, seglength)
         checksize((1, 1, 1, 1, 1), table, append, amplitude, offset, seglength)
         cmdstr = self.__getcmdstr('WAV', table, append, 'NOISE', seglength, amplitude, offset)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def MOD(self, items, modes, values):
@@ -3486,6 +3680,7 @@ class GCSCommands(object):
                   seglength)
         cmdstr = self.__getcmdstr('WAV', table, append, 'LIN', seglength, amplitude, offset, numpoints, firstpoint,
                                   speedupdown)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_SWEEP(self, table, append, startfreq, stopfreq, sweeptime, amplitude, offset):
@@ -3503,6 +3698,7 @@ class GCSCommands(object):
               'offset=%r)', table, append, startfreq, stopfreq, sweeptime, amplitude, offset)
         checksize((1, 1, 1, 1, 1, 1, 1), table, append, startfreq, stopfreq, sweeptime, amplitude, offset)
         cmdstr = self.__getcmdstr('WAV', table, append, 'SWEEP', startfreq, stopfreq, sweeptime, amplitude, offset)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_POL(self, table, append, firstpoint, numpoints, x0, a0, an):
@@ -3519,6 +3715,7 @@ class GCSCommands(object):
               'an=%r)', table, append, firstpoint, numpoints, x0, a0, an)
         checksize((1, 1, 1, 1, 1, 1, True), table, append, firstpoint, numpoints, x0, a0, an)
         cmdstr = self.__getcmdstr('WAV', table, append, 'POL', firstpoint, numpoints, x0, a0, an)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_SIN(self, table, append, firstpoint, numpoints, ampl, np, x0, phase, offset):
@@ -3537,6 +3734,7 @@ class GCSCommands(object):
               'x0=%r, phase=%s, offset=%s)', table, append, firstpoint, numpoints, ampl, np, x0, phase, offset)
         checksize((1, 1, 1, 1, 1, 1, 1, 1, 1), table, append, firstpoint, numpoints, ampl, np, x0, phase, offset)
         cmdstr = self.__getcmdstr('WAV', table, append, 'SIN', firstpoint, numpoints, ampl, np, x0, phase, offset)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_TAN(self, table, append, firstpoint, numpoints, ampl, np, x0, phase, offset):
@@ -3555,6 +3753,7 @@ class GCSCommands(object):
               'x0=%r, phase=%s, offset=%s)', table, append, firstpoint, numpoints, ampl, np, x0, phase, offset)
         checksize((1, 1, 1, 1, 1, 1, 1, 1, 1), table, append, firstpoint, numpoints, ampl, np, x0, phase, offset)
         cmdstr = self.__getcmdstr('WAV', table, append, 'TAN', firstpoint, numpoints, ampl, np, x0, phase, offset)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_RAMP(self, table, firstpoint, numpoints, append, center, speedupdown, amplitude, offset, seglength):
@@ -3576,6 +3775,7 @@ class GCSCommands(object):
                   offset, seglength)
         cmdstr = self.__getcmdstr('WAV', table, append, 'RAMP', seglength, amplitude, offset, numpoints, firstpoint,
                                   speedupdown, center)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_SIN_P(self, table, firstpoint, numpoints, append, center, amplitude, offset, seglength):
@@ -3594,6 +3794,7 @@ class GCSCommands(object):
         checksize((1, 1, 1, 1, 1, 1, 1, 1), table, firstpoint, numpoints, append, center, amplitude, offset, seglength)
         cmdstr = self.__getcmdstr('WAV', table, append, 'SIN_P', seglength, amplitude, offset, numpoints, firstpoint,
                                   center)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def WAV_PNT(self, table, firstpoint, numpoints, append, wavepoint):
@@ -3609,6 +3810,7 @@ class GCSCommands(object):
               numpoints, append, wavepoint)
         checksize((1, 1, 1, 1, True), table, firstpoint, numpoints, append, wavepoint)
         cmdstr = self.__getcmdstr('WAV', table, append, 'PNT', firstpoint, numpoints, wavepoint)
+        self.__forgetwavetables(table)
         self.__msgs.send(cmdstr)
 
     def CTO(self, lines, params, values):
@@ -3631,7 +3833,14 @@ class GCSCommands(object):
         debug('GCSCommands.DRC(tables=%r, sources=%r, options=%r)', tables, sources, options)
         checksize((True, True, True), tables, sources, options)
         cmdstr = self.__getcmdstr('DRC', tables, sources, options)
+        tables, sources, options = getitemslist(tables), getitemslist(sources), getitemslist(options)
+        for table in tables:
+            self.recorderconfig.pop(int(table), None)
         self.__msgs.send(cmdstr)
+        if not self.__errorchecked():
+            return
+        for table, source, option in zip(tables, sources, options):
+            self.recorderconfig[int(table)] = (str(source), int(option))
 
     def qDRC(self, tables=None):
         """Get the data recorder configuration for the queried record 'tables'.
@@ -3642,6 +3851,9 @@ class GCSCommands(object):
         cmdstr = self.__getcmdstr('DRC?', tables)
         answer = self.__msgs.read(cmdstr)
         answerdict = getdict_oneitem(answer, tables, valueconv=(str, int), itemconv=int)
+        for table, config in answerdict.items():
+            if isinstance(config, list) and len(config) == 2:
+                self.recorderconfig[int(table)] = (str(config[0]), int(config[1]))
         debug('GCSCommands.qDRC = %r', answerdict)
         return answerdict
 
@@ -4112,6 +4324,9 @@ class GCSCommands(object):
         errcheck = self.__msgs.errcheck
         self.__msgs.errcheck = False
         cmdstr = self.__getcmdstr('RBT', )
+        self.__forgetwavetables()
+        self.recorderconfig.clear()
+        self.__settings.pop('capabilities', None)
         self.__msgs.send(cmdstr)
         self.__msgs.errcheck = errcheck
 
@@ -4609,6 +4824,7 @@ class GCSCommands(object):
         debug('GCSCommands.WCL(tables=%r)', tables)
         checksize((True,), tables)
         cmdstr = self.__getcmdstr('WCL', tables)
+        self.__forgetwavetables(tables)
         self.__msgs.send(cmdstr)
 
     def qDRL(self, tables=None):
@@ -5552,6 +5768,7 @@ class GCSCommands(object):
         debug('GCSCommands.SPA(items=%r, params=%r, values=%r)', items, params, values)
         items, params, values = getitemsparamsvaluestuple(items, params, values)
         cmdstr = self.__getcmdstr('SPA', items, params, values)
+        self.__settings.pop('capabilities', None)
         self.__msgs.send(cmdstr)
 
     def SEP(self, password, items, params=None, values=None):
@@ -0,0 +1,784 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Receive GCS data in blocks of rows while it is read from the device."""
+
+from array import array
+from collections import deque
+from logging import debug, error
+import json
+import os
+import struct
+import sys
+from threading import Event, RLock, Thread
+from weakref import WeakValueDictionary
+from pipython import gcserror
+from pipython.gcserror import GCSError  # prevents cyclic import
+
+try:
+    from queue import Full, Queue
+except ImportError:
+    from Queue import Full, Queue
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+__signature__ = 0x4f0c93b72a15e8d6c1b07a3e95d2f864
+
+NUMPYROWS = 4096  # initial number of rows of the numpy data buffer if the number of GCS data lines is unknown
+BLOCKSIZE = 4096  # default number of rows per block
+MAXBLOCKS = 4  # number of blocks that can wait for the consumer before the background task pauses
+PUTINTERVAL = 0.1  # seconds between two checks if the consumer has discarded the data while the blocks wait
+PROGRESSROWS = 1000  # default number of rows between two calls of a progress callback
+NPYHEADERSIZE = 128  # bytes, leaves room to rewrite the shape of the array when the transfer has finished
+
+ENDHEADER = '# END_HEADER'  # last line of the GCS header, followed by " \n" if GCS data follows
+
+SCHEDULERS = WeakValueDictionary()  # {linkid: TransferScheduler}, schedulers live as long as a GCSMessages uses them
+SCHEDULERSLOCK = RLock()
+
+
+def endofanswer(answer):
+    """Return True if answer is complete in terms of GCS.
+    @param answer : Answer to check as string.
+    @return : True if last character is "\n" with no preceeding space.
+    """
+    return ' ' != answer[-2:-1] and '\n' == answer[-1:]
+
+
+def isnumpyarray(data):
+    """Return True if 'data' is a numpy array.
+    @param data : Data buffer as list or numpy array.
+    @return : True if numpy is available and 'data' is a numpy array.
+    """
+    return numpy is not None and isinstance(data, numpy.ndarray)
+
+
+def parseheader(header):
+    """Return GCS header string as ordered dictionary.
+    @param header : GCS header with lines "# key = value <LF>" as string.
+    @return : Ordered dictionary of header items.
+    """
+    from pipython.gcscommands import getgcsheader  # prevents cyclic import
+    return getgcsheader(header)
+
+
+def parserows(lines, numcolumns):
+    """Convert complete answer 'lines' in bulk into a numpy array with one row per line.
+    @param lines : Answer lines as string, each one ends with a line feed.
+    @param numcolumns : Number of values per line as integer.
+    @return : Numpy array of shape (lines, 'numcolumns') or None if a line has not exactly 'numcolumns' values
+    or a value is invalid, then the lines must be converted one by one.
+    """
+    numlines = lines.count('\n')
+    if not numlines or not lines.endswith('\n'):
+        return None
+    chars = numpy.frombuffer(lines.encode('latin-1', 'replace'), dtype=numpy.uint8)
+    blank = chars <= 32  # space, line feed, carriage return and tab
+    starts = ~blank
+    starts[1:] &= blank[:-1]
+    numvalues = numpy.cumsum(starts)[chars == 10]
+    if numvalues[0] != numcolumns or (numpy.diff(numvalues) != numcolumns).any():
+        return None
+    try:
+        values = numpy.fromstring(lines, dtype=numpy.float64, sep=' ')
+    except ValueError:
+        return None
+    if values.size != numlines * numcolumns:
+        return None  # conversion has stopped at invalid data
+    return values.reshape(numlines, numcolumns)
+
+
+def splitheader(answer):
+    """Split the 'answer' of a GCS data query after the GCS header.
+    @param answer : Answer of the device as string that contains the complete GCS header.
+    @return : Tuple (header, data) of strings, 'data' is None if no GCS data follows the header, i.e. if the
+    header does not end with "# END_HEADER \n". None if 'answer' contains no "# END_HEADER".
+    """
+    splitpos = answer.upper().find(ENDHEADER)
+    if splitpos < 0:
+        return None
+    splitpos += len(ENDHEADER + ' \n')
+    header, data = answer[:splitpos], answer[splitpos:]
+    if ENDHEADER + ' \n' not in header.upper():
+        return header, None
+    return header, data
+
+
+def appendlines(transfer, answer, numcolumns, usenumpy=False):
+    """Convert the complete lines of 'answer' and append them to the data buffer of 'transfer'.
+    A line with invalid data (non-number, missing column) sets the error of 'transfer' and is saved as NaN row
+    in numpy mode and for a sink, else it is skipped. Too many lines or, at the end of the answer, too few
+    lines set the error of 'transfer', too.
+    @type transfer : GCSDataTransfer
+    @param answer : Answer of the device as string, its last line can be incomplete.
+    @param numcolumns : Number of values per line as integer.
+    @param usenumpy : If True the lines are converted in bulk if possible.
+    @return : Tuple (rest, isend), 'rest' is the incomplete last line as string and 'isend' is True if the end
+    of the answer has been read.
+    """
+    eolpos = answer.rfind('\n') + 1
+    lines, rest = answer[:eolpos], answer[eolpos:]
+    if usenumpy and lines:
+        isend = endofanswer(lines)
+        if lines.count(' \n') == lines.count('\n') - int(isend):  # end of answer can only be the last line
+            rows = parserows(lines, numcolumns)
+            if rows is not None:
+                transfer.appendrows(rows)
+                checksize(transfer, isend)
+                return ('' if isend else rest), isend
+    for line in lines.split('\n')[:-1]:
+        line += '\n'
+        transfer.appendrow(parseline(transfer, line, numcolumns))
+        if endofanswer(line):
+            checksize(transfer, isend=True)
+            return '', True
+    checksize(transfer, isend=False)
+    return rest, False
+
+
+def parseline(transfer, line, numcolumns):
+    """Convert the values of 'line', set the error of 'transfer' if 'line' is invalid.
+    @type transfer : GCSDataTransfer
+    @param line : One answer line of the device as string.
+    @param numcolumns : Number of values per line as integer.
+    @return : List of float values or None if 'line' is invalid.
+    """
+    msg = 'cannot convert to float: %r' % line
+    try:
+        values = [float(x) for x in line.split()]
+        if numcolumns != len(values):
+            msg = 'expected %d, got %d columns: %r' % (numcolumns, len(values), line)
+            raise ValueError()
+    except ValueError:
+        transfer.error = GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, msg)
+        error('GCSDataTransfer: GCSError: %s', transfer.error)
+        return None
+    return values
+
+
+def checksize(transfer, isend):
+    """Set the error of 'transfer' if too many lines or, at the end of the answer, too few lines have been read.
+    @type transfer : GCSDataTransfer
+    @param isend : True if the last line of the answer has been read.
+    """
+    if not transfer.size:
+        return
+    msg = '%s expected, %d received' % (transfer.size, transfer.index)
+    if transfer.index > transfer.size:
+        transfer.error = GCSError(gcserror.E_1089_PI_TOO_MANY_GCS_DATA, msg)
+    elif isend and transfer.index < transfer.size:
+        transfer.error = GCSError(gcserror.E_1088_PI_TOO_FEW_GCS_DATA, msg)
+    else:
+        return
+    error('GCSDataTransfer: GCSError: %s', transfer.error)
+
+
+def filesink(filename):
+    """Return a sink that writes GCS data to 'filename' according to its extension.
+    @param filename : Name of a ".h5" or ".hdf5" file for HDF5 format (requires h5py), else of a ".npy" file.
+    @return : HDF5FileSink or NpyFileSink instance.
+    """
+    if os.path.splitext(filename)[1].lower() in ('.h5', '.hdf5'):
+        return HDF5FileSink(filename)
+    return NpyFileSink(filename)
+
+
+class GCSDataTransfer(object):
+    """Handle of one transfer of GCS data from the device with its own data buffer, error state and progress.
+    It is filled by the background task of GCSMessages and stays valid after the connection has been closed.
+    Use wait() or callbacks instead of polling GCSMessages.bufstate.
+    """
+
+    def __init__(self, tosend, size=None, sink=None):
+        """Handle of one transfer of GCS data from the device.
+        @param tosend : GCS command that queries the data as string.
+        @param size : Number of answer lines as integer or None if not known.
+        @param sink : Object that gets the data instead of self.data, see GCSMessages.read().
+        """
+        self.tosend = tosend
+        self.size = size
+        self.sink = sink
+        self.header = None
+        self.index = 0
+        self.error = None
+        self.__headerstr = None
+        self.__data = []
+        self.__numcolumns = 0
+        self.__offset = 0
+        self.__started = Event()
+        self.__event = Event()
+        self.__lock = RLock()
+        self.__donecallbacks = []
+        self.__progresscallbacks = []
+
+    def __str__(self):
+        return 'GCSDataTransfer(tosend=%r, size=%r, index=%d, done=%s)' % (self.tosend, self.size, self.index,
+                                                                        self.done())
+
+    @property
+    def data(self):
+        """Get the data as list of columns with float values, or as numpy array view with one row per column
+        if numpy is used. Holds only the rows that have not been handed over to the sink yet if a sink is used.
+        """
+        if isnumpyarray(self.__data):
+            return self.__data[:self.index - self.__offset].T
+        return self.__data
+
+    @property
+    def progress(self):
+        """Return read progress as float 0..1 or None if the number of lines is not known and not done yet."""
+        if self.done():
+            return 1.0
+        if not self.size:
+            return None
+        return float(self.index) / float(self.size)
+
+    def done(self):
+        """Return True if the transfer has finished, successfully or not."""
+        return self.__event.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until the transfer has finished.
+        @param timeout : Timeout in seconds as float or None to wait forever.
+        @return : True if the transfer has finished, False on timeout.
+        """
+        return self.__event.wait(timeout)
+
+    def waitheader(self, timeout=None):
+        """Wait until the GCS header has been read, transfers on the same link run one after the other.
+        Raises the error of the transfer if it has failed before the header has been read.
+        @param timeout : Timeout in seconds as float or None to wait forever.
+        @return : GCS header as string or None on timeout.
+        """
+        if not self.__started.wait(timeout):
+            return None
+        if self.__headerstr is None:
+            raise self.error  # Raising NoneType pylint: disable=E0702
+        return self.__headerstr
+
+    def add_done_callback(self, func):
+        """Call 'func' with this instance as argument when the transfer has finished.
+        'func' is called immediately if the transfer has finished already, else by the background task.
+        Then it must not wait for another transfer on the same link, e.g. by calling qDRR().
+        @param func : Callable with one argument.
+        """
+        with self.__lock:
+            if not self.done():
+                self.__donecallbacks.append(func)
+                return
+        self.__call(func)
+
+    def add_progress_callback(self, func, interval=PROGRESSROWS):
+        """Call 'func' with this instance as argument each time a multiple of 'interval' lines has been read.
+        'func' is called by the background task at most once per received part of the device answer and
+        must not communicate with the device.
+        @param func : Callable with one argument.
+        @param interval : Number of lines as integer.
+        """
+        interval = max(1, int(interval))
+        with self.__lock:
+            self.__progresscallbacks.append([func, interval, (self.index // interval + 1) * interval])
+
+    def start(self, header):
+        """Save the GCS header and pass it to the sink. Called by GCSMessages.
+        @param header : GCS header as string.
+        """
+        self.header = parseheader(header)
+        self.__headerstr = header
+        if self.sink is not None:
+            self.sink.start(header)
+        self.__started.set()
+
+    def allocate(self, numcolumns, usenumpy):
+        """Prepare the data buffer. Called by GCSMessages.
+        @param numcolumns : Number of values per line as integer.
+        @param usenumpy : If True the data is stored in a numpy array.
+        """
+        self.__numcolumns = numcolumns
+        if usenumpy:
+            numrows = self.size or NUMPYROWS
+            if self.sink is not None:
+                numrows = min(numrows, NUMPYROWS)
+            self.__data = numpy.empty((numrows, numcolumns), dtype=numpy.float64)
+        elif self.sink is not None:
+            self.__data = []
+        else:
+            self.__data = [[] for _ in range(numcolumns)]
+
+    def appendrow(self, values):
+        """Save the 'values' of one answer line. Called by GCSMessages. An invalid line is saved as row of NaN
+        values in a numpy array and for a sink, so that the row count matches the answer lines.
+        @param values : List of float values or None if the answer line is invalid.
+        """
+        data = self.__data
+        if isnumpyarray(data):
+            data = self.__growarray(1)
+            data[self.index - self.__offset] = numpy.nan if values is None else values
+        elif self.sink is not None:
+            data.append([float('nan')] * self.__numcolumns if values is None else values)
+        elif values is None:
+            pass
+        else:
+            for i, value in enumerate(values):
+                data[i].append(value)
+        self.index += 1
+
+    def appendrows(self, values):
+        """Save the rows of 'values'. Called by GCSMessages.
+        @param values : 2-dimensional numpy array with one row per answer line.
+        """
+        data = self.__growarray(len(values))
+        index = self.index - self.__offset
+        data[index:index + len(values)] = values
+        self.index += len(values)
+
+    def __growarray(self, numlines):
+        """Enlarge the numpy data buffer if it cannot take further 'numlines' rows.
+        @param numlines : Number of rows to add as integer.
+        @return : The numpy data buffer.
+        """
+        data = self.__data
+        required = self.index - self.__offset + numlines
+        if required > len(data):
+            newdata = numpy.empty((max(required, 2 * len(data)), data.shape[1]), dtype=numpy.float64)
+            newdata[:len(data)] = data
+            self.__data = data = newdata
+        return data
+
+    def update(self):
+        """Hand over the rows saved since the last call to the sink and call the progress callbacks.
+        Called by GCSMessages.
+        """
+        numrows = self.index - self.__offset
+        if self.sink is not None and numrows:
+            data = self.__data
+            self.__offset = self.index
+            if isnumpyarray(data):
+                self.sink.write(data[:numrows].copy())
+            elif data:
+                self.__data = []
+                self.sink.write(data)
+        with self.__lock:
+            callbacks = [item for item in self.__progresscallbacks if self.index >= item[2]]
+            for item in callbacks:
+                item[2] = (self.index // item[1] + 1) * item[1]
+        for item in callbacks:
+            self.__call(item[0])
+
+    def finish(self, exc):
+        """Finish the transfer, close the sink and call the done callbacks. Called by GCSMessages.
+        @param exc : GCSError of the transfer or None.
+        """
+        self.update()
+        self.error = exc
+        if self.sink is not None:
+            self.sink.close(exc)
+        with self.__lock:
+            self.__started.set()
+            self.__event.set()
+            callbacks, self.__donecallbacks = self.__donecallbacks, []
+        debug('GCSDataTransfer: finished after %d lines, error %s', self.index, exc)
+        for func in callbacks:
+            self.__call(func)
+
+    def __call(self, func):
+        """Call 'func' with this instance as argument and log exceptions."""
+        try:
+            func(self)
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            error('GCSDataTransfer: callback %r failed: %s', func, exc)
+
+
+class TransferScheduler(object):
+    """Run the GCS data transfers of a link one after the other in a background task.
+    Devices that share a link, e.g. on a daisy chain, share one scheduler, see getscheduler().
+    """
+
+    def __init__(self, linkid):
+        """Run the GCS data transfers of a link one after the other.
+        @param linkid : ID of the link, see PIGateway.linkid.
+        """
+        debug('create an instance of TransferScheduler(linkid=%r)', linkid)
+        self.linkid = linkid
+        self.__lock = RLock()
+        self.__jobs = deque()
+        self.__thread = None
+
+    def __str__(self):
+        return 'TransferScheduler(linkid=%r)' % (self.linkid,)
+
+    @property
+    def pending(self):
+        """Return number of transfers that wait for the link as integer."""
+        return len(self.__jobs)
+
+    def submit(self, func, *args):
+        """Queue 'func' to be called with 'args' in the background task after the previously queued ones.
+        @param func : Callable that runs a transfer.
+        """
+        with self.__lock:
+            self.__jobs.append((func, args))
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__run, name=str(self))
+                self.__thread.daemon = True
+                self.__thread.start()
+
+    def __run(self):
+        """Call the queued functions until the queue is empty."""
+        while True:
+            with self.__lock:
+                if not self.__jobs:
+                    self.__thread = None
+                    return
+                func, args = self.__jobs.popleft()
+            try:
+                func(*args)
+            except Exception as exc:  # Catching too general exception pylint: disable=W0703
+                error('TransferScheduler: %r failed: %s', func, exc)
+
+
+def getscheduler(linkid):
+    """Return the TransferScheduler for 'linkid', it is created if required.
+    @param linkid : ID of the link, see PIGateway.linkid.
+    @return : TransferScheduler instance that is shared by all callers with the same 'linkid'.
+    """
+    with SCHEDULERSLOCK:
+        scheduler = SCHEDULERS.get(linkid)
+        if scheduler is None:
+            scheduler = TransferScheduler(linkid)
+            SCHEDULERS[linkid] = scheduler
+        return scheduler
+
+
+class BlockQueue(object):
+    """Sink for GCSMessages.read() that collects the GCS data into blocks of equal size for a consumer."""
+
+    def __init__(self, blocksize=BLOCKSIZE, maxblocks=MAXBLOCKS):
+        """Sink for GCSMessages.read() that collects the GCS data into blocks of equal size.
+        @param blocksize : Number of rows per block as integer, only the last block can be smaller.
+        @param maxblocks : Number of blocks that can wait for the consumer as integer.
+        """
+        if int(blocksize) < 1:
+            raise ValueError('blocksize must be a positive integer, got %r' % blocksize)
+        self.__blocksize = int(blocksize)
+        self.__queue = Queue(maxsize=int(maxblocks))
+        self.__pending = None
+        self.__discarded = Event()
+        self.__error = None
+
+    def __str__(self):
+        return 'BlockQueue(blocksize=%d)' % self.__blocksize
+
+    def __len__(self):
+        """Return the number of queued items, i.e. blocks and the end of the data, as integer."""
+        return self.__queue.qsize()
+
+    def start(self, header):
+        """Nothing to do, the header is available in GCSDataIterator.header.
+        @param header : GCS header as string.
+        """
+
+    def write(self, block):
+        """Collect 'block' and queue as many blocks of self.blocksize rows as possible.
+        Blocks until the consumer has taken enough blocks. Called by the background task of GCSMessages.
+        @param block : Rows as numpy array or list of lists of float values.
+        """
+        if self.__pending is not None:
+            if isnumpyarray(block):
+                block = numpy.concatenate((self.__pending, block))
+            else:
+                block = self.__pending + block
+        pos = 0
+        while len(block) - pos >= self.__blocksize:
+            self.__put(block[pos:pos + self.__blocksize])
+            pos += self.__blocksize
+        self.__pending = block[pos:] if pos < len(block) else None
+
+    def close(self, error=None):
+        """Queue the remaining rows and the end of the data. Called by the background task of GCSMessages.
+        @param error : GCSError of the transfer that is raised by self.get() at the end of the data, or None.
+        """
+        if self.__pending is not None:
+            self.__put(self.__pending)
+            self.__pending = None
+        self.__error = error
+        self.__put(None)
+
+    def __put(self, item):
+        """Put 'item' into the queue unless the consumer has discarded the data, also while waiting for space.
+        @param item : Block of rows or None as end of data.
+        """
+        while not self.__discarded.is_set():
+            try:
+                self.__queue.put(item, timeout=PUTINTERVAL)
+            except Full:
+                continue
+            return
+
+    def get(self):
+        """Wait for and return the next block of rows.
+        Raises the GCSError of the transfer at the end of the data.
+        @return : Block of rows or None at the end of the data.
+        """
+        block = self.__queue.get()
+        if block is None and self.__error is not None:
+            raise self.__error
+        return block
+
+    def discard(self):
+        """Drop all queued and further blocks, the background task reads the remaining data without storing it."""
+        debug('BlockQueue.discard()')
+        self.__discarded.set()
+        while not self.__queue.empty():
+            self.__queue.get_nowait()
+
+
+class GCSDataIterator(object):
+    """Iterate over the GCS data of a device answer in blocks of rows while it is read, see
+    GCSCommands.iter_gcsdata(). Can be used as context manager to stop reading on exit. The remaining
+    data is discarded, too, when the iterator is garbage collected.
+    """
+
+    def __init__(self, blocks, header):
+        """Iterate over the GCS data in 'blocks'.
+        @type blocks : BlockQueue
+        @param header : GCS header as ordered dictionary.
+        """
+        self.header = header
+        self.__blocks = blocks
+        self.__done = False
+
+    def __str__(self):
+        return 'GCSDataIterator(blocks=%s)' % str(self.__blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return the next block of rows as numpy array or list of lists of float values."""
+        if self.__done:
+            raise StopIteration
+        try:
+            block = self.__blocks.get()
+        except Exception:
+            self.__done = True
+            raise
+        if block is None:
+            self.__done = True
+            raise StopIteration
+        return block
+
+    next = __next__  # Python 2
+
+    def close(self):
+        """Stop iterating, the remaining data is read out in the background but not stored."""
+        if not self.__done:
+            self.__done = True
+            self.__blocks.discard()
+
+
+class NpyFileSink(object):
+    """Sink for GCSMessages.read() that writes the GCS data as float64 array with one row per answer line
+    into a ".npy" file, which can be loaded with numpy.load(filename, mmap_mode='r'). The GCS header is
+    written as JSON to filename + ".json". Does not require numpy.
+    """
+
+    def __init__(self, filename):
+        """Write GCS data into the ".npy" file 'filename'.
+        @param filename : Name of the file to create as string.
+        """
+        debug('create an instance of NpyFileSink(filename=%r)', filename)
+        self.filename = filename
+        self.header = None
+        self.error = None
+        self.numrows = 0
+        self.__numcolumns = 0
+        self.__fobj = None
+
+    def __str__(self):
+        return 'NpyFileSink(filename=%r)' % self.filename
+
+    def start(self, header):
+        """Create the file and save 'header' as metadata.
+        @param header : GCS header as string.
+        """
+        self.header = parseheader(header)
+        with open(self.filename + '.json', 'w') as fobj:
+            json.dump(self.header, fobj, indent=2)
+        self.__fobj = open(self.filename, 'wb')
+        self.__writeheader()
+
+    def write(self, block):
+        """Append the rows in 'block' to the file.
+        @param block : Rows as numpy array or list of lists of float values.
+        """
+        if not self.__numcolumns:
+            self.__numcolumns = len(block[0])
+        if isnumpyarray(block):
+            self.__fobj.write(block.astype('<f8', copy=False).tobytes())
+        else:
+            values = array('d', [value for row in block for value in row])
+            if 'big' == sys.byteorder:
+                values.byteswap()
+            self.__fobj.write(values.tostring() if sys.version_info[0] < 3 else values.tobytes())
+        self.numrows += len(block)
+
+    def close(self, error=None):
+        """Write the final shape of the array into the file header and close the file.
+        @param error : GCSError of the transfer or None, is saved in self.error.
+        """
+        self.error = error
+        if self.__fobj is None:
+            return
+        self.__fobj.seek(0)
+        self.__writeheader()
+        self.__fobj.close()
+        self.__fobj = None
+        debug('NpyFileSink: %d rows written to %r', self.numrows, self.filename)
+
+    def __writeheader(self):
+        """Write ".npy" header in version 1.0 format with padding to NPYHEADERSIZE bytes."""
+        header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (self.numrows, self.__numcolumns)
+        prefix = b'\x93NUMPY\x01\x00' + struct.pack('<H', NPYHEADERSIZE - 10)
+        self.__fobj.write(prefix + header.ljust(NPYHEADERSIZE - 11).encode('latin1') + b'\n')
+
+    def load(self, mmap_mode='r'):
+        """Return the data written to the file as numpy array, requires numpy.
+        @param mmap_mode : See numpy.load(), defaults to read-only memory mapping.
+        @return : Numpy array with one row per answer line.
+        """
+        return numpy.load(self.filename, mmap_mode=mmap_mode)
+
+
+class HDF5FileSink(object):
+    """Sink for GCSMessages.read() that writes the GCS data into a chunked float64 dataset of a HDF5 file.
+    The GCS header is saved as attributes of the dataset. Requires h5py.
+    """
+
+    def __init__(self, filename, dataset='data', chunkrows=BLOCKSIZE):
+        """Write GCS data into 'dataset' of the HDF5 file 'filename'.
+        @param filename : Name of the file to create as string.
+        @param dataset : Name of the dataset as string.
+        @param chunkrows : Number of rows per HDF5 chunk as integer.
+        """
+        if h5py is None:
+            raise ImportError('h5py is required to write GCS data into a HDF5 file')
+        debug('create an instance of HDF5FileSink(filename=%r, dataset=%r)', filename, dataset)
+        self.filename = filename
+        self.dataset = dataset
+        self.header = None
+        self.error = None
+        self.numrows = 0
+        self.__chunkrows = int(chunkrows)
+        self.__h5file = None
+        self.__dset = None
+
+    def __str__(self):
+        return 'HDF5FileSink(filename=%r, dataset=%r)' % (self.filename, self.dataset)
+
+    def start(self, header):
+        """Create the file and save 'header' as metadata.
+        @param header : GCS header as string.
+        """
+        self.header = parseheader(header)
+        self.__h5file = h5py.File(self.filename, 'w')
+
+    def write(self, block):
+        """Append the rows in 'block' to the dataset.
+        @param block : Rows as numpy array or list of lists of float values.
+        """
+        block = numpy.asarray(block, dtype=numpy.float64)
+        if self.__dset is None:
+            self.__dset = self.__h5file.create_dataset(
+                self.dataset, shape=(0, block.shape[1]), maxshape=(None, block.shape[1]), dtype='f8',
+                chunks=(self.__chunkrows, block.shape[1]))
+            for key, value in self.header.items():
+                self.__dset.attrs[key] = value
+        self.__dset.resize(self.numrows + len(block), axis=0)
+        self.__dset[self.numrows:] = block
+        self.numrows += len(block)
+
+    def close(self, error=None):
+        """Close the file.
+        @param error : GCSError of the transfer or None, is saved in self.error.
+        """
+        self.error = error
+        if self.__h5file is None:
+            return
+        self.__h5file.close()
+        self.__h5file = None
+        self.__dset = None
+        debug('HDF5FileSink: %d rows written to %r', self.numrows, self.filename)
+
+
+class ChainedSink(object):
+    """Sink for GCSMessages.read() that passes the GCS data of several transfers to one sink and/or callback as
+    if it was a single transfer, e.g. the chunks of a continuous data recording. Only the header of the first
+    transfer is passed on and the sink is closed by self.finish() instead of by the transfers.
+    """
+
+    def __init__(self, sink=None, callback=None):
+        """Pass GCS data to 'sink' and 'callback'.
+        @param sink : Object with methods start(header), write(block) and close(error) or None.
+        @param callback : Callable 'callback(block)' that gets each block of rows or None.
+        """
+        debug('create an instance of ChainedSink(sink=%s, callback=%r)', sink, callback)
+        self.sink = sink
+        self.callback = callback
+        self.header = None
+        self.error = None
+        self.numrows = 0
+
+    def __str__(self):
+        return 'ChainedSink(sink=%s)' % self.sink
+
+    def start(self, header):
+        """Pass 'header' of the first transfer to the sink.
+        @param header : GCS header as string.
+        """
+        if self.header is not None:
+            return
+        self.header = parseheader(header)
+        if self.sink is not None:
+            self.sink.start(header)
+
+    def write(self, block):
+        """Pass the rows in 'block' to the sink and the callback.
+        @param block : Rows as numpy array or list of lists of float values.
+        """
+        if self.sink is not None:
+            self.sink.write(block)
+        if self.callback is not None:
+            self.callback(block)
+        self.numrows += len(block)
+
+    def close(self, error=None):
+        """End of one transfer, the sink stays open.
+        @param error : GCSError of the transfer or None, is saved in self.error.
+        """
+        if error is not None:
+            self.error = error
+
+    def finish(self, error=None):
+        """Close the sink after the last transfer.
+        @param error : Error that ended the transfers or None to pass self.error.
+        """
+        debug('ChainedSink: %d rows passed to %s', self.numrows, self.sink)
+        if self.sink is not None:
+            self.sink.close(error or self.error)
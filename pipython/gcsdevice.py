@@ -42,18 +42,21 @@ class GCSDevice(GCSCommands):
 
     def unload(self):
         """Close connection to device and daisy chain and unload GCS DLL."""
-        del self.funcs
-        del self.devname
-        del self.axes
+        del self.capabilities
+        self.__forgetstate()
         self.dll.unload()
 
     def close(self):
         """Close connection to device and daisy chain."""
-        del self.funcs
-        del self.devname
-        del self.axes
+        del self.capabilities
+        self.__forgetstate()
         self.dll.close()
 
+    def __forgetstate(self):
+        """Clear what is kept about the state of the device, the next connection can be to another device."""
+        self.wavetables.clear()
+        self.recorderconfig.clear()
+
     def GetError(self):
         """Get current controller error.
         @return : Current error code as integer.
@@ -98,6 +101,7 @@ class GCSDevice(GCSCommands):
         """Open dialog to select the interface.
         @param key: Optional key name as string to store the settings in the Windows registry.
         """
+        self.__forgetstate()
         self.dll.InterfaceSetupDlg(key)
 
     def ConnectRS232(self, comport, baudrate):
@@ -105,6 +109,7 @@ class GCSDevice(GCSCommands):
         @param comport: Port to use as integer (1 means "COM1") or device name ("dev/ttys0") as str.
         @param baudrate: Baudrate to use as integer.
         """
+        self.__forgetstate()
         self.dll.ConnectRS232(comport, baudrate)
 
     def ConnectTCPIP(self, ipaddress, ipport=50000):
@@ -112,12 +117,14 @@ class GCSDevice(GCSCommands):
         @param ipaddress: IP address to connect to as string.
         @param ipport: Port to use as integer, defaults to 50000.
         """
+        self.__forgetstate()
         self.dll.ConnectTCPIP(ipaddress, ipport)
 
     def ConnectTCPIPByDescription(self, description):
         """Open a TCP/IP connection to the device using the device 'description'.
         @param description: One of the identification strings listed by EnumerateTCPIPDevices().
         """
+        self.__forgetstate()
         self.dll.ConnectTCPIPByDescription(description)
 
     def ConnectUSB(self, serialnum):
@@ -125,6 +132,7 @@ class GCSDevice(GCSCommands):
         @param serialnum: Serial number of device or one of the
         identification strings listed by EnumerateUSB().
         """
+        self.__forgetstate()
         self.dll.ConnectUSB(serialnum)
 
     def ConnectNIgpib(self, board, device):
@@ -132,12 +140,14 @@ class GCSDevice(GCSCommands):
         @param board: GPIB board ID as integer.
         @param device: The GPIB device ID of the device as integer.
         """
+        self.__forgetstate()
         self.dll.ConnectNIgpib(board, device)
 
     def ConnectPciBoard(self, board):
         """Open a PCI board connection.
         @param board : PCI board number as integer.
         """
+        self.__forgetstate()
         self.dll.ConnectPciBoard(board)
 
     def EnumerateUSB(self, mask=''):
@@ -186,13 +196,16 @@ class GCSDevice(GCSCommands):
         @param daisychainid : Daisy chain ID as int from the daisy chain master instance or None.
         @param deviceid : Device ID on the daisy chain as integer.
         """
+        self.__forgetstate()
         self.dll.ConnectDaisyChainDevice(deviceid, daisychainid)
 
     def CloseConnection(self):
         """Reset axes property and close connection to the device."""
         del self.axes
+        self.__forgetstate()
         self.dll.CloseConnection()
 
     def CloseDaisyChain(self):
         """Close all connections on daisy chain and daisy chain connection itself."""
+        self.__forgetstate()
         self.dll.CloseDaisyChain()
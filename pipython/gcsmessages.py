@@ -3,21 +3,100 @@
 """Process messages between GCSCommands and an interface."""
 
 from logging import debug, error
-from threading import RLock, Thread
+from collections import deque
+from threading import Event, Lock, RLock
 import sys
 from time import time
 from pipython import gcserror
 from pipython.gcserror import GCSError  # prevents cyclic import
+from pipython.gcsdata import ENDHEADER, GCSDataTransfer, appendlines, endofanswer, getscheduler, splitheader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 __signature__ = 0x98a3e1a520674cd13fb23e75041a99a9
 
+# Commands without answer that are sent at once even while GCS data is read in the background.
+PRIORITYCOMMANDS = (chr(24), 'STP', 'HLT')
+
+# Number of commands that are sent without error check in deferred mode by default.
+DEFERREDCMDS = 16
+
+# Number of command strings that are kept to report the possible cause of a deferred error.
+DEFERREDRING = 32
+
+# Default time in milliseconds between two answers of a batch after which the missing answers are not waited
+# for, see GCSMessages.batchgap.
+BATCHGAP = 300
 
-def endofanswer(answer):
-    """Return True if answer is complete in terms of GCS.
-    @param answer : Answer to check as string.
-    @return : True if last character is "\n" with no preceeding space.
+# Queries that are never coalesced since their answer changes the state of the device.
+NOCOALESCE = ('ERR?',)
+
+
+def splitanswers(answer):
+    """Split concatenated 'answer' into the single GCS answers.
+    @param answer : One or more answers as string.
+    @return : List of answers as strings. Only the last item can be incomplete in terms of GCS.
     """
-    return ' ' != answer[-2:-1] and '\n' == answer[-1:]
+    answers = []
+    start = 0
+    pos = answer.find('\n')
+    while pos >= 0:
+        if 0 == pos or ' ' != answer[pos - 1]:
+            answers.append(answer[start:pos + 1])
+            start = pos + 1
+        pos = answer.find('\n', pos + 1)
+    if start < len(answer):
+        answers.append(answer[start:])
+    return answers
+
+
+def ispriority(tosend):
+    """Return True if 'tosend' is a command that may interrupt a running GCS data transfer.
+    @param tosend : String to send to device, with or without trailing linefeed.
+    @return : True if the first token of 'tosend' is in PRIORITYCOMMANDS.
+    """
+    if tosend == chr(24):
+        return True
+    tokens = tosend.split()
+    return len(tokens) > 0 and tokens[0].upper() in PRIORITYCOMMANDS
+
+
+class DeferredErrorCheck(object):
+    """Context manager that sends set commands without error check and queries the error deferred.
+    It can be nested, only the outermost one queries the error on exit and leaves the deferred mode.
+    """
+
+    def __init__(self, msgs, numcmds=DEFERREDCMDS, interval=None):
+        """Send set commands without error check and query the error deferred.
+        @type msgs : GCSMessages
+        @param numcmds : Query the error after this number of commands as integer or None.
+        @param interval : Query the error at the next command after this time in milliseconds or None.
+        """
+        self.__msgs = msgs
+        self.__numcmds = numcmds
+        self.__interval = interval
+
+    def __enter__(self):
+        self.__msgs.defer(self.__numcmds, self.__interval)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.__msgs.checkdeferred(stop=True)
+        except GCSError as exc:
+            if exc_type is None:
+                raise
+            error('DeferredErrorCheck: %s is hidden by %s', exc, exc_type.__name__)
+
+    def __str__(self):
+        return 'DeferredErrorCheck(msgs=%s)' % str(self.__msgs)
+
+    def check(self):
+        """Query the error of the commands that have been sent since the last check."""
+        self.__msgs.checkdeferred()
 
 
 class GCSMessages(object):
@@ -29,11 +108,24 @@ class GCSMessages(object):
         """
         debug('create an instance of GCSComm(interface=%s)', str(interface))
         self.__lock = RLock()
+        self.__sendlock = RLock()
         self.__interface = interface
         self.__errcheck = True
         self.__embederr = False
         self.__timeout = 7000  # milliseconds
-        self.__databuffer = {'size': 0, 'index': 0, 'lastindex': 0, 'lastupdate': None, 'data': [], 'error': None}
+        self.__usenumpy = False
+        self.__transfer = None
+        self.__scheduler = None
+        self.__running = None
+        self.__stopsent = False
+        self.__deferred = None
+        self.__coalesce = None
+        self.__batchgap = BATCHGAP
+        self.__flightlock = Lock()
+        self.__inflight = {}
+        self.__recent = {}
+        self.__generation = 0
+        self.__bufstate = {'lastindex': 0, 'lastupdate': None}
 
     def __str__(self):
         return 'GCSMessages(interface=%s)' % str(self.__interface)
@@ -82,33 +174,132 @@ class GCSMessages(object):
         self.__timeout = int(value)
         debug('GCSMessages.timeout set to %d milliseconds', self.__timeout)
 
+    @property
+    def usenumpy(self):
+        """Get current numpy setting, i.e. if GCS data is stored in a numpy array instead of lists."""
+        return self.__usenumpy
+
+    @usenumpy.setter
+    def usenumpy(self, value):
+        """Set numpy property.
+        @param value : True means that GCS data is parsed in bulk into a preallocated numpy array.
+        Invalid answer lines are then stored as NaN values.
+        """
+        if value and numpy is None:
+            raise ImportError('numpy is required to store GCS data in a numpy array')
+        self.__usenumpy = bool(value)
+        debug('GCSMessages.usenumpy set to %s', self.__usenumpy)
+
+    @property
+    def coalesce(self):
+        """Get the freshness window for coalesced queries in milliseconds or None if queries are not coalesced."""
+        return self.__coalesce
+
+    @coalesce.setter
+    def coalesce(self, value):
+        """Set the freshness window for coalesced queries.
+        If not None, a thread that sends a query which is already in flight waits for that answer instead of
+        sending it again. An answer of the same query that has been sent not more than 'value' milliseconds
+        ago is returned at once. Set commands invalidate all answers that have been received so far.
+        @param value : Time in milliseconds as float, 0 only coalesces queries in flight, None disables it.
+        """
+        self.__coalesce = None if value is None else float(value)
+        with self.__flightlock:
+            self.__recent = {}
+        debug('GCSMessages.coalesce set to %s', self.__coalesce)
+
+    @property
+    def batchgap(self):
+        """Get the time in milliseconds a batch waits for a further answer or None for self.timeout."""
+        return self.__batchgap
+
+    @batchgap.setter
+    def batchgap(self, value):
+        """Set the time a batch waits for a further answer before the missing answers are given up, see
+        self.readbatch(). It must exceed the time the device needs for the slowest query of a batch.
+        @param value : Time in milliseconds as integer or None to wait up to self.timeout.
+        """
+        self.__batchgap = None if value is None else int(value)
+        debug('GCSMessages.batchgap set to %s', self.__batchgap)
+
     @property
     def bufstate(self):
         """False if no buffered data is available. True if buffered data is ready to use.
         Float value 0..1 indicates read progress. To wait, use "while bufstate is not True".
         """
-        if self.__databuffer['error']:
-            raise self.__databuffer['error']  # Raising NoneType pylint: disable=E0702
-        if self.__databuffer['lastupdate'] is None:
-            self.__databuffer['lastupdate'] = time()
-        if self.__databuffer['index'] == self.__databuffer['lastindex']:
-            if time() - float(self.__databuffer['lastupdate']) > self.__timeout / 1000.:
+        transfer = self.__transfer
+        if transfer is None:
+            return False
+        if transfer.error:
+            raise transfer.error
+        if transfer.done():
+            self.__bufstate['lastupdate'] = None
+            return True
+        if self.__bufstate['lastupdate'] is None:
+            self.__bufstate['lastupdate'] = time()
+        if transfer.index == self.__bufstate['lastindex']:
+            if time() - float(self.__bufstate['lastupdate']) > self.__timeout / 1000.:
                 raise GCSError(gcserror.COM_TIMEOUT__7, 'bufstate timed out')
         else:
-            self.__databuffer['lastupdate'] = time()
-            self.__databuffer['lastindex'] = self.__databuffer['index']
-        if not self.__databuffer['size']:
+            self.__bufstate['lastupdate'] = time()
+            self.__bufstate['lastindex'] = transfer.index
+        if not transfer.size or transfer.header is None:
             return False
-        if self.__databuffer['size'] is True:
-            self.__databuffer['lastupdate'] = None
-            return True
-        return float(self.__databuffer['index']) / float(self.__databuffer['size'])
+        return float(transfer.index) / float(transfer.size)
 
     @property
     def bufdata(self):
-        """Get buffered data as 2-dimensional list of float values."""
-        debug('GCSMessages.bufdata: %d datasets', self.__databuffer['index'])
-        return self.__databuffer['data']
+        """Get buffered data as 2-dimensional list of float values. If self.usenumpy is True the data
+        is returned as a 2-dimensional numpy array view, i.e. bufdata[column] is a view of the column.
+        """
+        if self.__transfer is None:
+            return []
+        debug('GCSMessages.bufdata: %d datasets', self.__transfer.index)
+        return self.__transfer.data
+
+    @property
+    def transfer(self):
+        """Get the GCSDataTransfer of the last GCS data read or None, use it to wait for the end of the data."""
+        return self.__transfer
+
+    @property
+    def deferred(self):
+        """Return True if the error is queried deferred, see self.defer()."""
+        return self.__deferred is not None
+
+    def defer(self, numcmds=DEFERREDCMDS, interval=None):
+        """Send set commands without error check and query the error every 'numcmds' commands or at
+        the first command after 'interval' milliseconds. Queries still check the error at once.
+        A deferred error is raised with the commands that have been sent since the last check.
+        Call self.checkdeferred(stop=True) to leave the deferred mode. Calls can be nested, a nested call
+        keeps 'numcmds' and 'interval' of the outermost one and the deferred mode is left with the
+        checkdeferred(stop=True) that belongs to the outermost call. The deferred mode applies to this
+        instance and not to a thread, i.e. commands of other threads are deferred as well meanwhile.
+        @param numcmds : Number of commands as integer or None.
+        @param interval : Time in milliseconds as integer or None.
+        """
+        debug('GCSMessages.defer(numcmds=%r, interval=%r)', numcmds, interval)
+        if self.__deferred is not None:
+            self.__deferred['depth'] += 1
+            return
+        self.__deferred = {'numcmds': numcmds, 'interval': interval, 'cmds': deque(maxlen=DEFERREDRING),
+                           'count': 0, 'lastcheck': time(), 'depth': 1}
+
+    def checkdeferred(self, stop=False):
+        """Query the error of the commands that have been sent since the last deferred check.
+        @param stop : If True leave the deferred mode afterwards. Ends only a nested self.defer() call
+        without querying the error if there is one.
+        """
+        if stop and self.__deferred is not None and self.__deferred['depth'] > 1:
+            self.__deferred['depth'] -= 1
+            return
+        try:
+            with self.__lock:
+                if self.__deferred is not None and self.__deferred['count']:
+                    self.__raisedeferred()
+        finally:
+            if stop:
+                self.__deferred = None
 
     @property
     def locked(self):
@@ -118,8 +309,19 @@ class GCSMessages(object):
 
     def send(self, tosend):
         """Send 'tosend' to device and check for error.
+        A command in PRIORITYCOMMANDS is sent at once if GCS data is currently read in the background.
+        Its error is not queried then since the answer to "ERR?" would be mixed up with the GCS data.
         @param tosend : String to send to device, with or without trailing linefeed.
         """
+        self.__invalidate()
+        if self.__running is not None and ispriority(tosend):
+            debug('GCSMessages.send: priority command %r during GCS data transfer', tosend)
+            self.__stopsent = True
+            self.__send(tosend)
+            return
+        if self.__deferred is not None:
+            self.__senddeferred(tosend)
+            return
         if self.__embederr and self.__errcheck:
             if len(tosend) > 1 and not tosend.endswith('\n'):
                 tosend += '\n'
@@ -128,75 +330,250 @@ class GCSMessages(object):
             self.__send(tosend)
             self.__checkerror(senderr=not self.__embederr)
 
-    def read(self, tosend, gcsdata=0):
+    def read(self, tosend, gcsdata=0, sink=None):
         """Send 'tosend' to device, read answer and check for error.
         @param tosend : String to send to device.
         @param gcsdata : Number of lines, if != 0 then GCS data will be read in background task.
+        @param sink : Object with methods start(header), write(block) and close(error) that gets the GCS data as
+        blocks of rows while it is read. start() is called with the GCS header as string. Blocks are numpy arrays
+        if self.usenumpy is True, else lists of rows. The data is then not kept in self.bufdata. close() is called
+        with the GCSError of the transfer or None at the end. See pipython.gcsdata for implementations.
+        Waiting for the GCS header, e.g. while transfers queued before on the same link are still read, raises
+        a timeout error after self.timeout.
         @return : Device answer as string.
         """
-        gcsdata = None if gcsdata < 0 else gcsdata
-        stopon = None
+        gcsdata = None if gcsdata is None or gcsdata < 0 else gcsdata
         if 0 != gcsdata:
-            stopon = '# END_HEADER'
-            self.__databuffer['data'] = []
-            self.__databuffer['index'] = 0
-            self.__databuffer['error'] = None
+            header = self.submit(tosend, gcsdata, sink).waitheader(self.__timeout / 1000.)
+            if header is None:
+                msg = 'no GCS header of %r within %d ms, the transfer stays queued' % (tosend, self.__timeout)
+                raise GCSError(gcserror.E_7_COM_TIMEOUT, msg)
+            return header
+        if self.__coalesce is not None and tosend.strip().upper() not in NOCOALESCE:
+            return self.__readcoalesced(tosend)
+        return self.__readanswer(tosend)
+
+    def submit(self, tosend, gcsdata=None, sink=None):
+        """Queue reading the GCS data that is the answer to 'tosend' and return at once.
+        The data is read in a background task after the transfers that have been queued before on the same
+        link, e.g. by other devices on the same daisy chain. self.bufstate and self.bufdata refer to the
+        returned transfer until the next one is submitted.
+        @param tosend : String to send to device.
+        @param gcsdata : Number of lines as integer or None if not known.
+        @param sink : Object that gets the GCS data while it is read, see self.read().
+        @return : Instance of pipython.gcsdata.GCSDataTransfer.
+        """
+        gcsdata = None if gcsdata is None or gcsdata < 0 else gcsdata
+        transfer = GCSDataTransfer(tosend, gcsdata, sink)
+        self.__transfer = transfer
+        self.__bufstate = {'lastindex': 0, 'lastupdate': None}
+        if self.__scheduler is None or self.__scheduler.linkid != self.__interface.linkid:
+            self.__scheduler = getscheduler(self.__interface.linkid)
+        debug('GCSMessages.submit(%r) to %s, %d pending', tosend, self.__scheduler, self.__scheduler.pending)
+        self.__scheduler.submit(self.__runtransfer, transfer)
+        return transfer
+
+    def readbatch(self, tosend, numanswers):
+        """Send all commands in 'tosend' at once, read their answers and check for error only once.
+        Answers are assigned by order, so 'tosend' must not contain single character commands. If no answer
+        follows within self.batchgap milliseconds, e.g. since the device does not answer an invalid query, the
+        missing answers are not waited for and the device error is raised. In deferred mode the error is not
+        queried, the commands are counted into the window of self.defer() instead, see self.checkdeferred().
+        @param tosend : List of commands as strings, with or without trailing linefeed.
+        @param numanswers : Number of answers the device sends back on 'tosend' as integer.
+        @return : List of 'numanswers' device answers as strings.
+        """
+        cmdstr = ''
+        for cmd in tosend:
+            if len(cmd) > 1 and not cmd.endswith('\n'):
+                cmd += '\n'
+            cmdstr += cmd
+        errcheck = self.__errcheck and self.__deferred is None
+        if errcheck:
+            cmdstr += 'ERR?\n'
+        self.__invalidate()
+        with self.__lock:
+            while self.__interface.answersize:
+                self.__interface.getanswer(self.__interface.answersize)  # empty buffer
+            with self.__sendlock:
+                self.__interface.send(cmdstr)
+            if self.__deferred is not None:
+                self.__deferred['cmds'].extend(tosend)
+                self.__deferred['count'] += len(tosend)
+            answers = []
+            maxgap = None
+            while len(answers) < numanswers + int(errcheck):
+                try:
+                    answers += splitanswers(self.__read(stopon=None, verify=False, maxgap=maxgap))
+                except GCSError as exc:
+                    if exc != gcserror.E_7_COM_TIMEOUT or not answers:
+                        raise
+                    raise self.__batcherror(answers, numanswers, errcheck)
+                maxgap = self.__timeout if self.__batchgap is None else min(self.__timeout, self.__batchgap)
+            if self.__deferred is not None:
+                self.__checkwindow()
+        if len(answers) != numanswers + int(errcheck):
+            msg = '%d answers expected, %d received: %r' % (numanswers, len(answers), answers)
+            raise GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, msg)
+        for answer in answers:
+            self.__check_no_eol(answer)
+        if errcheck:
+            exc = self.__geterror(answers.pop())
+            if exc:
+                raise exc
+        return answers
+
+    def __batcherror(self, answers, numanswers, errcheck):
+        """Return the exception for a batch whose answers are incomplete, e.g. since the device does not answer
+        an invalid query. The answer to the final "ERR?" is then the last one that has been received.
+        @param answers : List of the received answers as strings.
+        @param numanswers : Number of expected answers without "ERR?" as integer.
+        @param errcheck : True if "ERR?" has been sent with the batch.
+        @return : GCSError with the device error if there is one.
+        """
+        msg = '%d answers expected, %d received: %r' % (numanswers, len(answers) - int(errcheck), answers)
+        exc = self.__geterror(answers[-1]) if errcheck else None
+        if exc is None or exc == gcserror.E_1004_PI_UNEXPECTED_RESPONSE:
+            return GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, msg)
+        return GCSError(exc.val, msg)
+
+    def __readcoalesced(self, tosend):
+        """Return a recent answer to 'tosend', wait for the answer of the same query in flight or read it.
+        @param tosend : String to send to device.
+        @return : Device answer as string.
+        """
+        with self.__flightlock:
+            recent = self.__recent.get(tosend)
+            if recent is not None and time() - recent[0] <= self.__coalesce / 1000.:
+                debug('GCSMessages: answer of %r is %.1f ms old', tosend, (time() - recent[0]) * 1000.)
+                return recent[1]
+            flight = self.__inflight.get(tosend)
+            if flight is None:
+                flight = {'event': Event(), 'answer': None, 'error': None}
+                self.__inflight[tosend] = flight
+                generation = self.__generation
+            else:
+                generation = None
+        if generation is None:
+            debug('GCSMessages: wait for %r in flight', tosend)
+            flight['event'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['answer']
+        sent = time()
+        try:
+            flight['answer'] = self.__readanswer(tosend)
+        except:  # No exception type(s) specified pylint: disable=W0702
+            flight['error'] = sys.exc_info()[1]
+            raise
+        finally:
+            with self.__flightlock:
+                del self.__inflight[tosend]
+                if flight['error'] is None and generation == self.__generation:
+                    self.__recent[tosend] = (sent, flight['answer'])
+            flight['event'].set()
+        return flight['answer']
+
+    def __invalidate(self):
+        """Drop the answers of coalesced queries, a set command may have changed them."""
+        if self.__coalesce is not None:
+            with self.__flightlock:
+                self.__generation += 1
+                self.__recent = {}
+
+    def __readanswer(self, tosend):
+        """Send 'tosend' to device, read answer and check for error.
+        @param tosend : String to send to device.
+        @return : Device answer as string.
+        """
         with self.__lock:
             while self.__interface.answersize:
                 self.__interface.getanswer(self.__interface.answersize)  # empty buffer
             self.__send(tosend)
-            answer = self.__read(stopon)
-            if 0 != gcsdata:
-                splitpos = answer.upper().find(stopon)
-                if splitpos < 0:
-                    self.__send('ERR?\n')
-                    err = int(self.__read(stopon=None).strip())
-                    err = err or gcserror.E_1004_PI_UNEXPECTED_RESPONSE
-                    raise GCSError(err, 'no stop string in %r' % answer)
-                stopon += ' \n'
-                splitpos += len(stopon)
-                strbuf = answer[splitpos:]
-                answer = answer[:splitpos]
-                if stopon in answer.upper():  # "# END HEADER\n" will not start reading GCS data
-                    self.__databuffer['size'] = gcsdata
-                    self.__readgcsdata(strbuf)
-                else:
-                    self.__databuffer['size'] = True
+            answer = self.__read(stopon=None)
+            if self.__deferred is not None and self.__deferred['count']:
+                self.__deferred['cmds'].append(tosend)
+                self.__deferred['count'] += 1
+                self.__raisedeferred()
             else:
                 self.__checkerror()
         return answer
 
+    def __senddeferred(self, tosend):
+        """Send 'tosend' to device and query the error only if the window of self.defer() is full.
+        @param tosend : String to send to device, with or without trailing linefeed.
+        """
+        deferred = self.__deferred
+        with self.__lock:
+            self.__send(tosend)
+            deferred['cmds'].append(tosend)
+            deferred['count'] += 1
+            self.__checkwindow()
+
+    def __checkwindow(self):
+        """Query the error if the window of self.defer() is full or its interval has elapsed."""
+        deferred = self.__deferred
+        if deferred['numcmds'] and deferred['count'] >= deferred['numcmds']:
+            self.__raisedeferred()
+        elif deferred['interval'] and time() - deferred['lastcheck'] >= deferred['interval'] / 1000.:
+            self.__raisedeferred()
+
+    def __raisedeferred(self):
+        """Query the error, start a new window of deferred commands and raise the error with its window."""
+        deferred = self.__deferred
+        cmds, count = list(deferred['cmds']), deferred['count']
+        deferred['cmds'].clear()
+        deferred['count'] = 0
+        deferred['lastcheck'] = time()
+        exc = self.__checkerror(doraise=False)
+        if exc:
+            msg = 'caused by one of %d commands, last %d: %r' % (count, len(cmds), [x.strip() for x in cmds])
+            raise GCSError(exc.val, msg)
+
     def __send(self, tosend):
         """Send 'tosend' to device.
         @param tosend : String to send to device, with or without trailing linefeed.
         """
         if len(tosend) > 1 and not tosend.endswith('\n'):
             tosend += '\n'
-        self.__interface.send(tosend)
+        with self.__sendlock:
+            self.__interface.send(tosend)
 
-    def __read(self, stopon):
+    def __read(self, stopon, verify=True, maxgap=None):
         """Read answer from device until this ends with linefeed with no preceeding space.
         @param stopon: Addditional uppercase string that stops reading, too.
+        @param verify : If True the answer must not contain a LF without a preceeding space.
+        @param maxgap : Timeout in milliseconds as integer or None for self.timeout.
         @return : Received data as string.
         """
-        timeout = time() + self.__timeout / 1000.
+        maxgap = self.__timeout if maxgap is None else maxgap
+        timeout = time() + maxgap / 1000.
+        if stopon and stopon.upper() == stopon.lower():
+            caseless = stopon  # no need to copy each chunk into upper case
+        else:
+            caseless = None
         chunks = []
         while True:
             if time() > timeout:
                 raise GCSError(gcserror.E_7_COM_TIMEOUT)
             if self.__interface.answersize:
-                timeout = time() + self.__timeout / 1000.
+                timeout = time() + maxgap / 1000.
                 received = self.__interface.getanswer(self.__interface.answersize)
                 chunks.append(received)
                 if endofanswer(chunks[-1]):
                     break
-                if stopon and stopon in chunks[-1].upper():
+                if caseless and caseless in received:
+                    break
+                if stopon and not caseless and stopon in received.upper():
                     break
+            else:
+                self.__interface.waitforanswer(timeout - time())
         try:
             answer = ''.join(chunks)
         except TypeError:
             answer = b''.join(chunks)
-        self.__check_no_eol(answer)
+        if verify:
+            self.__check_no_eol(answer)
         return answer
 
     @staticmethod
@@ -204,82 +581,104 @@ class GCSMessages(object):
         """Check that 'answer' does not contain a LF without a preceeding SPACE except at the end.
         @param answer : Answer to verify as string.
         """
-        for i, char in enumerate(answer[:-1]):
-            if '\n' == char or '\r' == char:
-                if i > 0 and ' ' != answer[i - 1]:
+        for eol in ('\n', '\r'):
+            i = answer.find(eol, 1, len(answer) - 1)
+            while i >= 0:
+                if ' ' != answer[i - 1]:
                     msg = 'LF/CR at %r' % answer[max(0, i - 10):min(i + 10, len(answer))]
                     raise GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, msg)
+                i = answer.find(eol, i + 1, len(answer) - 1)
+
+    def __runtransfer(self, transfer):
+        """Read the GCS header and the GCS data of 'transfer'. Called by the TransferScheduler.
+        @type transfer : pipython.gcsdata.GCSDataTransfer
+        """
+        with self.__lock:
+            self.__stopsent = False
+            self.__running = transfer
+            try:
+                self.__transferdata(transfer)
+            finally:
+                self.__running = None
 
-    def __readgcsdata(self, strbuf):
-        """Start a background task to read out GCS data and save it in the instance.
-        @param strbuf : String of already readout answer.
+    def __transferdata(self, transfer):
+        """Read the GCS header and the GCS data of 'transfer' while self.__lock is acquired.
+        @type transfer : pipython.gcsdata.GCSDataTransfer
         """
+        try:
+            strbuf = self.__readheader(transfer)
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            error('GCSMessages: cannot read GCS header: %s', exc)
+            transfer.finish(exc)
+            return
+        if strbuf is None:
+            transfer.finish(None)
+            return
+        debug('GCSMessages: start background task to query GCS data')
+        try:
+            self.__fillbuffer(transfer, strbuf)
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            error('GCSMessages: end background task with error: %s', exc)
+            transfer.finish(exc)
+
+    def __readheader(self, transfer):
+        """Send the query of 'transfer' and read the GCS header.
+        @type transfer : pipython.gcsdata.GCSDataTransfer
+        @return : String of already readout answer or None if no GCS data follows the header.
+        """
+        while self.__interface.answersize:
+            self.__interface.getanswer(self.__interface.answersize)  # empty buffer
+        self.__send(transfer.tosend)
+        answer = self.__read(ENDHEADER)
+        parts = splitheader(answer)
+        if parts is None:
+            self.__send('ERR?\n')
+            err = int(self.__read(stopon=None).strip())
+            err = err or gcserror.E_1004_PI_UNEXPECTED_RESPONSE
+            raise GCSError(err, 'no stop string in %r' % answer)
+        header, strbuf = parts
+        transfer.start(header)
+        if strbuf is None:  # "# END HEADER\n" will not start reading GCS data
+            return None
         if not endofanswer(strbuf):
             strbuf += self.__read(stopon=' \n')
-        numcolumns = len(strbuf.split('\n')[0].split())
-        self.__databuffer['data'] = [[] for _ in range(numcolumns)]
-        debug('GCSMessages: start background task to query GCS data')
-        thread = Thread(target=self.__fillbuffer, args=(strbuf,))
-        thread.start()
+        return strbuf
 
-    def __fillbuffer(self, answer):
-        """Read answers and save them as float values into the data buffer.
-        An answerline with invalid data (non-number, missing column) will be skipped and error flag is set.
+    def __fillbuffer(self, transfer, answer):
+        """Read answers and save them as float values into the data buffer of 'transfer'.
+        An answerline with invalid data (non-number, missing column) sets the error flag and is saved as NaN row
+        in numpy mode and for a sink, else it is skipped, see pipython.gcsdata.appendlines().
+        @type transfer : pipython.gcsdata.GCSDataTransfer
         @param answer : String of already readout answer.
         """
-        numcolumns = len(self.__databuffer['data'])
-        with self.__lock:
-            while True:
-                lines = answer.splitlines(True)  # keep line endings
-                answer = ''
-                for line in lines:
-                    if '\n' not in line:
-                        answer = line
-                        break
-                    msg = 'cannot convert to float: %r' % line
-                    try:
-                        values = [float(x) for x in line.split()]
-                        if numcolumns != len(values):
-                            msg = 'expected %d, got %d columns: %r' % (numcolumns, len(values), line)
-                            raise ValueError()
-                    except ValueError:
-                        exc = GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, msg)
-                        self.__databuffer['error'] = exc
-                        error('GCSMessages: GCSError: %s', exc)
-                    else:
-                        for i in range(numcolumns):
-                            self.__databuffer['data'][i].append(values[i])
-                    self.__databuffer['index'] += 1
-                    if self.__endofdata(line):
-                        debug('GCSMessages: end background task to query GCS data')
-                        self.__databuffer['error'] = self.__checkerror(doraise=False)
-                        self.__databuffer['size'] = True
-                        return
-                try:
-                    answer += self.__read(stopon=' \n')
-                except:  # No exception type(s) specified pylint: disable=W0702
-                    exc = GCSError(gcserror.E_1090_PI_GCS_DATA_READ_ERROR, sys.exc_info()[1])
-                    self.__databuffer['error'] = exc
-                    error('GCSMessages: end background task with GCSError: %s', exc)
-                    self.__databuffer['size'] = True
-                    return
-
-    def __endofdata(self, line):
-        """Verify 'line' and return True if 'line' is last line of device answer.
-        @param line : One answer line of device with trailing line feed character.
-        @return : True if 'line' is last line of device answer.
+        numcolumns = len(answer.split('\n')[0].split())
+        usenumpy = self.__usenumpy
+        transfer.allocate(numcolumns, usenumpy)
+        while True:
+            answer, isend = appendlines(transfer, answer, numcolumns, usenumpy)
+            if isend:
+                debug('GCSMessages: end background task to query GCS data')
+                transfer.finish(self.__checktransfer() or transfer.error)
+                return
+            transfer.update()
+            try:
+                answer += self.__read(stopon=' \n')
+            except:  # No exception type(s) specified pylint: disable=W0702
+                exc = GCSError(gcserror.E_1090_PI_GCS_DATA_READ_ERROR, sys.exc_info()[1])
+                error('GCSMessages: end background task with GCSError: %s', exc)
+                transfer.finish(exc)
+                return
+
+    def __checktransfer(self):
+        """Query the error at the end of a GCS data transfer.
+        @return : The GCS exception if an error occured else None. Error 10 is ignored if a priority
+        command has stopped the controller during the transfer.
         """
-        if endofanswer(line) and self.__databuffer['index'] < self.__databuffer['size']:
-            msg = '%s expected, %d received' % (self.__databuffer['size'], self.__databuffer['index'])
-            exc = GCSError(gcserror.E_1088_PI_TOO_FEW_GCS_DATA, msg)
-            self.__databuffer['error'] = exc
-            error('GCSMessages: GCSError: %s', exc)
-        if self.__databuffer['size'] and self.__databuffer['index'] > self.__databuffer['size']:
-            msg = '%s expected, %d received' % (self.__databuffer['size'], self.__databuffer['index'])
-            exc = GCSError(gcserror.E_1089_PI_TOO_MANY_GCS_DATA, msg)
-            self.__databuffer['error'] = exc
-            error('GCSMessages: GCSError: %s', exc)
-        return endofanswer(line)
+        exc = self.__checkerror(doraise=False) or None
+        if exc == gcserror.E10_PI_CNTR_STOP and self.__stopsent:
+            debug('GCSMessages: ignore %s caused by priority command', exc)
+            exc = None
+        return exc
 
     def __checkerror(self, senderr=True, doraise=True):
         """Query error from device and raise GCSError exception.
@@ -292,14 +691,21 @@ class GCSMessages(object):
         if senderr:
             self.__send('ERR?\n')
         answer = self.__read(stopon=None)
-        exc = None
-        try:
-            err = int(answer)
-        except ValueError:
-            exc = GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, 'invalid answer on "ERR?": %r' % answer)
-        else:
-            if err:
-                exc = GCSError(err)
+        exc = self.__geterror(answer)
         if exc and doraise:
             raise exc  # Raising NoneType while only classes or instances are allowed pylint: disable=E0702
         return exc
+
+    @staticmethod
+    def __geterror(answer):
+        """Convert the 'answer' of "ERR?" into a GCS exception.
+        @param answer : Answer of the device to "ERR?" as string.
+        @return : The GCS exception if an error occured else None.
+        """
+        try:
+            err = int(answer)
+        except ValueError:
+            return GCSError(gcserror.E_1004_PI_UNEXPECTED_RESPONSE, 'invalid answer on "ERR?": %r' % answer)
+        if err:
+            return GCSError(err)
+        return None
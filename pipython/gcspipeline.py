@@ -0,0 +1,317 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Pipeline GCS functions to save round trips to the device."""
+
+from logging import debug
+
+from pipython.gcserror import GCSError  # prevents cyclic import
+
+__signature__ = 0x2d6b0f1e4a9c83f57e1b6c0a93d4f218
+
+
+class DeferredRead(Exception):
+    """Raised by PipelineMessages to interrupt a GCS function until the pipeline is flushed."""
+
+
+def checksinglechar(tosend):
+    """Raise NotImplementedError if 'tosend' is a single character command, e.g. "#5" for IsMoving(). The device
+    handles them at once, so they overtake the line commands before them and their answers would be mismatched.
+    @param tosend : String to send to device.
+    """
+    if 1 == len(tosend):
+        raise NotImplementedError('single character command %r cannot be pipelined' % tosend)
+
+
+class PipelineResult(object):
+    """Result of a GCS function that has been called in a GCSPipeline."""
+
+    def __init__(self, pipeline, funcname):
+        """Result of a GCS function that has been called in 'pipeline'.
+        @type pipeline : GCSPipeline
+        @param funcname : Name of the GCS function as string.
+        """
+        self.__pipeline = pipeline
+        self.__funcname = funcname
+        self.__done = False
+        self.__value = None
+        self.__error = None
+
+    def __str__(self):
+        return 'PipelineResult(%s)' % self.__funcname
+
+    def done(self):
+        """Return True if the pipeline has been flushed and the result is available."""
+        return self.__done
+
+    def result(self):
+        """Return the return value of the GCS function, flush the pipeline if required.
+        Raises the exception that occurred while the pipeline was flushed.
+        @return : Return value of the GCS function.
+        """
+        if not self.__done:
+            self.__pipeline.flush()
+        if self.__error is not None:
+            raise self.__error  # Raising NoneType pylint: disable=E0702
+        return self.__value
+
+    def _setvalue(self, value):
+        """Set 'value' as return value of the GCS function."""
+        self.__value = value
+        self.__done = True
+
+    def _seterror(self, exc):
+        """Set 'exc' as exception that is raised by self.result()."""
+        self.__error = exc
+        self.__done = True
+
+
+# Too many instance attributes pylint: disable=R0902
+class PipelineMessages(object):
+    """Record GCS commands instead of sending them and replay the answers after the pipeline has been flushed."""
+
+    def __init__(self, msgs):
+        """Record GCS commands instead of sending them.
+        @type msgs : pipython.gcsmessages.GCSMessages
+        """
+        self.__msgs = msgs
+        self.__errcheck = msgs.errcheck
+        self.__recorded = None
+        self.__replay = None
+
+    def __str__(self):
+        return 'PipelineMessages(msgs=%s)' % str(self.__msgs)
+
+    @property
+    def connectionid(self):
+        """Get ID of current connection as integer."""
+        return self.__msgs.connectionid
+
+    @property
+    def errcheck(self):
+        """Get error check setting, the pipeline queries the error only once when it is flushed."""
+        return self.__errcheck
+
+    @errcheck.setter
+    def errcheck(self, value):
+        """Set error check property, does not affect the pipeline."""
+        self.__errcheck = bool(value)
+
+    @property
+    def deferred(self):
+        """Return True, the error of the recorded commands is queried when the pipeline is flushed."""
+        return True
+
+    @property
+    def embederr(self):
+        """Get current embed error setting, the pipeline queries the error only once."""
+        return self.__msgs.embederr
+
+    @embederr.setter
+    def embederr(self, value):
+        """Set embed error property, does not affect the pipeline."""
+        debug('PipelineMessages.embederr: ignore %r', value)
+
+    @property
+    def timeout(self):
+        """Get current timeout setting in milliseconds."""
+        return self.__msgs.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        """Set timeout.
+        @param value : Timeout in milliseconds as integer.
+        """
+        self.__msgs.timeout = value
+
+    @property
+    def coalesce(self):
+        """Get the freshness window for coalesced queries, does not affect the pipeline."""
+        return self.__msgs.coalesce
+
+    @coalesce.setter
+    def coalesce(self, value):
+        """Set the freshness window for coalesced queries, does not affect the pipeline."""
+        self.__msgs.coalesce = value
+
+    @property
+    def batchgap(self):
+        """Get the time a batch waits for a further answer, applies to the pipeline when it is flushed."""
+        return self.__msgs.batchgap
+
+    @batchgap.setter
+    def batchgap(self, value):
+        """Set the time a batch waits for a further answer, applies to the pipeline when it is flushed."""
+        self.__msgs.batchgap = value
+
+    @property
+    def bufstate(self):
+        """False if no buffered data is available. True if buffered data is ready to use."""
+        return self.__msgs.bufstate
+
+    @property
+    def bufdata(self):
+        """Get buffered data as 2-dimensional list of float values."""
+        return self.__msgs.bufdata
+
+    @property
+    def transfer(self):
+        """Get the GCSDataTransfer of the last GCS data read or None."""
+        return self.__msgs.transfer
+
+    @property
+    def locked(self):
+        """Return True if the underlying GCSMessages instance is locked."""
+        return self.__msgs.locked
+
+    def record(self):
+        """Start to record the commands of the next GCS function."""
+        self.__recorded = []
+        self.__replay = None
+
+    @property
+    def recorded(self):
+        """Return list of (command, isquery) tuples recorded since self.record() has been called."""
+        return self.__recorded
+
+    def replay(self, recorded, answer):
+        """Skip the 'recorded' commands and return 'answer' when the recorded query is read.
+        Any other command is forwarded to the device.
+        @param recorded : List of (command, isquery) tuples as returned by self.recorded.
+        @param answer : Answer of the device to the recorded query as string.
+        """
+        self.__recorded = None
+        self.__replay = {'cmds': [cmd for cmd, _ in recorded], 'answer': answer}
+
+    def send(self, tosend):
+        """Record 'tosend' or send it to the device if the pipeline is flushed.
+        @param tosend : String to send to device, with or without trailing linefeed.
+        """
+        if self.__recorded is not None:
+            checksinglechar(tosend)
+            self.__recorded.append((tosend, False))
+        elif self.__replay and tosend in self.__replay['cmds']:
+            self.__replay['cmds'].remove(tosend)
+        else:
+            self.__msgs.send(tosend)
+
+    def read(self, tosend, gcsdata=0, sink=None):
+        """Record 'tosend' and interrupt the GCS function or return the replayed answer.
+        @param tosend : String to send to device.
+        @param gcsdata : Must be 0, GCS data cannot be pipelined.
+        @param sink : Must be None, GCS data cannot be pipelined.
+        @return : Device answer as string.
+        """
+        if gcsdata != 0 or sink is not None:
+            raise NotImplementedError('GCS data cannot be read in a pipeline')
+        if self.__recorded is not None:
+            checksinglechar(tosend)
+            self.__recorded.append((tosend, True))
+            raise DeferredRead(tosend)
+        if self.__replay and tosend in self.__replay['cmds']:
+            self.__replay['cmds'].remove(tosend)
+            return self.__replay['answer']
+        return self.__msgs.read(tosend)
+
+
+class GCSPipeline(object):
+    """Collect GCS functions and send them to the device at once, can be used as context manager.
+    Each GCS function returns a PipelineResult. When the pipeline is flushed, all commands are sent
+    in a single write, the error is queried only once and the answers are parsed by the GCS functions.
+    """
+
+    def __init__(self, gcscommands, pipemsgs, msgs):
+        """Collect GCS functions and send them to the device at once.
+        @type gcscommands : pipython.gcscommands.GCSCommands
+        @param gcscommands : Instance that communicates via 'pipemsgs'.
+        @type pipemsgs : PipelineMessages
+        @type msgs : pipython.gcsmessages.GCSMessages
+        """
+        debug('create an instance of GCSPipeline(msgs=%s)', str(msgs))
+        self.__gcs = gcscommands
+        self.__pipemsgs = pipemsgs
+        self.__msgs = msgs
+        self.__calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+
+    def __str__(self):
+        return 'GCSPipeline(msgs=%s)' % str(self.__msgs)
+
+    def __len__(self):
+        return len(self.__calls)
+
+    def __getattr__(self, name):
+        attr = getattr(self.__gcs, name)
+        if not callable(attr):
+            return attr
+
+        def pipelined(*args, **kwargs):
+            """Record the GCS function 'name' and return a PipelineResult."""
+            return self.__record(name, attr, args, kwargs)
+
+        return pipelined
+
+    def __record(self, funcname, func, args, kwargs):
+        """Call 'func' in record mode and queue the commands it sends.
+        @param funcname : Name of the GCS function as string.
+        @param func : Bound method of the GCSCommands instance.
+        @param args : Positional arguments of 'func' as tuple.
+        @param kwargs : Keyword arguments of 'func' as dictionary.
+        @return : PipelineResult instance.
+        """
+        result = PipelineResult(self, funcname)
+        self.__pipemsgs.record()
+        try:
+            value = func(*args, **kwargs)
+        except DeferredRead:
+            value = None
+        recorded = self.__pipemsgs.recorded
+        self.__pipemsgs.replay([], None)
+        if not recorded:
+            result._setvalue(value)  # Access to a protected member pylint: disable=W0212
+            return result
+        debug('GCSPipeline.%s: queue %r', funcname, recorded)
+        self.__calls.append({'func': func, 'args': args, 'kwargs': kwargs, 'result': result, 'cmds': recorded})
+        return result
+
+    def flush(self):
+        """Send all queued commands at once, read the answers and resolve the results.
+        Raises the GCSError of the device if one of the commands has failed.
+        """
+        if not self.__calls:
+            return
+        calls, self.__calls = self.__calls, []
+        tosend = [cmd for call in calls for cmd, _ in call['cmds']]
+        numanswers = sum([int(isquery) for call in calls for _, isquery in call['cmds']])
+        debug('GCSPipeline.flush: %d commands, %d answers', len(tosend), numanswers)
+        try:
+            answers = self.__msgs.readbatch(tosend, numanswers)
+        except GCSError as exc:
+            for call in calls:
+                call['result']._seterror(exc)  # Access to a protected member pylint: disable=W0212
+            raise
+        for call in calls:
+            if not call['cmds'][-1][1]:
+                call['result']._setvalue(None)  # Access to a protected member pylint: disable=W0212
+                continue
+            self.__pipemsgs.replay(call['cmds'], answers.pop(0))
+            try:
+                value = call['func'](*call['args'], **call['kwargs'])
+            except (GCSError, TypeError, ValueError, IndexError) as exc:
+                call['result']._seterror(exc)  # Access to a protected member pylint: disable=W0212
+            else:
+                call['result']._setvalue(value)  # Access to a protected member pylint: disable=W0212
+
+    def discard(self):
+        """Remove all queued commands without sending them."""
+        exc = SystemError('pipeline has been discarded')
+        for call in self.__calls:
+            call['result']._seterror(exc)  # Access to a protected member pylint: disable=W0212
+        self.__calls = []
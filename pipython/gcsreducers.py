@@ -0,0 +1,266 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Reduce GCS data block by block while it is read, e.g. to statistics or a decimated trace."""
+
+from logging import debug
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pipython.gcsdata import parseheader
+
+__signature__ = 0x93d1e6f04b7a2c58e0f3a9b16d2c47e5
+
+STATS = ('min', 'max', 'mean', 'rms')  # statistics of WindowStats by default
+
+
+class Reducer(object):
+    """Base class of sinks for GCSMessages.read() that reduce each block of rows at once with numpy instead of
+    keeping the GCS data. Derived classes implement reduce(block) and optionally finish(). Combine several
+    reducers, or a reducer and a file sink to keep the full data, with TeeSink. Requires numpy.
+    """
+
+    def __init__(self):
+        if numpy is None:
+            raise ImportError('numpy is required to reduce GCS data')
+        self.header = None
+        self.error = None
+        self.numrows = 0
+
+    def __str__(self):
+        return '%s(numrows=%d)' % (self.__class__.__name__, self.numrows)
+
+    def start(self, header):
+        """Save the GCS header.
+        @param header : GCS header as string.
+        """
+        self.header = parseheader(header)
+
+    def write(self, block):
+        """Reduce the rows in 'block'.
+        @param block : Rows as numpy array or list of lists of float values.
+        """
+        block = numpy.asarray(block, dtype=numpy.float64)
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        if len(block):
+            self.reduce(block)
+            self.numrows += len(block)
+
+    def close(self, error=None):
+        """Reduce the remaining rows.
+        @param error : GCSError of the transfer or None, is saved in self.error.
+        """
+        self.error = error
+        self.finish()
+        debug('%s: %d rows reduced', self.__class__.__name__, self.numrows)
+
+    def reduce(self, block):
+        """Reduce 'block', is called once per block with self.numrows rows before it.
+        @param block : Rows as 2-dimensional numpy array.
+        """
+        raise NotImplementedError()
+
+    def finish(self):
+        """Reduce rows that have been kept back, is called when the transfer has finished."""
+
+
+class WindowStats(Reducer):
+    """Statistics of each column over windows of a fixed number of rows. Rows of a window that is split
+    between two blocks are kept back until the window is complete, the last window can be shorter.
+    """
+
+    def __init__(self, window, stats=STATS):
+        """Calculate 'stats' of each column over 'window' rows.
+        @param window : Number of rows per window as integer.
+        @param stats : List of "min", "max", "mean", "rms" and "std".
+        """
+        super(WindowStats, self).__init__()
+        self.window = int(window)
+        self.stats = tuple(stats)
+        self.__rest = None
+        self.__results = dict((stat, []) for stat in self.stats)
+
+    @property
+    def result(self):
+        """Return dictionary {stat: numpy array with one row per window and one column per GCS data column}."""
+        return dict((stat, numpy.concatenate(values) if values else numpy.empty((0, 0)))
+                    for stat, values in self.__results.items())
+
+    def reduce(self, block):
+        if self.__rest is not None:
+            block = numpy.concatenate((self.__rest, block))
+        numfull = len(block) // self.window * self.window
+        if numfull:
+            self.__reducewindows(block[:numfull].reshape(-1, self.window, block.shape[1]))
+        self.__rest = block[numfull:]
+
+    def finish(self):
+        if self.__rest is not None and len(self.__rest):
+            self.__reducewindows(self.__rest.reshape(1, -1, self.__rest.shape[1]))
+        self.__rest = None
+
+    def __reducewindows(self, windows):
+        """Append the statistics of 'windows', a numpy array of shape (windows, rows, columns)."""
+        funcs = {
+            'min': lambda: windows.min(axis=1),
+            'max': lambda: windows.max(axis=1),
+            'mean': lambda: windows.mean(axis=1),
+            'rms': lambda: numpy.sqrt((windows ** 2).mean(axis=1)),
+            'std': lambda: windows.std(axis=1),
+        }
+        for stat in self.stats:
+            self.__results[stat].append(funcs[stat]())
+
+
+class Envelope(WindowStats):
+    """Minimum and maximum of each column over windows of 'factor' rows, e.g. to plot a long recording
+    without losing peaks. self.trace has two rows, minimum and maximum, per window.
+    """
+
+    def __init__(self, factor):
+        """Decimate by 'factor' into a min/max envelope.
+        @param factor : Number of rows per window as integer.
+        """
+        super(Envelope, self).__init__(factor, stats=('min', 'max'))
+
+    @property
+    def trace(self):
+        """Return numpy array with the minimum and the maximum row of each window one after the other."""
+        result = self.result
+        trace = numpy.empty((2 * len(result['min']), result['min'].shape[1]))
+        trace[0::2] = result['min']
+        trace[1::2] = result['max']
+        return trace
+
+
+class Decimator(Reducer):
+    """Keep every 'factor'-th row, i.e. the rows 0, factor, 2 * factor and so on."""
+
+    def __init__(self, factor):
+        """Keep every 'factor'-th row.
+        @param factor : Decimation factor as integer.
+        """
+        super(Decimator, self).__init__()
+        self.factor = int(factor)
+        self.__rows = []
+
+    @property
+    def result(self):
+        """Return the kept rows as 2-dimensional numpy array."""
+        return numpy.concatenate(self.__rows) if self.__rows else numpy.empty((0, 0))
+
+    def reduce(self, block):
+        self.__rows.append(block[(-self.numrows) % self.factor::self.factor])
+
+
+class RunningStats(Reducer):
+    """Count, mean, variance, minimum and maximum of each column over all rows. The statistics of each block
+    are merged with the previous ones, so they are up to date while the data is read.
+    """
+
+    def __init__(self):
+        super(RunningStats, self).__init__()
+        self.mean = None
+        self.min = None
+        self.max = None
+        self.__m2 = None
+
+    @property
+    def variance(self):
+        """Return population variance of each column as numpy array or None if no rows have been read."""
+        return None if self.__m2 is None else self.__m2 / self.numrows
+
+    @property
+    def std(self):
+        """Return population standard deviation of each column as numpy array or None."""
+        return None if self.__m2 is None else numpy.sqrt(self.variance)
+
+    def reduce(self, block):
+        count, mean = len(block), block.mean(axis=0)
+        m2 = ((block - mean) ** 2).sum(axis=0)
+        if self.mean is None:
+            self.mean, self.__m2 = mean, m2
+            self.min, self.max = block.min(axis=0), block.max(axis=0)
+            return
+        total = self.numrows + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.__m2 = self.__m2 + m2 + delta ** 2 * self.numrows * count / total
+        self.min = numpy.minimum(self.min, block.min(axis=0))
+        self.max = numpy.maximum(self.max, block.max(axis=0))
+
+
+class Crossings(Reducer):
+    """Detect where a column crosses a threshold. Each event is a tuple (index, direction) with the index of
+    the first row beyond the threshold and direction 1 for rising or -1 for falling.
+    """
+
+    def __init__(self, threshold, column=0, direction=0, callback=None):
+        """Detect crossings of 'threshold' in 'column'.
+        @param threshold : Threshold as float.
+        @param column : Index of the GCS data column as integer.
+        @param direction : 1 for rising, -1 for falling or 0 for both directions.
+        @param callback : Callable 'callback(index, direction)' that is called for each event or None.
+        """
+        super(Crossings, self).__init__()
+        self.threshold = float(threshold)
+        self.column = int(column)
+        self.direction = direction
+        self.callback = callback
+        self.events = []
+        self.__last = None
+
+    def reduce(self, block):
+        values = block[:, self.column]
+        offset = self.numrows
+        if self.__last is not None:
+            values = numpy.concatenate(([self.__last], values))
+            offset -= 1
+        above = values > self.threshold
+        changes = numpy.nonzero(above[1:] != above[:-1])[0] + 1
+        for index in changes:
+            direction = 1 if above[index] else -1
+            if self.direction in (0, direction):
+                self.events.append((offset + int(index), direction))
+                if self.callback is not None:
+                    self.callback(offset + int(index), direction)
+        self.__last = values[-1]
+
+
+class TeeSink(object):
+    """Sink for GCSMessages.read() that passes the GCS data to several sinks, e.g. reducers and a file sink
+    that keeps the full data.
+    """
+
+    def __init__(self, *sinks):
+        """Pass the GCS data to each of 'sinks'.
+        @param sinks : Objects with methods start(header), write(block) and close(error).
+        """
+        self.sinks = sinks
+
+    def __str__(self):
+        return 'TeeSink(%s)' % ', '.join(str(sink) for sink in self.sinks)
+
+    def start(self, header):
+        """Pass 'header' to all sinks.
+        @param header : GCS header as string.
+        """
+        for sink in self.sinks:
+            sink.start(header)
+
+    def write(self, block):
+        """Pass the rows in 'block' to all sinks.
+        @param block : Rows as numpy array or list of lists of float values.
+        """
+        for sink in self.sinks:
+            sink.write(block)
+
+    def close(self, error=None):
+        """Close all sinks.
+        @param error : GCSError of the transfer or None.
+        """
+        for sink in self.sinks:
+            sink.close(error)
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Provide a socket for an asyncio event loop, requires Python 3.6 or newer."""
+
+import asyncio
+from logging import debug, warning
+
+__signature__ = 0x5f0c2e97a1d84b36c9e07d15b3a6f842
+
+RECVSIZE = 65536  # bytes per call of StreamReader.read()
+
+
+class AsyncPISocket(object):
+    """Provide a socket for an asyncio event loop, can be used as asynchronous context manager.
+    This is the asyncio counterpart of pipython.interfaces.pisocket.PISocket for AsyncGCSMessages.
+    """
+
+    def __init__(self, host='localhost', port=50000):
+        """Provide a socket, call "await self.connect()" or use "async with" to connect it.
+        @param host : IP address as string, defaults to "localhost".
+        @param port : IP port to use as integer, defaults to 50000.
+        """
+        debug('create an instance of AsyncPISocket(host=%s, port=%s)', host, port)
+        self.__ip = (host, port)
+        self.__reader = None
+        self.__writer = None
+        self.__buffer = bytearray()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __str__(self):
+        return 'AsyncPISocket(host=%s, port=%s)' % self.__ip
+
+    @property
+    def connectionid(self):
+        """Get ID of current connection as integer."""
+        return 0
+
+    async def connect(self):
+        """Open the connection to the device."""
+        debug('AsyncPISocket.connect: open connection to %s:%s', self.__ip[0], self.__ip[1])
+        self.__reader, self.__writer = await asyncio.open_connection(*self.__ip)
+
+    async def send(self, msg):
+        """Send 'msg' to the socket and wait until it has been written.
+        @param msg : String to send.
+        """
+        debug('AsyncPISocket.send: %r', msg)
+        self.__writer.write(msg.encode())
+        await self.__writer.drain()
+
+    async def getlines(self):
+        """Wait for and return all completely received lines.
+        @return : Answer as string that ends with a line feed.
+        """
+        while True:
+            eolpos = self.__buffer.rfind(b'\n')
+            if eolpos >= 0:
+                break
+            received = await self.__reader.read(RECVSIZE)
+            if not received:
+                raise IOError('connection closed by %s:%s' % self.__ip)
+            debug('AsyncPISocket.received: %d bytes', len(received))
+            self.__buffer += received
+        answer = bytes(self.__buffer[:eolpos + 1])
+        del self.__buffer[:eolpos + 1]
+        try:
+            answer = answer.decode('utf-8')
+        except UnicodeDecodeError:
+            warning('AsyncPISocket.getlines: no UTF-8 answer, decode as cp1252: %r', answer)
+            answer = answer.decode('cp1252', 'replace')
+        return answer
+
+    async def flush(self):
+        """Discard the data that has been received but not read yet, e.g. an answer that has been received
+        after a timeout. Does not wait for further data.
+        @return : Number of discarded bytes as integer.
+        """
+        numbytes = len(self.__buffer)
+        del self.__buffer[:]
+        received = len(self.__reader._buffer)  # access to protected member pylint: disable=W0212
+        if received:  # read() returns at once while the StreamReader holds data
+            numbytes += len(await self.__reader.read(received))
+        if numbytes:
+            warning('AsyncPISocket.flush: discard %d bytes', numbytes)
+        return numbytes
+
+    async def close(self):
+        """Close socket."""
+        debug('AsyncPISocket.close: close connection to %s:%s', self.__ip[0], self.__ip[1])
+        if self.__writer is not None:
+            self.__writer.close()
+            await self.__writer.wait_closed()
+            self.__writer = None
@@ -161,6 +161,7 @@ class GCSDll(PIGateway):
         self.__dllhandle = None
         self.__id = -1
         self.__dcid = -1
+        self.__linkdcid = -1
         self.__ifdescription = ''
         self.__asyncbufferindex = -1  # DEPRECATED
         self.__warnmsg = ''
@@ -281,6 +282,13 @@ class GCSDll(PIGateway):
         """Get ID of current daisy chain connection as integer."""
         return self.__dcid
 
+    @property
+    def linkid(self):
+        """Get ID of the physical link, all devices on a daisy chain return the same ID."""
+        if self.__linkdcid >= 0:
+            return self.__dllpath, self.__linkdcid
+        return id(self)
+
     @property
     def dllpath(self):
         """Get full path to GCS DLL."""
@@ -537,6 +545,7 @@ class GCSDll(PIGateway):
         self.__id = getattr(self.__handle, self.__prefix + 'ConnectDaisyChainDevice')(cdaisychainid, cdeviceid)
         if self.__id < 0:
             raise GCSError(self.__error)
+        self.__linkdcid = daisychainid
         if self.__ifdescription:
             self.__ifdescription += '; '
         self.__ifdescription += 'daisy chain %d, device %s' % (daisychainid, deviceid)
@@ -555,6 +564,7 @@ class GCSDll(PIGateway):
         self.__ifdescription = ''
         self.__id = -1
         self.__dcid = -1
+        self.__linkdcid = -1
 
     def AddStage(self, axis):
         """Add a dataset for a user defined stage to the PI stages database.
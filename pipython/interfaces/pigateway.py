@@ -3,9 +3,13 @@
 """Interface class to communicate with a PI device."""
 
 from abc import ABCMeta, abstractmethod, abstractproperty
+from time import sleep, time
 
 __signature__ = 0x6b866167d51d215a461245822a9cf4d6
 
+MINPOLLDELAY = 0.0001  # seconds
+MAXPOLLDELAY = 0.001  # seconds
+
 
 class PIGateway(object):
     """Interface (in terms of "base class") to communicate with a PI device.
@@ -25,6 +29,14 @@ class PIGateway(object):
         """Get ID of current connection as integer."""
         raise NotImplementedError()
 
+    @property
+    def linkid(self):
+        """Get ID of the physical link as hashable object. Interfaces that share a link, e.g. the devices
+        on a daisy chain, return the same ID so that their GCS data transfers are run one after the other.
+        Default implementation returns an ID that is unique for this instance.
+        """
+        return id(self)
+
     @abstractmethod
     def send(self, msg):
         """Send a GCS command to the device, do not query error from device.
@@ -43,3 +55,20 @@ class PIGateway(object):
         @return : Answer as string.
         """
         raise NotImplementedError()
+
+    def waitforanswer(self, timeout):
+        """Block until an answer is available or 'timeout' has elapsed.
+        Default implementation polls self.answersize with an exponentially growing delay between
+        MINPOLLDELAY and MAXPOLLDELAY. Override it if the interface provides an event-driven wait.
+        @param timeout : Maximum time to wait in seconds as float.
+        @return : True if an answer is available.
+        """
+        maxtime = time() + timeout
+        polldelay = MINPOLLDELAY
+        while not self.answersize:
+            remaining = maxtime - time()
+            if remaining <= 0:
+                return False
+            sleep(min(polldelay, remaining))
+            polldelay = min(2 * polldelay, MAXPOLLDELAY)
+        return True
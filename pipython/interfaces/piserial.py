@@ -20,6 +20,7 @@ class PISerial(PIGateway):
         """
         debug('create an instance of PISerial(port=%s, baudrate=%s)', port, baudrate)
         self.__ser = serial.Serial(port=port, baudrate=baudrate)
+        self.__buffer = b''
 
     def __enter__(self):
         return self
@@ -45,14 +46,33 @@ class PISerial(PIGateway):
     @property
     def answersize(self):
         """Return the number of characters currently in the input buffer as integer."""
-        return self.__ser.inWaiting
+        return len(self.__buffer) + self.__ser.inWaiting()
+
+    def waitforanswer(self, timeout):
+        """Block on the serial port until a character has been received or 'timeout' has elapsed.
+        The timeout of the serial port is restored afterwards.
+        @param timeout : Maximum time to wait in seconds as float.
+        @return : True if an answer is available.
+        """
+        if self.answersize:
+            return True
+        porttimeout = self.__ser.timeout
+        self.__ser.timeout = max(0., timeout)
+        try:
+            self.__buffer = self.__ser.read(size=1)
+        finally:
+            self.__ser.timeout = porttimeout
+        return bool(self.__buffer)
 
     def getanswer(self, bufsize):
         """Return received data.
         @param bufsize : Number of bytes to return.
         @return : Answer as string.
         """
-        answer = self.__ser.read(size=bufsize)
+        answer = self.__buffer[:bufsize]
+        self.__buffer = self.__buffer[bufsize:]
+        if len(answer) < bufsize:
+            answer += self.__ser.read(size=bufsize - len(answer))
         debug('PISerial.getanswer: %r', answer)
         return answer
 
@@ -2,13 +2,19 @@
 # -*- coding: utf-8 -*-
 """Provide a socket."""
 
-from logging import debug
+from logging import debug, warning
+import select
 import socket
 
+from pipython import gcserror
+from pipython.gcserror import GCSError
 from pipython.interfaces.pigateway import PIGateway
 
 __signature__ = 0xd107f02a5957ea4ea84f7b6b3e0dca7e
 
+RECVSIZE = 65536  # bytes per call of socket.recv_into()
+COMPACTSIZE = 1048576  # bytes already read out before the receive buffer is compacted
+
 
 class PISocket(PIGateway):
     """Provide a socket, can be used as context manager."""
@@ -20,7 +26,11 @@ class PISocket(PIGateway):
         """
         debug('create an instance of PISocket(host=%s, port=%s)', host, port)
         self.__ip = (host, port)
-        self.__buffer = ''
+        self.__buffer = bytearray()
+        self.__readpos = 0
+        self.__closed = False
+        self.__recvbuf = bytearray(RECVSIZE)
+        self.__recvview = memoryview(self.__recvbuf)
         self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.__socket.connect(self.__ip)
         self.__socket.setblocking(0)
@@ -54,37 +64,60 @@ class PISocket(PIGateway):
 
     @property
     def answersize(self):
-        """Query socket and return the size of the answer as integer."""
-        chunks = []
-        while True:
+        """Query socket and return the size of all completely received lines as integer.
+        Raises GCSError if the peer has closed the connection and no complete line is left.
+        """
+        while not self.__closed:
             try:
-                received = self.__socket.recv(2048)
+                received = self.__socket.recv_into(self.__recvbuf)
             except IOError:
                 break
-            else:
-                try:
-                    received = received.decode('utf-8')
-                except UnicodeDecodeError:
-                    self.__buffer = received
-                    chunks = []
-                else:
-                    chunks.append(received)
-                finally:
-                    debug('PISocket.received: %r', received)
-        if chunks:
-            try:
-                self.__buffer += ''.join(chunks)
-            except TypeError:
-                self.__buffer += b''.join(chunks)
-        return len(self.__buffer)
+            if not received:
+                warning('PISocket: connection closed by %s:%s', self.__ip[0], self.__ip[1])
+                self.__closed = True
+                break
+            debug('PISocket.received: %d bytes', received)
+            self.__buffer += self.__recvview[:received]
+        linessize = self.__linessize
+        if self.__closed and not linessize:
+            raise GCSError(gcserror.E_56_COM_SOCKET_NOT_CONNECTED, 'connection closed by %s:%s' % self.__ip)
+        return linessize
+
+    @property
+    def __linessize(self):
+        """Return the size in bytes of all complete lines in the receive buffer as integer."""
+        eolpos = self.__buffer.rfind(b'\n', self.__readpos)
+        return eolpos + 1 - self.__readpos if eolpos >= 0 else 0
+
+    def waitforanswer(self, timeout):
+        """Block on the socket until data has been received or 'timeout' has elapsed.
+        @param timeout : Maximum time to wait in seconds as float.
+        @return : True if an answer is available.
+        """
+        if self.__linessize or self.__closed:
+            return True
+        readable = select.select([self.__socket], [], [], max(0., timeout))[0]
+        return bool(readable)
 
     def getanswer(self, bufsize):
-        """Return received data.
+        """Return received data. Only complete lines should be requested, see self.answersize.
         @param bufsize : Number of bytes to return.
         @return : Answer as string.
         """
-        answer = self.__buffer[:bufsize]
-        self.__buffer = self.__buffer[bufsize:]
+        endpos = min(self.__readpos + bufsize, len(self.__buffer))
+        answer = self.__buffer[self.__readpos:endpos]
+        self.__readpos = endpos
+        if self.__readpos == len(self.__buffer):
+            del self.__buffer[:]
+            self.__readpos = 0
+        elif self.__readpos > COMPACTSIZE:
+            del self.__buffer[:self.__readpos]
+            self.__readpos = 0
+        try:
+            answer = answer.decode('utf-8')
+        except UnicodeDecodeError:
+            warning('PISocket.getanswer: no UTF-8 answer, decode as cp1252: %r', answer)
+            answer = answer.decode('cp1252', 'replace')
         return answer
 
     def close(self):
@@ -3,12 +3,31 @@
 """Collection of helpers for using a PI device."""
 
 from logging import debug
+from threading import Event, Thread
 from time import sleep, time
 
 from pipython import GCSError, gcserror
+from pipython.gcsmessages import DEFERREDCMDS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Invalid class name "basestring"  pylint: disable=C0103
+# Redefining built-in 'basestring' pylint: disable=W0622
+try:
+    basestring
+except NameError:
+    basestring = str
 
 __signature__ = 0xb084e4568e4bda2b202a65b455b9fdd0
 
+MINPOLLDELAY = 0.001  # seconds, first delay between polls after the predicted end of a move
+PREDICTMARGIN = 0.9  # fraction of the predicted move time that is slept without polling
+MAXCMDLEN = 256  # characters of a command that all controllers accept, see the controller manual for more
+WAVETOLERANCE = 1e-5  # relative difference of read back wavepoints, e.g. due to single precision on the device
+
 
 class FrozenClass(object):  # Too few public methods pylint: disable=R0903
     """Freeze child class when self.__isfrozen is set, i.e. values of already existing properties can still
@@ -90,21 +109,145 @@ def startup(pidevice, stages=None, refmode=None):
     waitontarget(pidevice, axes=referencedaxes)
 
 
-def writewavepoints(pidevice, wavetable, wavepoints, bunchsize=None):
-    """Write 'wavepoints' for 'wavetable' in bunches of 'bunchsize'.
+def writewavepoints(pidevice, wavetable, wavepoints, bunchsize=None, verify=False):
+    """Write 'wavepoints' for 'wavetable' in bunches of 'bunchsize', see writewavetables().
     The 'bunchsize' is device specific. Please refer to the controller manual.
     @type pidevice : pipython.gcscommands.GCSCommands
     @param wavetable : Wave table ID as integer.
-    @param wavepoints : Single wavepoint as float convertible or list of them.
+    @param wavepoints : Single wavepoint as float convertible or list or numpy array of them.
     @param bunchsize : Number of wavepoints in a single bunch or None to send all 'wavepoints' in a single bunch.
+    Use writewavetables() to pack the bunches by the length of the command.
+    @param verify : If True read the wave table back and compare it with 'wavepoints'.
     """
     wavepoints = wavepoints if hasattr(wavepoints, '__iter__') else [wavepoints]
     if bunchsize is None:
         bunchsize = len(wavepoints)
-    for startindex in range(0, len(wavepoints), bunchsize):
-        bunch = wavepoints[startindex:startindex + bunchsize]
-        pidevice.WAV_PNT(table=wavetable, firstpoint=startindex + 1, numpoints=len(bunch),
-                         append='&' if startindex else 'X', wavepoint=bunch)
+    writewavetables(pidevice, {wavetable: wavepoints}, bunchsize=bunchsize, verify=verify)
+
+
+# Too many arguments (6/5) pylint: disable=R0913
+def writewavetables(pidevice, wavetables, bunchsize=None, maxcmdlen=MAXCMDLEN, verify=False, delta=False):
+    """Write the wavepoints of several wave tables in one pass.
+    The wavepoints of each table are formatted at once with pidevice.floatformat and packed into WAV_PNT
+    commands of up to 'maxcmdlen' characters or of 'bunchsize' points. The error is queried deferred only
+    once after the last command, see GCSCommands.deferred(). The written content is kept in
+    pidevice.wavetables. With 'delta' a table with the same content is skipped and of a table that only got
+    new points at its end only these points are appended with "&". Any other change rewrites the whole table
+    since "&" always appends at the end of the table and cannot overwrite points in place.
+    The cached tables are checked with qWAV for their length first, e.g. to notice a power cycle.
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param wavetables : Dictionary {wave table ID: list or numpy array of wavepoints}.
+    @param bunchsize : Number of wavepoints in a single bunch or None to pack bunches by 'maxcmdlen'.
+    @param maxcmdlen : Maximum length of a command in characters as integer, see controller manual.
+    @param verify : If True read the wave tables back and compare them, see verifywavetables().
+    @param delta : If True skip unchanged tables and only append new points, see pidevice.wavetables.
+    """
+    cache = pidevice.wavetables
+    if delta:
+        __checkwavetables(pidevice, [int(wavetable) for wavetable in wavetables])
+    written = {}
+    with pidevice.deferred(numcmds=None):
+        for wavetable, wavepoints in wavetables.items():
+            values = __formatwavepoints(wavepoints, pidevice.floatformat)
+            previous = cache.pop(int(wavetable), None)
+            segments = __getwavesegments(previous, values) if delta else [(0, len(values))]
+            debug('writewavetables: write segments %r of wave table %s', segments, wavetable)
+            for start, stop in segments:
+                for cmdstr in __getwavecmds(wavetable, values, start, stop, bunchsize, maxcmdlen):
+                    pidevice.send(cmdstr)
+            written[int(wavetable)] = values
+    if verify:
+        verifywavetables(pidevice, wavetables)
+    cache.update(written)
+
+
+def verifywavetables(pidevice, wavetables, tolerance=WAVETOLERANCE):
+    """Read 'wavetables' back with qGWD and compare them with the written wavepoints.
+    Tables of the same length are read in one GCS data transfer. Raises SystemError on the first difference.
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param wavetables : Dictionary {wave table ID: list or numpy array of wavepoints}.
+    @param tolerance : Allowed difference relative to the wavepoint, absolute below 1, as float.
+    """
+    bylength = {}
+    for wavetable, wavepoints in wavetables.items():
+        bylength.setdefault(len(wavepoints), []).append(wavetable)
+    for numvalues, tables in sorted(bylength.items()):
+        if not numvalues:
+            continue
+        cmdstr = 'GWD? 1 %d %s' % (numvalues, ' '.join([str(table) for table in tables]))
+        transfer = pidevice.submit_gcsdata(cmdstr, numvalues)
+        transfer.wait()
+        if transfer.error is not None:
+            raise transfer.error
+        for wavetable, column in zip(tables, transfer.data):
+            index = __findmismatch(column, wavetables[wavetable], tolerance)
+            if index is not None:
+                raise SystemError('wave table %s differs at point %d: %r instead of %r' %
+                                  (wavetable, index + 1, column[index], wavetables[wavetable][index]))
+
+
+def __formatwavepoints(wavepoints, floatformat):
+    """Return list of 'wavepoints' formatted as strings with 'floatformat'."""
+    if hasattr(wavepoints, 'tolist'):
+        wavepoints = wavepoints.tolist()
+    return ('{:%s} ' % floatformat * len(wavepoints)).format(*wavepoints).split()
+
+
+def __checkwavetables(pidevice, wavetables):
+    """Remove 'wavetables' from pidevice.wavetables if their length on the device differs."""
+    cached = [wavetable for wavetable in wavetables if wavetable in pidevice.wavetables]
+    if not cached or not pidevice.HasqWAV():
+        return
+    lengths = pidevice.qWAV(cached, [1] * len(cached))
+    for wavetable in cached:
+        if int(lengths[wavetable][1]) != len(pidevice.wavetables[wavetable]):
+            debug('writewavetables: wave table %s has changed on the device', wavetable)
+            del pidevice.wavetables[wavetable]
+
+
+def __getwavesegments(previous, values):
+    """Return list of (start, stop) index tuples of 'values' that have to be written after 'previous'.
+    Empty if nothing has changed, only the new points if 'previous' is the beginning of 'values', else all.
+    """
+    if previous is None:
+        return [(0, len(values))]
+    if values == previous:
+        return []
+    if len(values) > len(previous) and values[:len(previous)] == previous:
+        return [(len(previous), len(values))]
+    return [(0, len(values))]
+
+
+# Too many arguments (6/5) pylint: disable=R0913
+def __getwavecmds(wavetable, values, start, stop, bunchsize, maxcmdlen):
+    """Return list of "WAV PNT" command strings that write 'values[start:stop]' into 'wavetable'."""
+    maxitems = maxcmdlen - len('WAV %s & PNT %d %d ' % (wavetable, len(values), len(values)))
+    cmds = []
+    while start < stop:
+        if bunchsize:
+            end = min(start + bunchsize, stop)
+        else:
+            end, length = start, len(values[start]) + 1
+            while end < stop and length <= maxitems:
+                end += 1
+                length += len(values[end]) + 1 if end < stop else 0
+            end = max(end, start + 1)
+        cmds.append('WAV %s %s PNT %d %d %s' % (wavetable, '&' if start else 'X', start + 1, end - start,
+                                                ' '.join(values[start:end])))
+        start = end
+    return cmds
+
+
+def __findmismatch(values, expected, tolerance):
+    """Return index of the first item of 'values' that differs from 'expected' by more than 'tolerance' or None."""
+    if numpy is not None:
+        values, expected = numpy.asarray(values, dtype=float), numpy.asarray(expected, dtype=float)
+        indexes = numpy.nonzero(numpy.abs(values - expected) > tolerance * numpy.maximum(1., numpy.abs(expected)))[0]
+        return int(indexes[0]) if len(indexes) else None
+    for i, value in enumerate(values):
+        if abs(value - expected[i]) > tolerance * max(1., abs(expected[i])):
+            return i
+    return None
 
 
 def getaxeslist(pidevice, axes):
@@ -168,25 +311,85 @@ def waitonready(pidevice, timeout=60, predelay=0, polldelay=0.1):
     pidevice.checkerror()
 
 
-# Too many arguments (6/5) pylint: disable=R0913
-def waitontarget(pidevice, axes=None, timeout=60, predelay=0, postdelay=0, polldelay=0.1):
+def getprofiletime(distance, velocity, acceleration=None, deceleration=None):
+    """Return the time of a trapezoidal or triangular velocity profile.
+    @param distance : Distance to move as float.
+    @param velocity : Maximum velocity as float.
+    @param acceleration : Acceleration as float or None for an infinite acceleration.
+    @param deceleration : Deceleration as float or None to use 'acceleration'.
+    @return : Time in seconds as float, 0 if 'velocity' is not positive.
+    """
+    distance = abs(distance)
+    deceleration = deceleration or acceleration
+    if not distance or not velocity or velocity <= 0:
+        return 0.
+    if not acceleration or acceleration <= 0 or deceleration <= 0:
+        return distance / velocity
+    accdist = velocity ** 2 / (2. * acceleration)
+    decdist = velocity ** 2 / (2. * deceleration)
+    if accdist + decdist <= distance:
+        return velocity / acceleration + velocity / deceleration + (distance - accdist - decdist) / velocity
+    peak = (2. * distance * acceleration * deceleration / (acceleration + deceleration)) ** 0.5
+    return peak / acceleration + peak / deceleration
+
+
+def getmovetime(pidevice, axes):
+    """Predict the remaining time of the current move of 'axes' from the distance between position and target
+    and the velocity, acceleration and deceleration of the axes. All values are queried in one GCSPipeline.
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param axes : Axis or list of axes or None for all axes.
+    @return : Predicted time in seconds as float, 0 if it cannot be predicted.
+    """
+    axes = getaxeslist(pidevice, axes)
+    if not axes or not (pidevice.HasqMOV() and pidevice.HasqPOS() and pidevice.HasqVEL()):
+        return 0.
+    with pidevice.pipeline() as pipe:
+        target, pos, vel = pipe.qMOV(axes), pipe.qPOS(axes), pipe.qVEL(axes)
+        acc = pipe.qACC(axes) if pidevice.HasqACC() else None
+        dec = pipe.qDEC(axes) if pidevice.HasqDEC() else None
+    target, pos, vel = target.result(), pos.result(), vel.result()
+    acc = acc.result() if acc else {}
+    dec = dec.result() if dec else {}
+    movetime = 0.
+    for axis in target:
+        movetime = max(movetime, getprofiletime(target[axis] - pos[axis], vel[axis], acc.get(axis), dec.get(axis)))
+    debug('getmovetime(axes=%r) = %.4f seconds', axes, movetime)
+    return movetime
+
+
+# Too many arguments (7/5) pylint: disable=R0913
+def waitontarget(pidevice, axes=None, timeout=60, predelay=0, postdelay=0, polldelay=0.1, adaptive=False):
     """Wait until all 'axes' are on target.
     @type pidevice : pipython.gcscommands.GCSCommands
     @param axes : Axes to wait for as string or list, or None to wait for all axes.
     @param timeout : Timeout in seconds as float, defaults to 60 seconds.
     @param predelay : Time in seconds as float until querying any state from controller.
     @param postdelay : Additional delay time in seconds as float after reaching desired state.
-    @param polldelay : Delay time between polls in seconds as float.
+    @param polldelay : Delay time between polls in seconds as float, maximum delay if 'adaptive' is True.
+    @param adaptive : If True sleep until shortly before the end of the move that is predicted by
+    getmovetime(), then poll with a delay that grows from MINPOLLDELAY to 'polldelay'. While the axes
+    are moving the cheaper IsMoving() is polled if available, then qONT() is queried once they stopped.
     """
     axes = getaxeslist(pidevice, axes)
     if not axes:
         return
     waitonready(pidevice, timeout, predelay)
     maxtime = time() + timeout
-    while not all(list(pidevice.qONT(axes).values())):
+    if adaptive:
+        sleep(min(getmovetime(pidevice, axes) * PREDICTMARGIN, timeout))
+        ismoving = pidevice.IsMoving if pidevice.HasIsMoving() else None
+        delay = MINPOLLDELAY
+    else:
+        ismoving = None
+        delay = polldelay
+    while True:
+        if ismoving is None or not any(list(ismoving(axes).values())):
+            if all(list(pidevice.qONT(axes).values())):
+                break
         if time() > maxtime:
             raise SystemError('waitontarget() timed out after %.1f seconds' % timeout)
-        sleep(polldelay)
+        sleep(delay)
+        delay = min(2 * delay, polldelay)
     sleep(postdelay)
 
 
@@ -300,6 +503,295 @@ def waitontrajectory(pidevice, trajectories=None, timeout=180, predelay=0, postd
     waitontarget(pidevice, timeout=timeout, predelay=0, postdelay=postdelay, polldelay=polldelay)
 
 
+class WaitCondition(object):  # Too few public methods pylint: disable=R0903
+    """Condition of a device that waitall() waits for, see condontarget() and the other "cond" functions."""
+
+    def __init__(self, pidevice, name, func):
+        """Condition of 'pidevice' that is met if 'func' returns True.
+        @type pidevice : pipython.gcscommands.GCSCommands
+        @param name : Description of the condition for the timing report of waitall() as string.
+        @param func : Callable without arguments that queries 'pidevice' and returns a boolean.
+        """
+        self.pidevice = pidevice
+        self.name = name
+        self.func = func
+
+    def __str__(self):
+        return 'WaitCondition(%s)' % self.name
+
+    def ismet(self):
+        """Query the device and return True if the condition is met."""
+        return bool(self.func())
+
+
+def condontarget(pidevice, axes=None):
+    """Return a WaitCondition that is met if all 'axes' are on target, see waitontarget().
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param axes : Axes to wait for as string or list, or None to wait for all axes.
+    @return : Instance of WaitCondition.
+    """
+    axes = getaxeslist(pidevice, axes)
+    return WaitCondition(pidevice, '%s: on target %r' % (pidevice, axes),
+                         lambda: not axes or all(list(pidevice.qONT(axes).values())))
+
+
+def condfastalign(pidevice, name=None):
+    """Return a WaitCondition that is met if the fast alignment processes 'name' are done, see waitonfastalign().
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param name : Name of the process as string or list.
+    @return : Instance of WaitCondition.
+    """
+    return WaitCondition(pidevice, '%s: fast alignment %r done' % (pidevice, name),
+                         lambda: not any(list(pidevice.qFRP(name).values())))
+
+
+def condautozero(pidevice, axes=None):
+    """Return a WaitCondition that is met if the autozero procedure of 'axes' is done, see waitonautozero().
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param axes : Axes to wait for as string or list, or None to wait for all axes.
+    @return : Instance of WaitCondition.
+    """
+    axes = getaxeslist(pidevice, axes)
+    return WaitCondition(pidevice, '%s: autozero %r done' % (pidevice, axes),
+                         lambda: not axes or all(list(pidevice.qATZ(axes).values())))
+
+
+def condwalk(pidevice, channels):
+    """Return a WaitCondition that is met if qOSN of 'channels' is zero, see waitonwalk().
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param channels : Channel or list of channels to wait for motion to finish.
+    @return : Instance of WaitCondition.
+    """
+    channels = channels if isinstance(channels, (list, tuple)) else [channels]
+    return WaitCondition(pidevice, '%s: no steps left on %r' % (pidevice, channels),
+                         lambda: all(list(x == 0 for x in list(pidevice.qOSN(channels).values()))))
+
+
+def condtrajectory(pidevice, trajectories=None):
+    """Return a WaitCondition that is met if all 'trajectories' are done, see waitontrajectory().
+    @type pidevice : pipython.gcscommands.GCSCommands
+    @param trajectories : Integer convertible or list of them or None for all trajectories.
+    @return : Instance of WaitCondition.
+    """
+    return WaitCondition(pidevice, '%s: trajectories %r done' % (pidevice, trajectories),
+                         lambda: not any(list(pidevice.qTGL(trajectories).values())))
+
+
+def waitall(conditions, timeout=60, polldelay=0.1):
+    """Wait until all 'conditions' are met. The conditions of each device are polled in a thread of their own,
+    so the devices are polled concurrently and the waiting time is the one of the slowest device.
+    @param conditions : WaitCondition or list of them, e.g. [condontarget(dev1), condtrajectory(dev2)].
+    @param timeout : Timeout in seconds as float for all conditions, defaults to 60 seconds.
+    @param polldelay : Delay time between polls of one device in seconds as float.
+    @return : List of dictionaries {'name': str, 'time': seconds until met as float, 'polls': int},
+    one for each condition in the order of 'conditions'.
+    """
+    conditions = conditions if isinstance(conditions, (list, tuple)) else [conditions]
+    report = [{'name': cond.name, 'time': None, 'polls': 0} for cond in conditions]
+    devices = []
+    for i, cond in enumerate(conditions):
+        for device in devices:
+            if device['pidevice'] is cond.pidevice:
+                device['indexes'].append(i)
+                break
+        else:
+            devices.append({'pidevice': cond.pidevice, 'indexes': [i], 'error': None})
+    starttime = time()
+    maxtime = starttime + timeout
+    stop = Event()
+
+    def poll(device):
+        """Poll the conditions of 'device' until all are met, stop is set or an error occurs."""
+        pending = list(device['indexes'])
+        try:
+            while pending and not stop.is_set():
+                for i in list(pending):
+                    report[i]['polls'] += 1
+                    if conditions[i].ismet():
+                        report[i]['time'] = time() - starttime
+                        pending.remove(i)
+                if pending:
+                    stop.wait(max(0., min(polldelay, maxtime - time())))
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            device['error'] = exc
+            stop.set()
+
+    threads = [Thread(target=poll, args=(device,)) for device in devices]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(max(0., maxtime - time()))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for device in devices:
+        if device['error'] is not None:
+            raise device['error']
+    pending = [item['name'] for item in report if item['time'] is None]
+    if pending:
+        raise SystemError('waitall() timed out after %.1f seconds on %s' % (timeout, ', '.join(pending)))
+    debug('waitall: %r', report)
+    return report
+
+
+def loadtargets(filename, separator=','):
+    """Read targets from a text file with one row of targets per line or from a NumPy ".npy" file.
+    Empty lines and lines that start with "#" are skipped.
+    @param filename : Name of the file as string.
+    @param separator : Separator of the values in a text file as string.
+    @return : List of rows as lists of float values or 2-dimensional numpy array for a ".npy" file.
+    """
+    if filename.lower().endswith('.npy'):
+        if numpy is None:
+            raise ImportError('numpy is required to read %r' % filename)
+        return numpy.load(filename)
+    targets = []
+    with open(filename) as fobj:
+        for line in fobj:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                targets.append([float(x) for x in line.split(separator)])
+    return targets
+
+
+# Too many instance attributes pylint: disable=R0902
+class MotionSequence(object):
+    """Move axes through a list of targets with as few round trips as possible.
+    The error is queried deferred, see GCSCommands.deferred(). If 'waitontarget' is True the end of each move is
+    predicted from the distance and the velocity profile of the axes like waitontarget(adaptive=True) does, but
+    the profile is queried only once. The next target is prepared while the axes are moving. After an error or a
+    timeout self.index is the first target that is not confirmed yet, so run() resumes the sequence from there.
+    """
+
+    # Too many arguments (9/5) pylint: disable=R0913
+    def __init__(self, pidevice, targets, axes=None, dwell=0, waitontarget=True, trigger=None,
+                 numcmds=DEFERREDCMDS, timeout=60, polldelay=0.1):
+        """Move 'axes' through 'targets' when self.run() is called.
+        @type pidevice : pipython.gcscommands.GCSCommands
+        @param targets : List of rows, 2-dimensional numpy array or file name, see loadtargets().
+        Each row holds the targets of 'axes'.
+        @param axes : Axes to move as list or None for as many axes of 'pidevice' as there are columns.
+        @param dwell : Time in seconds as float to stay on each target, or list of them with one item per row.
+        @param waitontarget : If True wait until the axes are on target before the dwell time begins.
+        @param trigger : Callable 'trigger(index, row)' that is called after the dwell time of each target or None.
+        @param numcmds : If 'waitontarget' is False the error is queried after this number of targets.
+        @param timeout : Timeout in seconds as float for each target.
+        @param polldelay : Maximum delay between polls of the on target state in seconds as float.
+        """
+        if isinstance(targets, basestring):
+            targets = loadtargets(targets)
+        self.__pidevice = pidevice
+        self.__targets = targets
+        numcolumns = len(targets[0]) if len(targets) else 0
+        self.axes = getaxeslist(pidevice, axes)[:numcolumns]
+        self.dwell = dwell
+        self.waitontarget = waitontarget
+        self.trigger = trigger
+        self.numcmds = numcmds
+        self.timeout = timeout
+        self.polldelay = polldelay
+        self.index = 0
+        self.report = None
+        self.__profile = None
+
+    def __str__(self):
+        return 'MotionSequence(pidevice=%s, axes=%r, targets=%d)' % (self.__pidevice, self.axes, len(self))
+
+    def __len__(self):
+        return len(self.__targets)
+
+    def run(self, start=None):
+        """Move through the targets from self.index or 'start' to the end.
+        Raises GCSError of the device or SystemError on timeout, then self.index is the target to resume with.
+        @param start : Index of the first target as integer or None to continue at self.index.
+        @return : Dictionary {'points': int, 'time': seconds as float, 'pointspersecond': float}, see self.report.
+        """
+        if start is not None:
+            self.index = start
+        self.__profile = self.__getprofile() if self.waitontarget else None
+        debug('MotionSequence.run: start at %d of %d targets', self.index, len(self))
+        starttime = time()
+        numpoints = 0
+        checked = self.index
+        previous = None
+        try:
+            with self.__pidevice.deferred(numcmds=None) as deferred:
+                row = self.__getrow(self.index)
+                while row is not None:
+                    index = self.index
+                    self.__pidevice.MOV(self.axes, row)
+                    self.index += 1
+                    movetime = self.__getmovetime(previous, row)
+                    nextrow = self.__getrow(self.index)
+                    if self.waitontarget:
+                        self.__waitontarget(movetime)
+                        checked = self.index
+                    elif self.index - checked >= self.numcmds:
+                        deferred.check()
+                        checked = self.index
+                    sleep(self.dwell[index] if hasattr(self.dwell, '__getitem__') else self.dwell)
+                    if self.trigger is not None:
+                        self.trigger(index, row)
+                    previous, row = row, nextrow
+                    numpoints += 1
+                deferred.check()
+                checked = self.index
+        except (GCSError, SystemError):
+            self.index = checked
+            raise
+        finally:
+            elapsed = time() - starttime
+            self.report = {'points': numpoints, 'time': elapsed,
+                           'pointspersecond': numpoints / elapsed if elapsed > 0 else 0.}
+            debug('MotionSequence.run: %r', self.report)
+        return self.report
+
+    def __getrow(self, index):
+        """Return the targets of row 'index' as list of float values or None after the last row."""
+        if index >= len(self.__targets):
+            return None
+        return [float(x) for x in self.__targets[index]]
+
+    def __getprofile(self):
+        """Query the current targets and the velocity profile of self.axes in one GCSPipeline.
+        @return : Dictionary {'targets': list, 'vel': list, 'acc': list, 'dec': list} or empty if not supported.
+        """
+        pidevice = self.__pidevice
+        if not (pidevice.HasqMOV() and pidevice.HasqVEL()):
+            return {}
+        with pidevice.pipeline() as pipe:
+            target, vel = pipe.qMOV(self.axes), pipe.qVEL(self.axes)
+            acc = pipe.qACC(self.axes) if pidevice.HasqACC() else None
+            dec = pipe.qDEC(self.axes) if pidevice.HasqDEC() else None
+        profile = {'targets': list(target.result().values()), 'vel': list(vel.result().values())}
+        profile['acc'] = list(acc.result().values()) if acc else [None] * len(self.axes)
+        profile['dec'] = list(dec.result().values()) if dec else profile['acc']
+        return profile
+
+    def __getmovetime(self, previous, row):
+        """Predict the time of the move from 'previous' to 'row' in seconds as float."""
+        if not self.__profile:
+            return 0.
+        previous = self.__profile['targets'] if previous is None else previous
+        movetime = 0.
+        for i, target in enumerate(row):
+            movetime = max(movetime, getprofiletime(target - previous[i], self.__profile['vel'][i],
+                                                    self.__profile['acc'][i], self.__profile['dec'][i]))
+        return movetime
+
+    def __waitontarget(self, movetime):
+        """Sleep most of 'movetime' and poll the on target state with a growing delay."""
+        maxtime = time() + self.timeout
+        sleep(min(movetime * PREDICTMARGIN, self.timeout))
+        delay = MINPOLLDELAY
+        while not all(list(self.__pidevice.qONT(self.axes).values())):
+            if time() > maxtime:
+                raise SystemError('MotionSequence timed out after %.1f seconds' % self.timeout)
+            sleep(delay)
+            delay = min(2 * delay, self.polldelay)
+
+
 def stopall(pidevice):
     """Stop motion of all axes and mask the "error 10" warning.
     @type pidevice : pipython.gcscommands.GCSCommands
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Poll the axes status of a PI device in one background task and share it with many readers."""
+
+from collections import OrderedDict
+from logging import debug, error
+from threading import Event, Lock, Thread
+from time import time
+
+from pipython.pitools import getaxeslist
+
+__signature__ = 0x1c93e5a07b2f46d8e05a9c3d71b48f60
+
+POLLINTERVAL = 0.02  # seconds, i.e. 50 Hz
+
+
+class StatusSnapshot(object):
+    """Status of the axes of a device at one point in time. Must not be changed, it is shared by all readers."""
+
+    def __init__(self, timestamp, pos, ont=None, svo=None, moving=None):
+        """Status of the axes of a device at one point in time.
+        @param timestamp : Time when the status has been queried in seconds as float, see time.time().
+        @param pos : Ordered dictionary {axis: position} as returned by qPOS().
+        @param ont : Ordered dictionary {axis: on target state} or None if qONT() is not supported.
+        @param svo : Ordered dictionary {axis: servo state} or None if qSVO() is not supported.
+        @param moving : Ordered dictionary {axis: moving state} or None if IsMoving() is not supported.
+        """
+        self.time = timestamp
+        self.pos = pos
+        self.ont = ont
+        self.svo = svo
+        self.moving = moving
+
+    def __str__(self):
+        return 'StatusSnapshot(age=%.3f s, pos=%s)' % (self.age, dict(self.pos))
+
+    def __eq__(self, other):
+        """Return True if the states of 'other' are equal, the time is not compared."""
+        if not isinstance(other, StatusSnapshot):
+            return False
+        return (self.pos, self.ont, self.svo, self.moving) == (other.pos, other.ont, other.svo, other.moving)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    @property
+    def age(self):
+        """Return the age of the status in seconds as float."""
+        return time() - self.time
+
+    def select(self, axes):
+        """Return a StatusSnapshot of the same time with the states of 'axes' only.
+        @param axes : Axis or list of axes that have been polled.
+        @return : Instance of StatusSnapshot.
+        """
+        axes = [str(axis) for axis in (axes if isinstance(axes, (list, tuple)) else [axes])]
+        missing = [axis for axis in axes if axis not in self.pos]
+        if missing:
+            raise KeyError('axes %r have not been polled' % missing)
+        states = []
+        for items in (self.pos, self.ont, self.svo, self.moving):
+            states.append(None if items is None else OrderedDict([(axis, items[axis]) for axis in axes]))
+        return StatusSnapshot(self.time, *states)
+
+    def ontarget(self, axes=None):
+        """Return dictionary of on target states like pipython.pitools.ontarget() but without a query.
+        Open loop axes and closed loop axes without on target or moving state return True.
+        @param axes : Axis or list of axes or None for all polled axes.
+        @return : Dictionary of boolean ontarget states of 'axes'.
+        """
+        if axes is None:
+            axes = list(self.pos.keys())
+        elif not isinstance(axes, (list, tuple)):
+            axes = [axes]
+        isontarget = {}
+        for axis in axes:
+            if self.svo is not None and not self.svo[axis]:
+                isontarget[axis] = True
+            elif self.ont is not None:
+                isontarget[axis] = self.ont[axis]
+            elif self.moving is not None:
+                isontarget[axis] = not self.moving[axis]
+            else:
+                isontarget[axis] = True
+        return isontarget
+
+
+class StatusMonitor(object):
+    """Poll the status of the axes of a device in a background task, can be used as context manager.
+    Position, on target and servo state are queried together in one GCSPipeline, i.e. one round trip. The moving
+    state is queried after it, since single character commands like "#5" cannot be pipelined.
+    The latest StatusSnapshot is replaced as a whole, so readers do not need a lock to use it.
+    """
+
+    def __init__(self, pidevice, axes=None, interval=POLLINTERVAL):
+        """Poll the status of 'axes' of 'pidevice' every 'interval' seconds after self.start() has been called.
+        @type pidevice : pipython.gcscommands.GCSCommands
+        @param axes : Axis or list of axes or None for all axes.
+        @param interval : Time between two polls in seconds as float.
+        """
+        debug('create an instance of StatusMonitor(pidevice=%s, axes=%r, interval=%r)', pidevice, axes, interval)
+        self.__pidevice = pidevice
+        self.__axes = getaxeslist(pidevice, axes)
+        self.__hasont = pidevice.HasqONT()
+        self.__hassvo = pidevice.HasqSVO()
+        self.__hasmoving = pidevice.HasIsMoving()
+        self.interval = interval
+        self.error = None
+        self.__snapshot = None
+        self.__polllock = Lock()
+        self.__callbacks = []
+        self.__stop = Event()
+        self.__thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __str__(self):
+        return 'StatusMonitor(pidevice=%s, axes=%r)' % (self.__pidevice, self.__axes)
+
+    @property
+    def axes(self):
+        """Get list of polled axes."""
+        return self.__axes
+
+    @property
+    def snapshot(self):
+        """Get the latest StatusSnapshot or None if the device has not been polled yet."""
+        return self.__snapshot
+
+    @property
+    def running(self):
+        """Return True if the background task is polling the device."""
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """Start the background task that polls the device."""
+        if self.running:
+            return
+        debug('StatusMonitor.start: poll %r every %.3f seconds', self.__axes, self.interval)
+        self.__stop.clear()
+        self.__thread = Thread(target=self.__run, name=str(self))
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """Stop the background task and wait until it has finished."""
+        debug('StatusMonitor.stop()')
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def get(self, axes=None, max_age=None):
+        """Return a StatusSnapshot that is not older than 'max_age'. The device is queried only if the
+        latest snapshot is too old. Several readers that find it too old at the same time share one query.
+        @param axes : Axis or list of polled axes to return the states of, see StatusSnapshot.select(), or None
+        for all polled axes, then the shared snapshot is returned.
+        @param max_age : Maximum age in seconds as float or None to accept any polled snapshot.
+        @return : Instance of StatusSnapshot.
+        """
+        snapshot = self.__snapshot
+        if snapshot is None or (max_age is not None and snapshot.age > max_age):
+            snapshot = self.poll(max_age)
+        return snapshot if axes is None else snapshot.select(axes)
+
+    def poll(self, max_age=0):
+        """Query the status of the device now unless another thread has just done so.
+        Calls the subscribed callbacks if the status has changed.
+        @param max_age : Accept a snapshot that has been polled in the meantime up to this age in seconds.
+        @return : Instance of StatusSnapshot.
+        """
+        with self.__polllock:
+            snapshot = self.__snapshot
+            if snapshot is not None and max_age and snapshot.age <= max_age:
+                return snapshot
+            timestamp = time()
+            with self.__pidevice.pipeline() as pipe:
+                pos = pipe.qPOS(self.__axes)
+                ont = pipe.qONT(self.__axes) if self.__hasont else None
+                svo = pipe.qSVO(self.__axes) if self.__hassvo else None
+            moving = self.__pidevice.IsMoving(self.__axes) if self.__hasmoving else None
+            current = StatusSnapshot(timestamp, pos.result(), ont and ont.result(), svo and svo.result(), moving)
+            self.__snapshot = current
+            callbacks = self.__callbacks if current != snapshot else []
+        for func in callbacks:
+            try:
+                func(snapshot, current)
+            except Exception as exc:  # Catching too general exception pylint: disable=W0703
+                error('StatusMonitor: callback %r failed: %s', func, exc)
+        return current
+
+    def subscribe(self, func):
+        """Call 'func(previous, current)' with the previous and the current StatusSnapshot if the status
+        has changed. 'previous' is None on the first poll. 'func' is called by the polling thread and must
+        not block it for long.
+        @param func : Callable with two arguments.
+        """
+        with self.__polllock:
+            self.__callbacks = self.__callbacks + [func]
+
+    def unsubscribe(self, func):
+        """Do not call 'func' any longer.
+        @param func : Callable that has been passed to self.subscribe().
+        """
+        with self.__polllock:
+            self.__callbacks = [x for x in self.__callbacks if x != func]
+
+    def __run(self):
+        """Poll the device until self.stop() is called. Errors are logged and saved in self.error."""
+        while not self.__stop.is_set():
+            nextpoll = time() + self.interval
+            try:
+                self.poll(max_age=self.interval / 2.)
+                self.error = None
+            except Exception as exc:  # Catching too general exception pylint: disable=W0703
+                error('StatusMonitor: poll failed: %s', exc)
+                self.error = exc
+            self.__stop.wait(max(0., nextpoll - time()))
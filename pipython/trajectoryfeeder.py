@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Stream trajectories of any length into the dynamic move buffer of a PI device."""
+
+from logging import debug, error, warning
+from threading import Event, Thread
+
+__signature__ = 0x7e05b2c9f1a4d83e6c0b9a5f2d7148e3
+
+HIGHWATER = 200  # values per trajectory that are kept in the buffer
+POINTSPERCMD = 8  # values per trajectory that are appended with one TGA command
+FEEDINTERVAL = 0.02  # seconds between two refills of the buffer
+
+
+# Too many instance attributes pylint: disable=R0902
+class TrajectoryFeeder(object):
+    """Keep the buffers of trajectories filled from an iterable in a background task, can be used as context
+    manager. Each refill is one GCSPipeline, i.e. one round trip, that appends the values with TGA and queries the
+    new buffer level with qTGL. If supported, the free buffer space is queried with "#11" after it, since single
+    character commands cannot be pipelined. The number of values that are appended is the distance to the
+    high-water mark plus what the device has consumed since the last refill.
+    When the iterable is exhausted the trajectories are finished with TGF.
+    """
+
+    # Too many arguments (7/5) pylint: disable=R0913
+    def __init__(self, pidevice, trajectories, points, highwater=HIGHWATER, pointspercmd=POINTSPERCMD,
+                 interval=FEEDINTERVAL):
+        """Feed 'points' into 'trajectories' of 'pidevice' after self.start() or self.run() has been called.
+        @type pidevice : pipython.gcscommands.GCSCommands
+        @param trajectories : Trajectory ID as integer or list of them.
+        @param points : Iterable, e.g. generator or numpy array, of rows with one value per trajectory.
+        A single value is accepted as row for a single trajectory.
+        @param highwater : Number of values per trajectory to keep in the buffer as integer.
+        @param pointspercmd : Number of values per trajectory to append with one TGA command as integer. Use 1
+        if the firmware does not accept the same trajectory ID more than once in a TGA command.
+        @param interval : Time between two refills of the buffer in seconds as float.
+        """
+        debug('create an instance of TrajectoryFeeder(pidevice=%s, trajectories=%r, highwater=%r)', pidevice,
+              trajectories, highwater)
+        self.__pidevice = pidevice
+        self.__trajectories = list(trajectories) if isinstance(trajectories, (list, tuple)) else [trajectories]
+        self.__points = iter(points)
+        self.__hasfree = pidevice.HasGetDynamicMoveBufferSize()
+        self.highwater = highwater
+        self.pointspercmd = pointspercmd
+        self.interval = interval
+        self.sent = 0
+        self.underruns = 0
+        self.minlevel = None
+        self.exhausted = False
+        self.error = None
+        self.__free = None
+        self.__stop = Event()
+        self.__thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __str__(self):
+        return 'TrajectoryFeeder(pidevice=%s, trajectories=%r)' % (self.__pidevice, self.__trajectories)
+
+    @property
+    def running(self):
+        """Return True if the background task is feeding the device."""
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def report(self):
+        """Return dictionary {'sent': int, 'underruns': int, 'minlevel': int, 'exhausted': bool}.
+        'sent' is the number of rows that have been appended, 'minlevel' is the lowest buffer level that has
+        been seen before a refill and 'underruns' counts the refills that found an empty buffer.
+        """
+        return {'sent': self.sent, 'underruns': self.underruns, 'minlevel': self.minlevel,
+                'exhausted': self.exhausted}
+
+    def start(self):
+        """Start the background task that fills, starts and feeds the trajectories."""
+        if self.running:
+            return
+        debug('TrajectoryFeeder.start()')
+        self.__stop.clear()
+        self.__thread = Thread(target=self.__run, name=str(self))
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """Stop feeding and wait until the background task has finished. The trajectories are not stopped."""
+        debug('TrajectoryFeeder.stop()')
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def wait(self, timeout=None):
+        """Wait until all points have been appended and raise the error of the background task if any.
+        @param timeout : Timeout in seconds as float or None to wait forever.
+        @return : True if the background task has finished.
+        """
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            if self.__thread.is_alive():
+                return False
+        if self.error is not None:
+            raise self.error  # Raising NoneType pylint: disable=E0702
+        return True
+
+    def run(self):
+        """Fill and start the trajectories and feed them until all points are appended or self.stop() is
+        called. Raises GCSError, e.g. if the device reports a buffer underrun.
+        """
+        debug('TrajectoryFeeder.run: fill %r up to %d values', self.__trajectories, self.highwater)
+        self.__free = self.__pidevice.GetDynamicMoveBufferSize() if self.__hasfree else None
+        level, _ = self.__refill(self.highwater, start=True)
+        consumed = 0
+        while not self.exhausted and not self.__stop.wait(self.interval):
+            lastlevel = level
+            level, appended = self.__refill(self.highwater - lastlevel + consumed)
+            before = max(0, level - appended)
+            consumed = max(0, lastlevel - before)
+            self.minlevel = before if self.minlevel is None else min(self.minlevel, before)
+            if before <= 0:
+                self.underruns += 1
+                warning('TrajectoryFeeder: buffer of %r has run empty', self.__trajectories)
+        debug('TrajectoryFeeder.run: %r', self.report)
+
+    def __refill(self, count, start=False):
+        """Append up to 'count' rows in one GCSPipeline, query the buffer level with it and the free space after it.
+        @param count : Number of rows to append as integer.
+        @param start : If True start the trajectories with TGS after the values have been appended.
+        @return : Tuple (level, appended) with the lowest buffer level of the trajectories after the
+        refill and the number of appended rows.
+        """
+        if self.__free is not None:
+            count = min(count, self.__free // len(self.__trajectories))
+        rows = self.__getrows(count)
+        with self.__pidevice.pipeline() as pipe:
+            for i in range(0, len(rows), self.pointspercmd):
+                batch = rows[i:i + self.pointspercmd]
+                pipe.TGA(self.__trajectories * len(batch), [value for row in batch for value in row])
+            if start:
+                pipe.TGS(self.__trajectories)
+            if self.exhausted:
+                pipe.TGF(self.__trajectories)
+            level = pipe.qTGL(self.__trajectories)
+        self.sent += len(rows)
+        self.__free = self.__pidevice.GetDynamicMoveBufferSize() if self.__hasfree else None
+        return min(level.result().values()), len(rows)
+
+    def __getrows(self, count):
+        """Return list of up to 'count' rows from the points as lists of float values."""
+        rows = []
+        for _ in range(max(0, count)):
+            try:
+                row = next(self.__points)
+            except StopIteration:
+                self.exhausted = True
+                break
+            rows.append([float(x) for x in row] if hasattr(row, '__len__') else [float(row)])
+        return rows
+
+    def __run(self):
+        """Call self.run() in the background task. Errors are logged and saved in self.error."""
+        try:
+            self.run()
+        except Exception as exc:  # Catching too general exception pylint: disable=W0703
+            error('TrajectoryFeeder: feeding failed: %s', exc)
+            self.error = exc
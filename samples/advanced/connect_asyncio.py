@@ -0,0 +1,34 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example shows how to control several controllers via socket from one asyncio event loop."""
+
+import asyncio
+
+from pipython.gcsasync import AsyncGCSCommands, AsyncGCSMessages
+from pipython.interfaces.asyncsocket import AsyncPISocket
+
+IPADDRS = ('192.168.90.166', '192.168.90.167')
+
+
+async def showposition(ipaddr):
+    """Connect controller via socket on port 50000 and query its position."""
+    async with AsyncPISocket(host=ipaddr, port=50000) as gateway:
+        pidevice = AsyncGCSCommands(AsyncGCSMessages(gateway))
+        print('connected: {}'.format((await pidevice.qIDN()).strip()))
+        print('position of {}: {}'.format(ipaddr, await pidevice.qPOS()))
+
+
+async def showpositions():
+    """Query all controllers concurrently."""
+    await asyncio.gather(*[showposition(ipaddr) for ipaddr in IPADDRS])
+
+
+def main():
+    """Run the event loop."""
+    asyncio.run(showpositions())
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example measures the host CPU time per query while the answers of a simulated controller are waited for."""
+
+import os
+from time import time
+
+from pipython.gcscommands import GCSCommands
+from pipython.gcsmessages import GCSMessages
+from pipython.interfaces.pigateway import PIGateway
+from pipython.interfaces.pisocket import PISocket
+from pipython.replyserver import ReplyServer
+
+PORT = 50124
+DELAY = 5  # milliseconds until the simulated controller answers
+NUMQUERIES = 50
+
+
+class BusyPolling(PISocket):
+    """Socket that returns at once while no answer is available, like the loop before waitforanswer()."""
+
+    def waitforanswer(self, timeout):
+        """Do not wait."""
+        return bool(self.answersize)
+
+
+class Backoff(PISocket):
+    """Socket that uses the polling with backoff of PIGateway, as GCSDll does."""
+
+    def waitforanswer(self, timeout):
+        """Poll with an exponentially growing delay."""
+        return PIGateway.waitforanswer(self, timeout)
+
+
+def cputime():
+    """Return the user and system CPU time of this process in seconds as float."""
+    times = os.times()
+    return times[0] + times[1]
+
+
+def main():
+    """Query the position of a simulated controller and print the CPU and wall time per query."""
+    with ReplyServer(port=PORT) as server:
+        server.delay = DELAY
+        server.append('POS? 1\n', '1=0.0\n')
+        server.append('ERR?\n', '0\n')
+        for name, gatewayclass in (('busy polling (before)', BusyPolling), ('select, PISocket', PISocket),
+                                   ('backoff, PIGateway', Backoff)):
+            with gatewayclass(port=PORT) as gateway:
+                pidevice = GCSCommands(GCSMessages(gateway))
+                startcpu, start = cputime(), time()
+                for _ in range(NUMQUERIES):
+                    pidevice.qPOS('1')
+                cpu, wall = cputime() - startcpu, time() - start
+            print('{:24s} CPU {:5.2f} ms, wall {:5.2f} ms per query'.format(
+                name, cpu * 1000 / NUMQUERIES, wall * 1000 / NUMQUERIES))
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example shows how to log data recorder data continuously into a ".npy" file."""
+
+from pipython import GCSDevice, datarectools
+from pipython.gcsdata import NpyFileSink
+
+CONTROLLERNAME = 'E-727'
+FILENAME = 'datarecorder.npy'
+
+RECRATE = 10000  # number of recordings per second, i.e. in Hz
+DURATION = 60  # time in seconds to log the data
+
+
+def main():
+    """Connect device, arm the data recorder and write the data into a file while it is recorded."""
+    with GCSDevice(CONTROLLERNAME) as pidevice:
+        pidevice.InterfaceSetupDlg(key='sample')
+        print('connected: {}'.format(pidevice.qIDN().strip()))
+        drec = datarectools.Datarecorder(pidevice)
+        drec.samplefreq = RECRATE
+        drec.options = (datarectools.RecordOptions.ACTUAL_POSITION_2, datarectools.RecordOptions.COMMANDED_POSITION_1)
+        drec.sources = pidevice.axes[0]
+        drec.trigsources = datarectools.TriggerSources.DEFAULT_0
+        drec.arm()
+        print('log data recorder for {} seconds at {:.2f} Hz'.format(DURATION, drec.samplefreq))
+        stream = drec.stream(sink=NpyFileSink(FILENAME))
+        stream.run(DURATION)
+        print('report: {}'.format(stream.report))
+        if stream.overruns:
+            print('the link cannot keep up, data has been lost')
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
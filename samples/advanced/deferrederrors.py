@@ -0,0 +1,38 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example measures how many set commands per second can be sent with deferred error check."""
+
+from time import time
+
+from pipython.gcscommands import GCSCommands
+from pipython.gcsmessages import GCSMessages
+from pipython.interfaces.pisocket import PISocket
+from pipython.replyserver import ReplyServer
+
+PORT = 50124
+NUMCMDS = 500
+
+
+def main():
+    """Send MOV commands to a simulated controller with different error check windows."""
+    with ReplyServer(port=PORT) as server:
+        server.append('MOV 1 1\n')
+        server.append('ERR?\n', '0\n')
+        with PISocket(port=PORT) as gateway:
+            pidevice = GCSCommands(GCSMessages(gateway))
+            start = time()
+            for _ in range(NUMCMDS):
+                pidevice.MOV('1', 1.0)
+            print('error check each command: %.0f commands/s' % (NUMCMDS / (time() - start)))
+            for numcmds in (4, 16, 64, 256):
+                start = time()
+                with pidevice.deferred(numcmds=numcmds):
+                    for _ in range(NUMCMDS):
+                        pidevice.MOV('1', 1.0)
+                print('error check every %3d commands: %.0f commands/s' % (numcmds, NUMCMDS / (time() - start)))
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
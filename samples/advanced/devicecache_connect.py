@@ -0,0 +1,32 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example shows how to restore the capabilities of a known device to connect to it faster."""
+
+from time import time
+
+from pipython import GCSDevice, datarectools
+from pipython.devicecache import DeviceCache
+
+CONTROLLERNAME = 'E-727'
+
+
+def main():
+    """Connect device, restore its capabilities from the device cache and save them for the next time."""
+    cache = DeviceCache()
+    with GCSDevice(CONTROLLERNAME) as pidevice:
+        pidevice.InterfaceSetupDlg(key='sample')
+        start = time()
+        restored = cache.load(pidevice)
+        print('connected: {}'.format(pidevice.devname))
+        print('axes: {}, {} supported functions'.format(pidevice.axes, len(pidevice.funcs)))
+        print('servo cycle time: {} s'.format(datarectools.getservotime(pidevice)))
+        print('{} the capabilities in {:.3f} seconds'.format('restored' if restored else 'queried', time() - start))
+        if not restored:
+            cache.save(pidevice)
+            print('saved the capabilities to {}'.format(cache.filename))
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example compares how fast GCS data is parsed into lists and into a numpy array."""
+
+from time import time
+
+from pipython.gcscommands import GCSCommands
+from pipython.gcsmessages import GCSMessages
+from pipython.interfaces.pigateway import PIGateway
+
+NUMVALUES = 1000000  # number of data lines with two columns
+CHUNKSIZE = 65536  # bytes per call of getanswer(), like a socket read
+
+
+class MemoryGateway(PIGateway):
+    """Answer each query with the GCS data in 'gcsdata', so that only the parsing takes time."""
+
+    def __init__(self, gcsdata):
+        self.__gcsdata = gcsdata
+        self.__buffer = ''
+        self.__pos = 0
+
+    def __str__(self):
+        return 'MemoryGateway()'
+
+    @property
+    def connectionid(self):
+        return 0
+
+    def send(self, msg):
+        self.__buffer = '0\n' if 'ERR?' in msg else self.__gcsdata
+        self.__pos = 0
+
+    @property
+    def answersize(self):
+        return min(CHUNKSIZE, len(self.__buffer) - self.__pos)
+
+    def getanswer(self, bufsize):
+        answer = self.__buffer[self.__pos:self.__pos + bufsize]
+        self.__pos += len(answer)
+        return answer
+
+
+def main():
+    """Read the same GCS data as lists and as numpy array and print the time it took."""
+    gcsdata = '# NDATA = %d \n# END_HEADER \n' % NUMVALUES
+    gcsdata += '1.234567 -2.345678 \n' * (NUMVALUES - 1) + '1.234567 -2.345678\n'
+    pidevice = GCSCommands(GCSMessages(MemoryGateway(gcsdata)))
+    for usenumpy in (False, True):
+        pidevice.usenumpy = usenumpy
+        start = time()
+        transfer = pidevice.submit_gcsdata('DRR? 1 %d 1 2' % NUMVALUES, NUMVALUES)
+        transfer.wait()
+        print('{}: {} lines in {:.2f} seconds'.format('numpy' if usenumpy else 'lists', len(transfer.data[0]),
+                                                     time() - start))
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example measures how fast abbreviated names of record options and trigger sources are resolved."""
+
+from time import time
+
+from pipython import datarectools
+
+REPEAT = 100  # number of lookups of each name after the first one
+
+
+def getabbreviations(enumclass):
+    """Return list of abbreviations of all names in 'enumclass', e.g. "FAST_AL_GR_SC" style and lower case.
+    @param enumclass : datarectools.RecordOptions or datarectools.TriggerSources.
+    @return : List of strings.
+    """
+    names = []
+    for item in dir(enumclass):
+        if item.startswith('_'):
+            continue
+        names.append('_'.join(part if part.isdigit() else part[0] + part[2::2] for part in item.split('_')))
+        names.append(item.lower())
+    return names
+
+
+def main():
+    """Resolve all names once, which builds the index, and then repeatedly, which uses the resolved names."""
+    for func, enumclass in ((datarectools.getrecopt, datarectools.RecordOptions),
+                            (datarectools.gettrigsources, datarectools.TriggerSources)):
+        names = getabbreviations(enumclass)
+        start = time()
+        for name in names:
+            func(name)
+        first = (time() - start) / len(names)
+        start = time()
+        for _ in range(REPEAT):
+            for name in names:
+                func(name)
+        repeated = (time() - start) / len(names) / REPEAT
+        print('{}: {} names, first lookup {:.1f} us, repeated lookup {:.2f} us'.format(
+            enumclass.__name__, len(names), first * 1e6, repeated * 1e6))
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example measures how fast StopAll() returns while GCS data is read in the background."""
+
+from time import time
+
+from pipython.gcscommands import GCSCommands
+from pipython.gcsmessages import GCSMessages
+from pipython.interfaces.pisocket import PISocket
+from pipython.replyserver import ReplyServer
+
+PORT = 50123
+NUMVALUES = 100000
+
+
+def main():
+    """Read 100k lines of recorded data from a simulated controller and stop it meanwhile."""
+    gcsdata = '# NDATA = %d \n# END_HEADER \n' % NUMVALUES
+    gcsdata += '1.234567 -2.345678 \n' * (NUMVALUES - 1) + '1.234567 -2.345678\n'
+    with ReplyServer(port=PORT) as server:
+        server.append('DRR? 1 %d 1 2\n' % NUMVALUES, gcsdata)
+        server.append('POS? 1\n', '1=0.0\n')
+        server.append('ERR?\n', '0\n')
+        server.append(chr(24), '')
+        with PISocket(port=PORT) as gateway:
+            pidevice = GCSCommands(GCSMessages(gateway))
+            for name, func in (('StopAll()', pidevice.StopAll), ('qPOS(1)', lambda: pidevice.qPOS(1))):
+                start = time()
+                pidevice.qDRR([1, 2], 1, NUMVALUES)
+                header = time()
+                func()
+                latency = time() - header
+                pidevice.transfer.wait()
+                print('%s returned after %.2f ms, qDRR() took %.1f ms' %
+                      (name, latency * 1000, (time() - start) * 1000))
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""This example shows how to stream an endless circular trajectory into the dynamic move buffer."""
+
+from math import cos, pi, sin
+from time import sleep
+
+from pipython import GCSDevice, pitools
+from pipython.trajectoryfeeder import TrajectoryFeeder
+
+CONTROLLERNAME = 'C-887'
+STAGES = None  # set something like ('M-122.2DD', 'M-122.2DD') if your stages need CST
+REFMODE = ('FRF',)  # reference first axis or hexapod
+
+NUMPOINTS = 1000  # number of trajectory points for one circle as integer
+AMPLITUDE = 1.0  # radius of the circle as float
+DURATION = 10  # time in seconds to stream the trajectory
+
+
+def circle():
+    """Yield the points of an endless circle around the origin as (x, y) tuples."""
+    index = 0
+    while True:
+        angle = 2 * pi * index / NUMPOINTS
+        yield AMPLITUDE * cos(angle), AMPLITUDE * sin(angle)
+        index += 1
+
+
+def main():
+    """Connect controller, setup stages and stream the trajectory."""
+    with GCSDevice(CONTROLLERNAME) as pidevice:
+        pidevice.InterfaceSetupDlg(key='sample')
+        print('connected: {}'.format(pidevice.qIDN().strip()))
+        print('initialize connected stages...')
+        pitools.startup(pidevice, stages=STAGES, refmode=REFMODE)
+        runtrajectory(pidevice)
+
+
+def runtrajectory(pidevice):
+    """Move to the start of the circle and stream the trajectory for DURATION seconds.
+    @type pidevice : pipython.gcscommands.GCSCommands
+    """
+    trajectories = (1, 2)
+    pidevice.MOV(pidevice.axes[:2], (AMPLITUDE, 0.0))
+    pitools.waitontarget(pidevice, pidevice.axes[:2])
+    pidevice.TGC(trajectories)
+    print('stream trajectories {} for {} seconds'.format(trajectories, DURATION))
+    with TrajectoryFeeder(pidevice, trajectories, circle()) as feeder:
+        sleep(DURATION)
+        print('feeder: {}'.format(feeder.report))
+    pidevice.TGF(trajectories)
+    pitools.waitontrajectory(pidevice, trajectories)
+    print('done')
+
+
+if __name__ == '__main__':
+    # import logging
+    # logging.basicConfig(level=logging.DEBUG)
+    main()
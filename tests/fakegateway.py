@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Gateway that answers GCS commands from a dictionary instead of a device, for the tests."""
+
+from pipython.gcscommands import GCSCommands
+from pipython.gcsmessages import GCSMessages
+from pipython.interfaces.pigateway import PIGateway
+
+E2_PI_CNTR_UNKNOWN_COMMAND = 2
+
+
+class FakeGateway(PIGateway):
+    """Answer GCS commands from 'answers' like a device. A query that is not in 'answers' is not answered and
+    sets error 2 like an unknown command on a device. "ERR?" returns and resets the error. Single character
+    commands are answered before the line commands that have been sent with them, as a device does.
+    """
+
+    def __init__(self, answers=None):
+        """Answer GCS commands from 'answers'.
+        @param answers : Dictionary {command without LF: answer string or callable(command) or None}.
+        """
+        self.answers = dict(answers or {})
+        self.sent = []
+        self.error = 0
+        self.__buffer = ''
+
+    def __str__(self):
+        return 'FakeGateway()'
+
+    @property
+    def connectionid(self):
+        """Get ID of current connection as integer."""
+        return 0
+
+    def send(self, msg):
+        """Handle each command in 'msg', single character commands have no LF.
+        @param msg : One or more GCS commands as string.
+        """
+        immediate, answers = '', ''
+        while msg:
+            if msg[0] != '\n' and ord(msg[0]) < 32:
+                cmd, msg = msg[0], msg[1:]
+                immediate += self.__handle(cmd)
+            else:
+                cmd, _, msg = msg.partition('\n')
+                answers += self.__handle(cmd)
+            self.sent.append(cmd)
+        self.__buffer += immediate + answers
+
+    def __handle(self, cmd):
+        """Return the answer to 'cmd' as string."""
+        if 'ERR?' == cmd:
+            answer, self.error = '%d\n' % self.error, 0
+        elif cmd in self.answers:
+            answer = self.answers[cmd]
+            if callable(answer):
+                answer = answer(cmd)
+        elif '?' in cmd.split()[0]:
+            self.error = self.error or E2_PI_CNTR_UNKNOWN_COMMAND
+            answer = None
+        else:
+            answer = None
+        return answer or ''
+
+    @property
+    def answersize(self):
+        """Get the size of the received answers as integer."""
+        return len(self.__buffer)
+
+    def getanswer(self, bufsize):
+        """Return and remove 'bufsize' characters from the receive buffer."""
+        answer, self.__buffer = self.__buffer[:bufsize], self.__buffer[bufsize:]
+        return answer
+
+
+def fakedevice(answers=None, axes=('1', '2'), funcs=()):
+    """Return a GCSCommands instance that communicates with a FakeGateway.
+    @param answers : Dictionary {command: answer}, see FakeGateway.
+    @param axes : List of axes of the device.
+    @param funcs : List of supported GCS functions, e.g. "qPOS".
+    @return : Tuple (GCSCommands, FakeGateway).
+    """
+    gateway = FakeGateway(answers)
+    messages = GCSMessages(gateway)
+    messages.timeout = 1000
+    pidevice = GCSCommands(messages)
+    pidevice.capabilities = {'devname': 'E-FAKE', 'axes': list(axes), 'funcs': list(funcs)}
+    return pidevice, gateway
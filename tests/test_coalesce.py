@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for coalescing identical queries of several threads in pipython.gcsmessages."""
+
+from threading import Event, Thread
+from time import sleep
+
+from fakegateway import fakedevice
+from pipython import GCSError
+
+E17_PI_CNTR_PARAM_OUT_OF_RANGE = 17
+WAITING = 0.2  # seconds for the other threads to reach the waiting point
+
+
+class HeldAnswer(object):
+    """Answer of the fake device that is held back until release() is called."""
+
+    def __init__(self, gateway, answer, error=0):
+        self.gateway = gateway
+        self.answer = answer
+        self.error = error
+        self.released = Event()
+        self.calls = 0
+
+    def __call__(self, cmd):
+        self.calls += 1
+        self.released.wait(5)
+        self.gateway.error = self.error
+        return self.answer
+
+    def release(self):
+        """Let the device answer."""
+        self.released.set()
+
+
+def inthreads(func, num):
+    """Call 'func' in 'num' threads and return the threads and the list of their results or exceptions."""
+    results = []
+
+    def target():
+        """Store the result or the exception of 'func'."""
+        try:
+            results.append(func())
+        except GCSError as exc:
+            results.append(exc)
+
+    threads = [Thread(target=target) for _ in range(num)]
+    for thread in threads:
+        thread.start()
+        sleep(WAITING / num)
+    return threads, results
+
+
+def test_share_inflight():
+    """A query that is already in flight is not sent again, all threads get its answer."""
+    pidevice, gateway = fakedevice()
+    pidevice.coalesce = 0
+    held = HeldAnswer(gateway, '1=0.5\n')
+    gateway.answers['POS? 1'] = held
+    threads, results = inthreads(lambda: pidevice.qPOS('1'), 3)
+    sleep(WAITING)
+    held.release()
+    for thread in threads:
+        thread.join(5)
+    assert results == [{'1': 0.5}] * 3
+    assert held.calls == 1 and gateway.sent.count('POS? 1') == 1
+    pidevice.qPOS('1')
+    assert held.calls == 2  # window 0 keeps no answer after the flight
+
+
+def test_write_invalidates():
+    """A set command drops the recent answers and an answer that is in flight while it is sent."""
+    pidevice, gateway = fakedevice({'POS? 1': '1=0.5\n'})
+    pidevice.coalesce = 10000
+    pidevice.qPOS('1')
+    pidevice.qPOS('1')
+    assert gateway.sent.count('POS? 1') == 1
+    pidevice.MOV('1', 1.0)
+    pidevice.qPOS('1')
+    assert gateway.sent.count('POS? 1') == 2
+    held = HeldAnswer(gateway, '1=0.5\n')
+    gateway.answers['POS? 2'] = held
+    threads, _ = inthreads(lambda: pidevice.qPOS('2'), 1)
+    sleep(WAITING)
+    mover = Thread(target=pidevice.MOV, args=('2', 1.0))
+    mover.start()
+    sleep(WAITING)
+    held.release()
+    for thread in threads + [mover]:
+        thread.join(5)
+    pidevice.qPOS('2')
+    assert held.calls == 2  # the answer from before MOV has not been kept
+
+
+def test_error_to_all():
+    """The error of a coalesced query is raised in every thread that waits for it, it is not kept."""
+    pidevice, gateway = fakedevice()
+    pidevice.coalesce = 10000
+    held = HeldAnswer(gateway, '1=0.5\n', error=E17_PI_CNTR_PARAM_OUT_OF_RANGE)
+    gateway.answers['POS? 1'] = held
+    threads, results = inthreads(lambda: pidevice.qPOS('1'), 3)
+    sleep(WAITING)
+    held.release()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 3
+    assert all(isinstance(result, GCSError) for result in results)
+    assert all(result.val == E17_PI_CNTR_PARAM_OUT_OF_RANGE for result in results)
+    held.error = 0
+    assert pidevice.qPOS('1') == {'1': 0.5}
+    assert held.calls == 2
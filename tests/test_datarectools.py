@@ -0,0 +1,211 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the data recorder helpers in pipython.datarectools."""
+
+from time import sleep
+
+import pytest
+
+from fakegateway import fakedevice
+from test_pitools import OtherUser, gcsdata
+from pipython import GCSError
+from pipython.datarectools import Datarecorder, RecorderStream
+
+E17_PI_CNTR_PARAM_OUT_OF_RANGE = 17
+
+
+def test_read_own_transfer():
+    """Datarecorder.read() returns the data of its own transfer, not the one queued last on the connection."""
+    pidevice, _ = fakedevice({'DRR? 1 3 1': gcsdata([[0.0, 0.5, 1.0]]), 'GWD? 1 3 9': gcsdata([[7.0, 7.0, 7.0]])})
+    pidevice.capabilities = {'maxnumvalues': 1024}
+    drec = Datarecorder(OtherUser(pidevice, 'GWD? 1 3 9'))
+    drec.offset = 1
+    drec.numvalues = 3
+    header, data = drec.read()
+    assert header['NDATA'] == 3
+    assert list(data[0]) == [0.0, 0.5, 1.0]
+    assert pidevice.transfer.wait(timeout=5)
+
+
+def recorder(answers):
+    """Return a Datarecorder for record tables 1 and 2 of a fake device and its FakeGateway."""
+    pidevice, gateway = fakedevice(answers, funcs=['DRC', 'qDRC', 'DRT', 'RTR', 'qRTR'])
+    drec = Datarecorder(pidevice)
+    drec.sources = ['1', '2']
+    drec.options = [2, 2]
+    drec.trigsources = 1
+    return pidevice, gateway, drec
+
+
+def test_arm_verifies_cache():
+    """The first arm() queries the configuration that is cached, the next one sends only DRT."""
+    pidevice, gateway, drec = recorder({'DRC? 1 2': '1=1 2 \n2=2 1\n', 'RTR?': '1\n'})
+    pidevice.recorderconfig.update({1: ('1', 2), 2: ('2', 2)})
+    drec.arm()
+    assert gateway.sent == ['DRC? 1 2', 'ERR?', 'DRC 2 2 2', 'ERR?', 'DRT 0 1 0', 'ERR?']
+    assert pidevice.recorderconfig == {1: ('1', 2), 2: ('2', 2)}
+    del gateway.sent[:]
+    drec.arm()
+    assert gateway.sent == ['DRT 0 1 0', 'ERR?']
+
+
+def test_arm_verifies_samplerate():
+    """The first arm() sets the sampling rate again if it has been changed on the device."""
+    pidevice, gateway, drec = recorder({'DRC? 1 2': '1=1 2 \n2=2 2\n', 'RTR?': '1\n'})
+    drec.samplerate = 4
+    drec.samplerate = 4
+    assert gateway.sent == ['RTR 4', 'ERR?']
+    drec.arm()
+    assert gateway.sent[2:8] == ['RTR?', 'ERR?', 'RTR 4', 'ERR?', 'DRC? 1 2', 'ERR?']
+    gateway.answers['RTR?'] = '4\n'
+    del gateway.sent[:]
+    drec.arm()
+    assert gateway.sent == ['DRT 0 1 0', 'ERR?']
+    pidevice.recorderconfig.clear()
+    drec.arm()
+    assert gateway.sent[2:6] == ['RTR?', 'ERR?', 'DRC? 1 2', 'ERR?']
+
+
+def test_drc_deferred_error():
+    """DRC does not update the cache if its error is not checked at once."""
+    pidevice, gateway = fakedevice()
+
+    def invalid(cmd):
+        """Set the error like a device that rejects 'cmd'."""
+        gateway.error = E17_PI_CNTR_PARAM_OUT_OF_RANGE
+
+    gateway.answers['DRC 1 1 99'] = invalid
+    with pytest.raises(GCSError):
+        with pidevice.deferred():
+            pidevice.DRC(1, '1', 99)
+    assert pidevice.recorderconfig == {}
+    pidevice.DRC(1, '1', 2)
+    assert pidevice.recorderconfig == {1: ('1', 2)}
+
+
+class RingRecorder(object):
+    """Answers of a data recorder that records cyclically into record tables 1 and 2 of length 'numvalues'.
+    Point i of the recording stores i in table 1 and -i in table 2. Used as FakeGateway.answers.
+    """
+
+    def __init__(self, numvalues):
+        self.numvalues = numvalues
+        self.recorded = 0
+        self.tables = [[None] * numvalues, [None] * numvalues]
+
+    def record(self, numpoints):
+        """Record 'numpoints' further points."""
+        for _ in range(numpoints):
+            pos = self.recorded % self.numvalues
+            self.tables[0][pos], self.tables[1][pos] = self.recorded, -self.recorded
+            self.recorded += 1
+
+    def __contains__(self, cmd):
+        return cmd == 'DRL? 1 2' or cmd.startswith('DRR? ')
+
+    def __getitem__(self, cmd):
+        return self.handle
+
+    def handle(self, cmd):
+        """Answer 'cmd'."""
+        if cmd == 'DRL? 1 2':
+            level = self.recorded % self.numvalues
+            return '1=%d \n2=%d\n' % (level, level)
+        start, numvalues = [int(x) for x in cmd.split()[1:3]]
+        return gcsdata([table[start - 1:start - 1 + numvalues] for table in self.tables])
+
+
+def recorderstream(numvalues, samplefreq):
+    """Return a RecorderStream of a RingRecorder and the RingRecorder, the read rows are collected in stream.rows."""
+    pidevice, gateway = fakedevice()
+    gateway.answers = RingRecorder(numvalues)
+    rows = []
+    stream = RecorderStream(pidevice, [1, 2], numvalues, samplefreq, callback=rows.extend)
+    stream.rows = rows
+    return stream, gateway
+
+
+def test_stream_wraparound():
+    """The points after a wraparound of the write position are read in two parts as one gapless stream."""
+    stream, gateway = recorderstream(numvalues=10, samplefreq=1.)
+    gateway.answers.record(7)
+    stream.poll()
+    gateway.answers.record(6)
+    stream.poll()
+    gateway.answers.record(9)
+    stream.poll()
+    assert [cmd for cmd in gateway.sent if cmd.startswith('DRR?')] == \
+        ['DRR? 1 7 1 2', 'DRR? 8 3 1 2', 'DRR? 1 3 1 2', 'DRR? 4 7 1 2', 'DRR? 1 2 1 2']
+    assert stream.rows == [[float(i), -float(i)] for i in range(22)]
+    assert stream.readpos == 2 and stream.overruns == 0
+    assert stream.report['rows'] == 22
+
+
+def test_stream_overrun():
+    """A poll that comes later than the recording of a whole ring buffer is counted as overrun."""
+    stream, gateway = recorderstream(numvalues=10, samplefreq=1000.)
+    gateway.answers.record(5)
+    stream.poll()
+    assert stream.overruns == 0
+    sleep(0.05)  # 50 points at 1 kHz overwrite the ring buffer of 10 points
+    gateway.answers.record(5)
+    stream.poll()
+    assert stream.overruns == 1
+    assert stream.report['overruns'] == 1
+
+
+def test_stream_stop_reads_rest():
+    """stop() reads the points that have been recorded since the last poll of the background task."""
+    stream, gateway = recorderstream(numvalues=10, samplefreq=1.)
+    stream.interval = 0.01
+    with stream:
+        gateway.answers.record(5)
+        sleep(0.1)
+        gateway.answers.record(3)
+    assert not stream.running and stream.error is None
+    assert stream.rows == [[float(i), -float(i)] for i in range(8)]
+
+
+def test_timescale_cached():
+    """The time scale is computed once, is read-only and is computed again after its settings have changed."""
+    pidevice, gateway, drec = recorder({'RTR?': '2\n'})
+    pidevice.capabilities = {'maxnumvalues': 1024}
+    drec.numvalues = 4
+    timescale = drec.timescale
+    assert drec.timescale is timescale
+    assert list(timescale) == [0., 0.5, 1., 1.5]
+    assert gateway.sent.count('RTR?') == 1
+    with pytest.raises(ValueError):
+        timescale[0] = 1.
+    drec.samplerate = 4
+    assert drec.timescale is not timescale and list(drec.timescale) == [0., 0.25, 0.5, 0.75]
+    timescale = drec.timescale
+    drec.numvalues = 2
+    assert list(drec.timescale) == [0., 0.25]
+    timescale = drec.timescale
+    drec.servotime = 0.001
+    assert drec.timescale is not timescale
+
+
+def test_addtimescale():
+    """addtimescale() names the fields after the record tables and continues the time scale after the offset."""
+    pidevice, _, drec = recorder({'RTR?': '2\n'})
+    pidevice.capabilities = {'maxnumvalues': 1024}
+    drec.numvalues = 4
+    header = {'NAME0': 'POS', 'NAME1': 'POS'}
+    records = drec.addtimescale(header, [[1., 2., 3.], [4., 5., 6.]], offset=3)
+    assert records.dtype.names == ('time', 'POS', 'table2')
+    assert list(records['time']) == [1., 1.5, 2.]  # the third point is beyond self.numvalues
+    assert list(records['POS']) == [1., 2., 3.] and list(records['table2']) == [4., 5., 6.]
+
+
+def test_read_withtime():
+    """read(withtime=True) returns the data as structured array with the time scale."""
+    pidevice, _ = fakedevice({'DRR? 1 3 1': gcsdata([[0.0, 0.5, 1.0]]), 'RTR?': '1\n'}, funcs=['qRTR'])
+    pidevice.capabilities = {'maxnumvalues': 1024}
+    drec = Datarecorder(pidevice)
+    drec.numvalues = 3
+    header, data = drec.read(withtime=True)
+    assert header['NDATA'] == 3
+    assert data.dtype.names == ('time', 'table1')
+    assert list(data['time']) == [0., 1., 2.] and list(data['table1']) == [0.0, 0.5, 1.0]
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for pipython.devicecache.DeviceCache."""
+
+from fakegateway import fakedevice
+from pipython.devicecache import DeviceCache
+
+IDN = '(c)2024 Physik Instrumente (PI) GmbH & Co. KG, E-FAKE, 0123456789, 01.000\n'
+VER = 'FW_ARM: V01.000\n'
+
+
+def connected(idn=IDN, ver=VER, funcs=('qVER',)):
+    """Return a device whose capabilities have been queried and its FakeGateway."""
+    pidevice, gateway = fakedevice({'*IDN?': idn, 'VER?': ver}, axes=('1', '2', '3'), funcs=funcs)
+    pidevice.capabilities = {'servotime': 0.0001, 'maxnumvalues': 1024}
+    return pidevice, gateway
+
+
+def reconnected(idn=IDN, ver=VER):
+    """Return a device that has not been queried yet and its FakeGateway."""
+    pidevice, gateway = fakedevice({'*IDN?': idn, 'VER?': ver})
+    del pidevice.capabilities
+    return pidevice, gateway
+
+
+def test_hit(tmp_path):
+    """The capabilities of a known device are restored with one qIDN and one qVER query."""
+    cache = DeviceCache(str(tmp_path / 'cache' / 'devicecache.json'))
+    pidevice, _ = connected()
+    cache.save(pidevice)
+    pidevice, gateway = reconnected()
+    assert DeviceCache(cache.filename).load(pidevice)
+    assert gateway.sent == ['*IDN?', 'ERR?', 'VER?', 'ERR?']
+    assert pidevice.capabilities == {'devname': 'E-FAKE', 'axes': ['1', '2', '3'], 'funcs': ['qVER'],
+                                     'servotime': 0.0001, 'maxnumvalues': 1024}
+    assert pidevice.axes == ['1', '2', '3']
+
+
+def test_miss(tmp_path):
+    """Another serial number or another firmware version is not restored."""
+    cache = DeviceCache(str(tmp_path / 'devicecache.json'))
+    assert not cache.load(reconnected()[0])
+    cache.save(connected()[0])
+    assert not cache.load(reconnected(idn=IDN.replace('0123456789', '0123456788'))[0])
+    pidevice, _ = reconnected(ver='FW_ARM: V01.001\n')
+    assert not cache.load(pidevice)
+    assert 'devname' not in pidevice.capabilities
+
+
+def test_without_qver(tmp_path):
+    """A device without qVER is identified by its qIDN answer only."""
+    cache = DeviceCache(str(tmp_path / 'devicecache.json'))
+    cache.save(connected(funcs=())[0])
+    assert cache.entries[IDN.strip()]['version'] is None
+    pidevice, gateway = reconnected(ver='other\n')
+    assert cache.load(pidevice)
+    assert 'VER?' not in gateway.sent
+
+
+def test_forget(tmp_path):
+    """forget() removes the entry of one device or all entries, the file can be invalid."""
+    cache = DeviceCache(str(tmp_path / 'devicecache.json'))
+    other = IDN.replace('0123456789', '0123456788')
+    cache.save(connected()[0])
+    cache.save(connected(idn=other)[0])
+    assert sorted(DeviceCache(cache.filename).entries) == sorted([IDN.strip(), other.strip()])
+    cache.forget(reconnected()[0])
+    assert list(DeviceCache(cache.filename).entries) == [other.strip()]
+    cache.forget()
+    assert DeviceCache(cache.filename).entries == {}
+    with open(cache.filename, 'w') as fobj:
+        fobj.write('{invalid')
+    assert not DeviceCache(cache.filename).load(reconnected()[0])
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the asyncio GCS communication layer."""
+
+import asyncio
+
+import numpy
+import pytest
+
+from fakegateway import fakedevice
+
+from pipython import GCSError, gcserror
+from pipython.gcsasync import AsyncGCSCommands, AsyncGCSMessages
+from pipython.interfaces.asyncsocket import AsyncPISocket
+
+LATE = 0.3  # seconds until the first answer to "POS? 1" is sent
+
+
+async def serve(reader, writer):
+    """Answer like a device that answers the first "POS? 1" too late."""
+    numpos = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        cmd = line.decode().strip()
+        if 'ERR?' == cmd:
+            writer.write(b'0\n')
+        elif 'POS? 1' == cmd:
+            numpos += 1
+            if 1 == numpos:
+                await asyncio.sleep(LATE)
+            writer.write(('1=%d.0\n' % numpos).encode())
+        await writer.drain()
+    writer.close()
+
+
+async def latequery():
+    """Time out on the first query and return the answers of the following queries."""
+    server = await asyncio.start_server(serve, 'localhost', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with AsyncPISocket('localhost', port) as gateway:
+        pidevice = AsyncGCSCommands(AsyncGCSMessages(gateway))
+        pidevice.timeout = 100
+        with pytest.raises(GCSError) as exc:
+            await pidevice.qPOS('1')
+        assert exc.value == gcserror.E_7_COM_TIMEOUT
+        await asyncio.sleep(2 * LATE)
+        answers = [await pidevice.qPOS('1'), await pidevice.qPOS('1')]
+    server.close()
+    await server.wait_closed()
+    return answers
+
+
+def test_late_answer():
+    """An answer that is received after a timeout is discarded and does not shift the following answers."""
+    assert asyncio.run(latequery()) == [{'1': 2.0}, {'1': 3.0}]
+
+
+GCSDATA = '# NDATA = 3 \n# END_HEADER \n1 2 \n3 x \n5 6\n'
+
+
+async def servegcsdata(reader, writer):
+    """Answer "DRR? 1 3 1 2" with GCSDATA that has an invalid line."""
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        cmd = line.decode().strip()
+        if 'ERR?' == cmd:
+            writer.write(b'0\n')
+        elif 'DRR? 1 3 1 2' == cmd:
+            writer.write(GCSDATA.encode())
+        await writer.drain()
+    writer.close()
+
+
+async def readinvalid(usenumpy):
+    """Read GCSDATA and return the transfer."""
+    server = await asyncio.start_server(servegcsdata, 'localhost', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with AsyncPISocket('localhost', port) as gateway:
+        messages = AsyncGCSMessages(gateway)
+        messages.usenumpy = usenumpy
+        with pytest.raises(GCSError) as exc:
+            await messages.read('DRR? 1 3 1 2', gcsdata=3)
+        assert exc.value == gcserror.E_1004_PI_UNEXPECTED_RESPONSE
+    server.close()
+    await server.wait_closed()
+    return messages.transfer
+
+
+def test_invalid_line_as_sync():
+    """An invalid line is handled as by GCSMessages, the rows and the error of the transfer are the same."""
+    for usenumpy in (False, True):
+        pidevice, _ = fakedevice({'DRR? 1 3 1 2': GCSDATA})
+        pidevice.usenumpy = usenumpy
+        expected = pidevice.submit_gcsdata('DRR? 1 3 1 2', 3)
+        assert expected.wait(timeout=5)
+        transfer = asyncio.run(readinvalid(usenumpy))
+        assert transfer.error == expected.error == gcserror.E_1004_PI_UNEXPECTED_RESPONSE
+        assert numpy.array_equal(numpy.array(transfer.data), numpy.array(expected.data), equal_nan=True)
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for reading GCS data into lists, numpy arrays and sinks."""
+
+import json
+import math
+from time import time
+
+import numpy
+import pytest
+
+from fakegateway import fakedevice
+from pipython import GCSError, gcserror
+from pipython.gcsdata import GCSDataTransfer, NpyFileSink, appendlines, parserows, splitheader
+
+NUMVALUES = 1000
+
+
+def readgcsdata(lines, usenumpy, sink=None):
+    """Read the data 'lines' from a fake device and return the finished transfer."""
+    gcsdata = '# NDATA = %d \n# END_HEADER \n' % len(lines)
+    gcsdata += ''.join('%s \n' % line for line in lines[:-1]) + '%s\n' % lines[-1]
+    pidevice, _ = fakedevice({'DRR? 1 %d 1 2' % len(lines): gcsdata})
+    pidevice.usenumpy = usenumpy
+    transfer = pidevice.submit_gcsdata('DRR? 1 %d 1 2' % len(lines), len(lines), sink=sink)
+    assert transfer.wait(timeout=10)
+    return transfer
+
+
+def getlines():
+    """Return NUMVALUES lines with two columns of different values."""
+    return ['%.6f %.6e' % (0.001 * i, -1.5e3 * i) for i in range(NUMVALUES)]
+
+
+def test_numpy_equals_lists():
+    """Bulk conversion into a numpy array gives the same values as the conversion line by line."""
+    lines = getlines()
+    aslists = readgcsdata(lines, usenumpy=False)
+    asarray = readgcsdata(lines, usenumpy=True)
+    assert aslists.error is None and asarray.error is None
+    assert isinstance(asarray.data, numpy.ndarray)
+    assert asarray.data.shape == (2, NUMVALUES)
+    assert numpy.array_equal(asarray.data, numpy.array(aslists.data))
+
+
+def test_numpy_invalid_line():
+    """An invalid line in the middle of a chunk is stored as NaN row and the other rows are kept."""
+    lines = getlines()
+    lines[500] = '1.0 x'
+    transfer = readgcsdata(lines, usenumpy=True)
+    assert transfer.data.shape == (2, NUMVALUES)
+    assert all(math.isnan(x) for x in transfer.data[:, 500])
+    assert transfer.data[0, 501] == 0.501
+    assert transfer.data[1, -1] == -1.5e3 * (NUMVALUES - 1)
+
+
+def test_numpy_wrong_columns():
+    """Lines with a wrong number of columns are not shifted into other rows when the total count balances."""
+    pidevice, _ = fakedevice({'DRR? 1 4 1 2': '# NDATA = 4 \n# END_HEADER \n1 2 \n3 4 5 \n6 \n7 8\n'})
+    for usenumpy in (False, True):
+        pidevice.usenumpy = usenumpy
+        transfer = pidevice.submit_gcsdata('DRR? 1 4 1 2', 4)
+        assert transfer.wait(timeout=10)
+        rows = numpy.array(transfer.data).T.tolist()
+        assert rows[0] == [1.0, 2.0] and rows[-1] == [7.0, 8.0]
+        assert [3.0, 4.0] not in rows and [5.0, 6.0] not in rows
+        if usenumpy:
+            assert numpy.isnan(transfer.data[:, 1:3]).all()
+
+
+def test_parserows():
+    """Bulk conversion accepts only lines with exactly the expected number of valid values."""
+    assert parserows('1 2 \n3 4 \n', 2).tolist() == [[1.0, 2.0], [3.0, 4.0]]
+    assert parserows('1 2 \n3 4 5 \n6 \n7 8\n', 2) is None
+    assert parserows('1 2 \n3 x \n', 2) is None
+    assert parserows('1 2 \n3 4', 2) is None
+    assert parserows('', 2) is None
+
+
+def test_appendlines():
+    """The shared parser keeps incomplete lines, stops at the end of the answer and reports invalid lines."""
+    for usenumpy in (False, True):
+        transfer = GCSDataTransfer('DRR? 1 3 1 2', 3)
+        transfer.allocate(2, usenumpy)
+        assert appendlines(transfer, '1 2 \n3 ', 2, usenumpy) == ('3 ', False)
+        assert appendlines(transfer, '3 x \n5 6\n', 2, usenumpy) == ('', True)
+        assert transfer.index == 3
+        assert transfer.error == gcserror.E_1004_PI_UNEXPECTED_RESPONSE
+        transfer = GCSDataTransfer('DRR? 1 3 1 2', 3)
+        transfer.allocate(2, usenumpy)
+        assert appendlines(transfer, '1 2 \n3 4\n', 2, usenumpy) == ('', True)
+        assert transfer.error == gcserror.E_1088_PI_TOO_FEW_GCS_DATA
+
+
+def test_splitheader():
+    """The GCS header is split from the data, a header without " \\n" after END_HEADER has no data."""
+    assert splitheader('# NDATA = 1 \n# END_HEADER \n1 2\n') == ('# NDATA = 1 \n# END_HEADER \n', '1 2\n')
+    assert splitheader('# NDATA = 0 \n# END_HEADER\n') == ('# NDATA = 0 \n# END_HEADER\n', None)
+    assert splitheader('1=0.5\n') is None
+
+
+def test_invalid_line_error():
+    """An invalid line sets the error of the transfer also if the device reports no error."""
+    lines = getlines()
+    lines[10] = '1.0 x'
+    for usenumpy in (False, True):
+        transfer = readgcsdata(lines, usenumpy)
+        assert transfer.error == gcserror.E_1004_PI_UNEXPECTED_RESPONSE
+
+
+def test_iter_break():
+    """Leaving the loop over iter_gcsdata() early without close() does not block the connection."""
+    lines = getlines() * 20
+    gcsdata = '# NDATA = %d \n# END_HEADER \n' % len(lines)
+    gcsdata += ''.join('%s \n' % line for line in lines[:-1]) + '%s\n' % lines[-1]
+    pidevice, _ = fakedevice({'DRR? 1 %d 1 2' % len(lines): gcsdata, 'POS? 1': '1=0.5\n'})
+    for block in pidevice.iter_gcsdata('DRR? 1 %d 1 2' % len(lines), blocksize=100, numvalues=len(lines)):
+        assert len(block) == 100
+        break
+    assert pidevice.qPOS('1') == {'1': 0.5}
+    assert pidevice.transfer.wait(timeout=5)
+
+
+def test_npyfilesink(tmp_path):
+    """NpyFileSink writes a file that numpy.load() reads back, with a NaN row for an invalid line in both modes."""
+    lines = getlines()
+    lines[10] = 'x 1.0'
+    for usenumpy in (False, True):
+        filename = str(tmp_path / ('numpy.npy' if usenumpy else 'lists.npy'))
+        sink = NpyFileSink(filename)
+        readgcsdata(lines, usenumpy=usenumpy, sink=sink)
+        data = numpy.load(filename)
+        assert data.shape == (NUMVALUES, 2)
+        assert sink.numrows == NUMVALUES
+        assert numpy.isnan(data[10]).all()
+        assert data[11, 0] == 0.011
+        assert data[-1, 1] == -1.5e3 * (NUMVALUES - 1)
+        with open(filename + '.json') as fobj:
+            assert json.load(fobj)['NDATA'] == NUMVALUES
+
+
+def test_header_timeout():
+    """Waiting for the header behind a paused transfer times out, the queued transfers run afterwards."""
+    lines = getlines() * 20
+    gcsdata = '# NDATA = %d \n# END_HEADER \n' % len(lines)
+    gcsdata += ''.join('%s \n' % line for line in lines[:-1]) + '%s\n' % lines[-1]
+    pidevice, _ = fakedevice({'DRR? 1 %d 1 2' % len(lines): gcsdata, 'DRR? 1 3 1 2': gcsdata3()})
+    pidevice.timeout = 200
+    blocks = pidevice.iter_gcsdata('DRR? 1 %d 1 2' % len(lines), blocksize=100, numvalues=len(lines))
+    second = pidevice.submit_gcsdata('DRR? 1 3 1 2', 3)
+    start = time()
+    with pytest.raises(GCSError) as exc:
+        pidevice.qDRR([1, 2], 1, 3)
+    assert exc.value == gcserror.E_7_COM_TIMEOUT
+    assert 0.2 <= time() - start < 2
+    assert not second.done()
+    assert sum(len(block) for block in blocks) == len(lines)
+    assert second.wait(timeout=5) and second.error is None
+    assert pidevice.transfer.wait(timeout=5) and len(pidevice.transfer.data[0]) == 3
+
+
+def gcsdata3():
+    """Return a GCS data answer with three lines of two columns."""
+    return '# NDATA = 3 \n# END_HEADER \n1 2 \n3 4 \n5 6\n'
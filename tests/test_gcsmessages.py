@@ -0,0 +1,45 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the deferred error check of pipython.gcsmessages."""
+
+import pytest
+
+from fakegateway import fakedevice
+from pipython import GCSError
+
+E17_PI_CNTR_PARAM_OUT_OF_RANGE = 17
+
+
+def test_deferred_nested():
+    """A nested deferred() neither queries the error nor leaves the deferred mode on exit, the outer one does."""
+    pidevice, gateway = fakedevice()
+    with pidevice.deferred(numcmds=None):
+        with pidevice.deferred(numcmds=None):
+            pidevice.MOV('1', 1.0)
+        assert gateway.sent == ['MOV 1 1']
+        pidevice.MOV('1', 2.0)
+        assert gateway.sent == ['MOV 1 1', 'MOV 1 2']
+    assert gateway.sent == ['MOV 1 1', 'MOV 1 2', 'ERR?']
+    pidevice.MOV('1', 3.0)
+    assert gateway.sent[-2:] == ['MOV 1 3', 'ERR?']
+
+
+def test_deferred_nested_error():
+    """An error in a nested deferred() is raised with the commands of both levels on exit of the outer one."""
+    pidevice, gateway = fakedevice()
+
+    def outofrange(cmd):
+        """Set the error like a device that rejects 'cmd'."""
+        gateway.error = E17_PI_CNTR_PARAM_OUT_OF_RANGE
+
+    gateway.answers['MOV 1 99'] = outofrange
+    with pytest.raises(GCSError) as exc:
+        with pidevice.deferred(numcmds=None):
+            pidevice.MOV('1', 1.0)
+            with pidevice.deferred(numcmds=None):
+                pidevice.MOV('1', 99.0)
+            assert gateway.sent[-1] == 'MOV 1 99'
+    assert exc.value.val == E17_PI_CNTR_PARAM_OUT_OF_RANGE
+    assert 'MOV 1 1' in str(exc.value) and 'MOV 1 99' in str(exc.value)
+    pidevice.MOV('1', 3.0)
+    assert gateway.sent[-2:] == ['MOV 1 3', 'ERR?']
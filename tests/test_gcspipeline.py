@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for pipython.gcspipeline.GCSPipeline."""
+
+from time import time
+
+import pytest
+
+from fakegateway import E2_PI_CNTR_UNKNOWN_COMMAND, fakedevice
+from pipython import GCSError
+
+E17_PI_CNTR_PARAM_OUT_OF_RANGE = 17
+FUNCS = ('qPOS', 'qVEL', 'MOV', 'IsMoving', 'GetDynamicMoveBufferSize', 'StopAll')
+ANSWERS = {'POS? 1': '1=1.5\n', 'VEL? 1': '1=10\n', 'POS? 2': '2=-1\n'}
+
+
+def test_results():
+    """All commands are sent at once with one "ERR?" and each result gets its own answer."""
+    pidevice, gateway = fakedevice(ANSWERS, funcs=FUNCS)
+    with pidevice.pipeline() as pipe:
+        pos, move, vel = pipe.qPOS('1'), pipe.MOV('1', 2.), pipe.qVEL('1')
+    assert pos.result() == {'1': 1.5}
+    assert move.result() is None
+    assert vel.result() == {'1': 10.}
+    assert gateway.sent == ['POS? 1', 'MOV 1 2', 'VEL? 1', 'ERR?']
+
+
+@pytest.mark.parametrize('funcname', ['IsMoving', 'GetDynamicMoveBufferSize', 'StopAll'])
+def test_singlechar(funcname):
+    """Single character commands would overtake the other commands and are rejected."""
+    pidevice, gateway = fakedevice(ANSWERS, funcs=FUNCS)
+    with pytest.raises(NotImplementedError):
+        with pidevice.pipeline() as pipe:
+            pipe.qPOS('1')
+            getattr(pipe, funcname)()
+    assert gateway.sent == []
+
+
+def test_invalidquery():
+    """A query the device does not answer raises the device error without waiting for the timeout."""
+    pidevice, _ = fakedevice(ANSWERS, funcs=FUNCS)
+    pidevice.timeout = 5000
+    start = time()
+    with pytest.raises(GCSError) as exc:
+        with pidevice.pipeline() as pipe:
+            pos, vel, other = pipe.qPOS('1'), pipe.qVEL('3'), pipe.qPOS('2')
+    assert time() - start < 2.
+    assert exc.value == E2_PI_CNTR_UNKNOWN_COMMAND
+    for result in (pos, vel, other):
+        with pytest.raises(GCSError):
+            result.result()
+    assert pidevice.qPOS('2') == {'2': -1.}
+
+
+def test_batchgap():
+    """The time a pipeline waits for a further answer is configurable, None waits up to the timeout."""
+    pidevice, _ = fakedevice(ANSWERS, funcs=FUNCS)
+    pidevice.timeout = 600
+    for batchgap, mintime, maxtime in ((20, 0., 0.3), (None, 0.6, 2.)):
+        pidevice.batchgap = batchgap
+        start = time()
+        with pytest.raises(GCSError) as exc:
+            with pidevice.pipeline() as pipe:
+                pipe.qPOS('1')
+                pipe.qVEL('3')
+        assert mintime <= time() - start < maxtime
+        assert exc.value == E2_PI_CNTR_UNKNOWN_COMMAND
+
+
+def test_deferred():
+    """In deferred mode a pipeline does not query the error, the error of an earlier command is raised by the
+    deferred window with the commands of the pipeline.
+    """
+    pidevice, gateway = fakedevice(ANSWERS, funcs=FUNCS)
+
+    def outofrange(cmd):
+        """Set the error like a device that rejects 'cmd'."""
+        gateway.error = E17_PI_CNTR_PARAM_OUT_OF_RANGE
+
+    gateway.answers['MOV 1 99'] = outofrange
+    with pytest.raises(GCSError) as exc:
+        with pidevice.deferred(numcmds=None):
+            pidevice.MOV('1', 99.)
+            with pidevice.pipeline() as pipe:
+                pos = pipe.qPOS('1')
+            assert pos.result() == {'1': 1.5}
+    assert exc.value.val == E17_PI_CNTR_PARAM_OUT_OF_RANGE
+    assert 'MOV 1 99' in str(exc.value) and 'POS? 1' in str(exc.value)
+    assert gateway.sent == ['MOV 1 99', 'POS? 1', 'ERR?']
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests that the reducers give the same results for data split into blocks as numpy for the whole data."""
+
+import numpy
+import pytest
+
+from pipython.gcsreducers import Crossings, Decimator, RunningStats, WindowStats
+
+NUMROWS = 1000
+SPLITS = ([NUMROWS], [1] * 20 + [NUMROWS - 20], [7, 93, 250, 333, 317], [64] * 15 + [40])
+
+
+def getdata():
+    """Return NUMROWS rows with two columns, a sine and noise around an offset."""
+    rng = numpy.random.RandomState(0)
+    sine = numpy.sin(numpy.linspace(0, 20 * numpy.pi, NUMROWS))
+    return numpy.column_stack((sine, 5. + rng.normal(size=NUMROWS)))
+
+
+def feed(reducer, data, sizes):
+    """Write 'data' to 'reducer' in blocks of 'sizes' rows and close it."""
+    assert sum(sizes) == len(data)
+    reducer.start('# NDATA = %d \n# END_HEADER \n' % len(data))
+    start = 0
+    for size in sizes:
+        reducer.write(data[start:start + size])
+        start += size
+    reducer.close()
+    return reducer
+
+
+@pytest.mark.parametrize('sizes', SPLITS)
+@pytest.mark.parametrize('window', [1, 10, 64, 300])
+def test_windowstats(sizes, window):
+    """Windows that are split between blocks give the statistics of the complete window."""
+    data = getdata()
+    result = feed(WindowStats(window, stats=('min', 'max', 'mean', 'rms', 'std')), data, sizes).result
+    windows = [data[i:i + window] for i in range(0, NUMROWS, window)]
+    expected = {
+        'min': [rows.min(axis=0) for rows in windows],
+        'max': [rows.max(axis=0) for rows in windows],
+        'mean': [rows.mean(axis=0) for rows in windows],
+        'rms': [numpy.sqrt((rows ** 2).mean(axis=0)) for rows in windows],
+        'std': [rows.std(axis=0) for rows in windows],
+    }
+    for stat, values in expected.items():
+        numpy.testing.assert_allclose(result[stat], numpy.array(values), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('sizes', SPLITS)
+@pytest.mark.parametrize('factor', [1, 3, 10, 64])
+def test_decimator(sizes, factor):
+    """The decimation phase continues across blocks."""
+    data = getdata()
+    numpy.testing.assert_array_equal(feed(Decimator(factor), data, sizes).result, data[::factor])
+
+
+@pytest.mark.parametrize('sizes', SPLITS)
+def test_runningstats(sizes):
+    """Merging the statistics of the blocks gives the statistics of the whole data."""
+    data = getdata()
+    stats = feed(RunningStats(), data, sizes)
+    assert stats.numrows == NUMROWS
+    numpy.testing.assert_allclose(stats.mean, data.mean(axis=0), rtol=1e-12, atol=1e-12)
+    numpy.testing.assert_allclose(stats.variance, data.var(axis=0), rtol=1e-10)
+    numpy.testing.assert_allclose(stats.std, data.std(axis=0), rtol=1e-10)
+    numpy.testing.assert_array_equal(stats.min, data.min(axis=0))
+    numpy.testing.assert_array_equal(stats.max, data.max(axis=0))
+
+
+@pytest.mark.parametrize('sizes', SPLITS + ([100] * 10,))
+@pytest.mark.parametrize('direction', [0, 1, -1])
+def test_crossings(sizes, direction):
+    """Crossings are found at block boundaries, with the index of the first row beyond the threshold."""
+    data = getdata()
+    data[99, 0], data[100, 0] = -0.5, 0.5  # a rising edge exactly at a block boundary of 100 rows
+    above = data[:, 0] > 0.
+    indexes = numpy.nonzero(above[1:] != above[:-1])[0] + 1
+    expected = [(int(index), 1 if above[index] else -1) for index in indexes]
+    expected = [event for event in expected if direction in (0, event[1])]
+    found = []
+    crossings = feed(Crossings(0., column=0, direction=direction, callback=lambda *event: found.append(event)),
+                     data, sizes)
+    assert crossings.events == expected
+    assert found == expected
+    assert (100, 1) in expected or direction == -1
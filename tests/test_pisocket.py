@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for pipython.interfaces.pisocket.PISocket against pipython.replyserver.ReplyServer."""
+
+import socket
+from threading import Thread
+from time import time
+
+import pytest
+
+from pipython import GCSError, gcserror
+from pipython.gcscommands import GCSCommands
+from pipython.gcsmessages import GCSMessages
+from pipython.interfaces.pisocket import PISocket
+from pipython.replyserver import ReplyServer
+
+NUMVALUES = 1000000  # lines of data recorder data in the throughput test
+MINRATE = 20000  # minimum lines per second in the throughput test
+
+
+def freeport():
+    """Return a TCP port on localhost that is not in use as integer."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('localhost', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_throughput():
+    """Stream 1M data recorder lines from ReplyServer and check that all of them arrive in time."""
+    gcsdata = '# NDATA = %d \n# END_HEADER \n' % NUMVALUES
+    gcsdata += '1.234567 -2.345678 \n' * (NUMVALUES - 1) + '1.234567 -2.345678\n'
+    port = freeport()
+    with ReplyServer(port=port) as server:
+        server.append('DRR? 1 %d 1 2\n' % NUMVALUES, gcsdata)
+        server.append('ERR?\n', '0\n')
+        with PISocket(port=port) as gateway:
+            pidevice = GCSCommands(GCSMessages(gateway))
+            start = time()
+            transfer = pidevice.submit_gcsdata('DRR? 1 %d 1 2' % NUMVALUES, NUMVALUES)
+            assert transfer.wait(timeout=NUMVALUES / MINRATE)
+            elapsed = time() - start
+            assert transfer.error is None
+            assert len(transfer.data[0]) == NUMVALUES
+            assert transfer.data[1][-1] == -2.345678
+    print('%d lines in %.2f s, %.0f lines/s' % (NUMVALUES, elapsed, NUMVALUES / elapsed))
+
+
+def test_peerclosed():
+    """A query on a connection that the peer has closed fails at once instead of waiting for the timeout."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('localhost', 0))
+    listener.listen(1)
+
+    def acceptandclose():
+        """Accept the connection and close it again."""
+        conn = listener.accept()[0]
+        conn.recv(16)
+        conn.close()
+
+    thread = Thread(target=acceptandclose)
+    thread.start()
+    with PISocket(port=listener.getsockname()[1]) as gateway:
+        messages = GCSMessages(gateway)
+        messages.timeout = 5000
+        start = time()
+        with pytest.raises(GCSError) as exc:
+            messages.read('POS?\n')
+        assert time() - start < 1.
+        assert exc.value == gcserror.E_56_COM_SOCKET_NOT_CONNECTED
+    thread.join()
+    listener.close()
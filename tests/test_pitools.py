@@ -0,0 +1,176 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the helper functions in pipython.pitools."""
+
+from time import sleep, time
+
+import pytest
+
+from fakegateway import fakedevice
+from pipython import GCSError, pitools
+
+E17_PI_CNTR_PARAM_OUT_OF_RANGE = 17
+
+
+def gcsdata(columns):
+    """Return the GCS data answer of 'columns' as string."""
+    rows = list(zip(*columns))
+    answer = '# NDATA = %d \n# END_HEADER \n' % len(rows)
+    lines = [' '.join('%g' % value for value in row) for row in rows]
+    answer += ''.join('%s \n' % line for line in lines[:-1])
+    return answer + '%s\n' % lines[-1]
+
+
+class OtherUser(object):
+    """Forward to 'pidevice' and queue another GCS data transfer after each one, like a second thread does."""
+
+    def __init__(self, pidevice, tosend):
+        self.pidevice = pidevice
+        self.tosend = tosend
+
+    def __getattr__(self, name):
+        attr = getattr(self.pidevice, name)
+        if not callable(attr) or name not in ('submit_gcsdata', 'qDRR', 'qGWD'):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            """Call 'attr' and submit another transfer."""
+            result = attr(*args, **kwargs)
+            self.pidevice.submit_gcsdata(self.tosend, 3)
+            return result
+
+        return wrapped
+
+
+def test_verifywavetables_own_transfer():
+    """verifywavetables() compares the data of its own transfer, not the one queued last on the connection."""
+    wavetables = {1: [0.0, 0.5, 1.0], 2: [2.0, 2.5, 3.0]}
+    pidevice, _ = fakedevice({'GWD? 1 3 1 2': gcsdata([wavetables[1], wavetables[2]]),
+                              'GWD? 1 3 9': gcsdata([[7.0, 7.0, 7.0]])})
+    pitools.verifywavetables(OtherUser(pidevice, 'GWD? 1 3 9'), wavetables)
+    assert pidevice.transfer.wait(timeout=5)
+
+
+def test_motionsequence_timeout():
+    """After a timeout MotionSequence.index is the first target that has not been confirmed yet."""
+    ontarget = {'1': '1=0\n'}
+    pidevice, _ = fakedevice({'ONT? 1': lambda cmd: ontarget['1']})
+    sequence = pitools.MotionSequence(pidevice, [[1.0], [2.0], [3.0]], axes=['1'], timeout=0.2, polldelay=0.01)
+    with pytest.raises(SystemError):
+        sequence.run()
+    assert sequence.index == 0
+    ontarget['1'] = '1=1\n'
+    sequence.run()
+    assert sequence.index == 3
+
+
+def test_writewavetables_delta():
+    """Delta writes skip unchanged tables, append only new points and rewrite a table that changed in place."""
+    pidevice, gateway = fakedevice()
+    pitools.writewavetables(pidevice, {1: [0.0, 1.0, 2.0]}, delta=True)
+    assert gateway.sent == ['WAV 1 X PNT 1 3 0 1 2', 'ERR?']
+    del gateway.sent[:]
+    pitools.writewavetables(pidevice, {1: [0.0, 1.0, 2.0]}, delta=True)
+    assert gateway.sent == []
+    pitools.writewavetables(pidevice, {1: [0.0, 1.0, 2.0, 3.0, 4.0]}, delta=True)
+    assert gateway.sent == ['WAV 1 & PNT 4 2 3 4', 'ERR?']
+    del gateway.sent[:]
+    pitools.writewavetables(pidevice, {1: [0.0, 9.0, 2.0, 3.0, 4.0]}, delta=True, bunchsize=2)
+    assert gateway.sent == ['WAV 1 X PNT 1 2 0 9', 'WAV 1 & PNT 3 2 2 3', 'WAV 1 & PNT 5 1 4', 'ERR?']
+    assert pidevice.wavetables == {1: ['0', '9', '2', '3', '4']}
+
+
+def test_writewavepoints_single_bunch():
+    """writewavepoints() sends all points in one command by default, like before the packing."""
+    pidevice, gateway = fakedevice()
+    pitools.writewavepoints(pidevice, 1, [float(i) for i in range(100)])
+    assert gateway.sent == ['WAV 1 X PNT 1 100 %s' % ' '.join(str(i) for i in range(100)), 'ERR?']
+
+
+def test_writewavetables_packing():
+    """writewavetables() packs the points into commands of at most 'maxcmdlen' characters, none is lost."""
+    pidevice, gateway = fakedevice()
+    wavepoints = [0.5 * i for i in range(200)]
+    pitools.writewavetables(pidevice, {2: wavepoints}, maxcmdlen=64)
+    cmds = gateway.sent[:-1]
+    assert gateway.sent[-1] == 'ERR?'
+    assert len(cmds) > 1 and all(len(cmd) <= 64 for cmd in cmds)
+    assert cmds[0].startswith('WAV 2 X PNT 1 ') and all(cmd.startswith('WAV 2 & PNT ') for cmd in cmds[1:])
+    written, start = [], 1
+    for cmd in cmds:
+        items = cmd.split()
+        assert int(items[4]) == start and int(items[5]) == len(items) - 6
+        written += [float(x) for x in items[6:]]
+        start += int(items[5])
+    assert written == wavepoints
+
+
+def test_verifywavetables():
+    """verifywavetables() reads tables of the same length in one transfer and reports the first difference."""
+    wavetables = {1: [0.0, 0.5, 1.0], 2: [2.0, 2.5, 3.0], 3: [1.0, 2.0]}
+    answers = {'GWD? 1 2 3': gcsdata([wavetables[3]]), 'GWD? 1 3 1 2': gcsdata([wavetables[1], wavetables[2]])}
+    pidevice, gateway = fakedevice(answers)
+    pitools.verifywavetables(pidevice, wavetables)
+    assert [cmd for cmd in gateway.sent if cmd.startswith('GWD?')] == ['GWD? 1 2 3', 'GWD? 1 3 1 2']
+    gateway.answers['GWD? 1 3 1 2'] = gcsdata([wavetables[1], [2.0, 2.7, 3.0]])
+    with pytest.raises(SystemError) as exc:
+        pitools.verifywavetables(pidevice, wavetables)
+    assert 'wave table 2 differs at point 2: 2.7 instead of 2.5' in str(exc.value)
+
+
+def ontarget_after(numpolls, delay=0.):
+    """Return an answer function for "ONT? 1" that is on target from poll 'numpolls' on, each poll takes 'delay'."""
+    polls = []
+
+    def answer(cmd):
+        """Answer like an axis that reaches the target."""
+        polls.append(cmd)
+        sleep(delay)
+        return '1=%d\n' % (len(polls) >= numpolls)
+
+    return answer
+
+
+def test_waitall():
+    """waitall() polls the devices concurrently and reports the time and the number of polls per condition."""
+    device1, _ = fakedevice({'ONT? 1': ontarget_after(3, delay=0.1)})
+    device2, _ = fakedevice({'ONT? 1': ontarget_after(3, delay=0.1)})
+    ready = pitools.WaitCondition(device2, 'ready', lambda: True)
+    start = time()
+    report = pitools.waitall([pitools.condontarget(device1, '1'), pitools.condontarget(device2, '1'), ready],
+                             timeout=5, polldelay=0.01)
+    assert time() - start < 0.6  # sequential polling would take 0.6 s
+    assert [item['polls'] for item in report] == [3, 3, 1]
+    assert report[2]['name'] == 'ready'
+    assert all(0 <= item['time'] < 0.6 for item in report)
+
+
+def test_waitall_timeout():
+    """waitall() raises SystemError with the names of the conditions that are not met after the timeout."""
+    device1, _ = fakedevice({'ONT? 1': '1=0\n'})
+    device2, _ = fakedevice({'ONT? 1': '1=1\n'})
+    start = time()
+    with pytest.raises(SystemError) as exc:
+        pitools.waitall([pitools.WaitCondition(device1, 'never', lambda: device1.qONT('1')['1']),
+                         pitools.WaitCondition(device2, 'at once', lambda: device2.qONT('1')['1'])],
+                        timeout=0.3, polldelay=0.01)
+    assert 0.3 <= time() - start < 2
+    assert 'never' in str(exc.value) and 'at once' not in str(exc.value)
+
+
+def test_waitall_error():
+    """An error of one device stops the polling of all devices and is raised by waitall()."""
+    device1, _ = fakedevice({'ONT? 1': '1=0\n'})
+    device2, gateway2 = fakedevice()
+
+    def failing(cmd):
+        """Answer and set an error like a device whose axis has failed."""
+        gateway2.error = E17_PI_CNTR_PARAM_OUT_OF_RANGE
+        return '1=0\n'
+
+    gateway2.answers['ONT? 1'] = failing
+    start = time()
+    with pytest.raises(GCSError) as exc:
+        pitools.waitall([pitools.condontarget(device1, '1'), pitools.condontarget(device2, '1')], timeout=5)
+    assert exc.value == E17_PI_CNTR_PARAM_OUT_OF_RANGE
+    assert time() - start < 2
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the priority commands that are sent while GCS data is read in the background."""
+
+from threading import Thread
+
+import pytest
+
+from fakegateway import fakedevice
+
+E10_PI_CNTR_STOP = 10
+NUMLINES = 20000
+
+
+def gcsdata(numlines):
+    """Return a GCS data answer of 'numlines' lines with two columns as string."""
+    answer = '# NDATA = %d \n# END_HEADER \n' % numlines
+    return answer + ''.join('%d %d \n' % (i, -i) for i in range(numlines - 1)) + '0 0\n'
+
+
+def stopped(gateway):
+    """Return an answer function that sets error 10 like a device that has been stopped."""
+
+    def answer(cmd):
+        """Set error 10."""
+        gateway.error = E10_PI_CNTR_STOP
+
+    return answer
+
+
+def runthread(func, *args):
+    """Call 'func' with 'args' in a thread and return the thread."""
+    thread = Thread(target=func, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize('funcname, cmd', [('STP', 'STP'), ('StopAll', chr(24)), ('HLT', 'HLT')])
+def test_stop_during_transfer(funcname, cmd):
+    """A stop command is sent at once while a paused transfer holds the lock, without "ERR?", and the
+    error 10 it causes is not raised by the transfer.
+    """
+    pidevice, gateway = fakedevice({'DRR? 1 %d 1 2' % NUMLINES: gcsdata(NUMLINES)})
+    gateway.answers[cmd] = stopped(gateway)
+    blocks = pidevice.iter_gcsdata('DRR? 1 %d 1 2' % NUMLINES, blocksize=100, numvalues=NUMLINES)
+    thread = runthread(getattr(pidevice, funcname))
+    thread.join(5)
+    assert not thread.is_alive()
+    assert gateway.sent[-1] == cmd
+    assert sum(len(block) for block in blocks) == NUMLINES
+    assert pidevice.transfer.wait(timeout=5)
+    assert pidevice.transfer.error is None
+    assert gateway.sent[-2:] == [cmd, 'ERR?']
+    assert gateway.error == 0
+
+
+def test_other_commands_wait():
+    """A command that is not a priority command waits until the transfer has released the lock."""
+    pidevice, gateway = fakedevice({'DRR? 1 %d 1 2' % NUMLINES: gcsdata(NUMLINES)})
+    blocks = pidevice.iter_gcsdata('DRR? 1 %d 1 2' % NUMLINES, blocksize=100, numvalues=NUMLINES)
+    thread = runthread(pidevice.MOV, '1', 1.0)
+    thread.join(0.3)
+    assert thread.is_alive()
+    assert 'MOV 1 1' not in gateway.sent
+    assert sum(len(block) for block in blocks) == NUMLINES
+    thread.join(5)
+    assert not thread.is_alive()
+    assert gateway.sent[-2:] == ['MOV 1 1', 'ERR?']
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for pipython.statusmonitor."""
+
+from collections import OrderedDict
+from time import sleep
+
+import pytest
+
+from fakegateway import fakedevice
+from pipython.statusmonitor import StatusMonitor, StatusSnapshot
+
+FUNCS = ('qPOS', 'qONT', 'qSVO', 'IsMoving')
+
+
+def getdevice():
+    """Return a fake device with axes 1 and 2, axis 2 is moving. Change 'pos' and 'moving' in 'state' to
+    change the answers of the device.
+    @return : Tuple (GCSCommands, FakeGateway, state dictionary).
+    """
+    state = {'pos': '1.5', 'moving': '2'}
+    pidevice, gateway = fakedevice({
+        'POS? 1 2': lambda cmd: '1=%s \n2=-3.25\n' % state['pos'],
+        'ONT? 1 2': '1=1 \n2=0\n',
+        'SVO? 1 2': '1=1 \n2=1\n',
+        chr(5): lambda cmd: '%s\n' % state['moving'],
+    }, funcs=FUNCS)
+    return pidevice, gateway, state
+
+
+def test_poll():
+    """The moving state is not mixed up with the pipelined answers although the device answers "#5" first."""
+    pidevice, gateway, _ = getdevice()
+    monitor = StatusMonitor(pidevice)
+    snapshot = monitor.poll()
+    assert snapshot.pos == OrderedDict([('1', 1.5), ('2', -3.25)])
+    assert snapshot.ont == OrderedDict([('1', True), ('2', False)])
+    assert snapshot.svo == OrderedDict([('1', True), ('2', True)])
+    assert snapshot.moving == OrderedDict([('1', False), ('2', True)])
+    assert snapshot.ontarget() == {'1': True, '2': False}
+    assert gateway.sent == ['POS? 1 2', 'ONT? 1 2', 'SVO? 1 2', 'ERR?', chr(5), 'ERR?']
+
+
+def test_snapshot():
+    """get() returns the same snapshot while it is young enough and polls a new one otherwise."""
+    pidevice, gateway, _ = getdevice()
+    monitor = StatusMonitor(pidevice)
+    assert monitor.snapshot is None
+    first = monitor.get()
+    assert monitor.snapshot is first
+    numsent = len(gateway.sent)
+    assert monitor.get(max_age=10.) is first
+    assert monitor.get() is first
+    assert len(gateway.sent) == numsent
+    sleep(0.01)
+    second = monitor.get(max_age=0.001)
+    assert second is not first
+    assert second == first
+    assert second.time > first.time
+    assert first.pos == OrderedDict([('1', 1.5), ('2', -3.25)])
+
+
+def test_snapshot_equality():
+    """Snapshots are compared by their states, not by their time."""
+    pos = OrderedDict([('1', 1.0)])
+    assert StatusSnapshot(1., pos) == StatusSnapshot(2., OrderedDict(pos))
+    assert StatusSnapshot(1., pos) != StatusSnapshot(1., pos, ont=OrderedDict([('1', True)]))
+    assert StatusSnapshot(1., pos) != pos
+
+
+def test_callbacks():
+    """Callbacks get the previous and the current snapshot and are only called when the status changes."""
+    pidevice, _, state = getdevice()
+    monitor = StatusMonitor(pidevice)
+    calls = []
+
+    def failing(previous, current):
+        """Fail to check that other callbacks are still called."""
+        raise ValueError('callback error')
+
+    monitor.subscribe(failing)
+    monitor.subscribe(lambda previous, current: calls.append((previous, current)))
+    first = monitor.poll()
+    assert calls == [(None, first)]
+    monitor.poll()
+    assert len(calls) == 1
+    state['moving'] = '0'
+    third = monitor.poll()
+    assert calls[1] == (first, third)
+    assert third.moving['2'] is False
+    monitor.unsubscribe(failing)
+    state['pos'] = '2.5'
+    fourth = monitor.poll()
+    assert calls[2] == (third, fourth)
+    assert fourth.pos['1'] == 2.5
+
+
+def test_background():
+    """The background task keeps the snapshot up to date and stops on exit."""
+    pidevice, _, state = getdevice()
+    with StatusMonitor(pidevice, axes=['1', '2'], interval=0.005) as monitor:
+        sleep(0.05)
+        assert monitor.running
+        assert monitor.error is None
+        state['pos'] = '4.0'
+        sleep(0.05)
+        assert monitor.snapshot.pos['1'] == 4.0
+    assert not monitor.running
+
+
+def test_get_axes():
+    """get(axes) returns the states of these axes from the shared snapshot without another query."""
+    pidevice, gateway, _ = getdevice()
+    monitor = StatusMonitor(pidevice)
+    shared = monitor.get()
+    numsent = len(gateway.sent)
+    snapshot = monitor.get(axes='2', max_age=10.)
+    assert len(gateway.sent) == numsent
+    assert snapshot.time == shared.time
+    assert snapshot.pos == OrderedDict([('2', -3.25)])
+    assert snapshot.moving == OrderedDict([('2', True)])
+    assert snapshot.ontarget() == {'2': False}
+    assert list(monitor.get(axes=[2, 1]).pos) == ['2', '1']
+    assert monitor.snapshot is shared
+    with pytest.raises(KeyError):
+        monitor.get(axes='3')
@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for pipython.trajectoryfeeder.TrajectoryFeeder with a simulated move buffer."""
+
+import pytest
+
+from fakegateway import fakedevice
+from pipython import GCSError, gcserror
+from pipython.trajectoryfeeder import TrajectoryFeeder
+
+
+class MoveBuffer(object):
+    """Answers of a device with one move buffer per trajectory that consumes 'rate' values per "TGL?".
+    Used as FakeGateway.answers, so it is asked for each command the gateway receives. If 'strict' is True
+    a buffer that runs empty before TGF sets error 220 (interpolation FIFO underrun).
+    """
+
+    def __init__(self, gateway, rate, size=10000, strict=False):
+        self.gateway = gateway
+        self.rate = rate
+        self.size = size
+        self.strict = strict
+        self.values = {1: [], 2: []}
+        self.levels = {1: 0, 2: 0}
+        self.reported = []
+        self.started = False
+        self.finished = False
+
+    def __contains__(self, cmd):
+        return cmd == chr(11) or cmd.split()[0] in ('TGA', 'TGS', 'TGF', 'TGL?')
+
+    def __getitem__(self, cmd):
+        return self.handle
+
+    def handle(self, cmd):
+        """Answer 'cmd' and update the buffers."""
+        if cmd == chr(11):
+            return '%d\n' % (self.size - sum(self.levels.values()))
+        items = cmd.split()
+        if 'TGA' == items[0]:
+            for trajectory, value in zip(items[1::2], items[2::2]):
+                self.values[int(trajectory)].append(float(value))
+                self.levels[int(trajectory)] += 1
+        elif 'TGS' == items[0]:
+            self.started = True
+        elif 'TGF' == items[0]:
+            self.finished = True
+        elif 'TGL?' == items[0]:
+            if self.started:
+                for trajectory in self.levels:
+                    if self.levels[trajectory] < self.rate and self.strict and not self.finished:
+                        self.gateway.error = gcserror.E220_PI_CNTR_INTERPOLATION_FIFO_UNDERRUN
+                    self.levels[trajectory] = max(0, self.levels[trajectory] - self.rate)
+            self.reported.append(min(self.levels.values()))
+            return ' \n'.join('%d=%d' % item for item in sorted(self.levels.items())) + '\n'
+        return None
+
+
+def feeddevice(rate, numrows, funcs=(), **kwargs):
+    """Return a TrajectoryFeeder for 'numrows' rows into trajectories 1 and 2 and the simulated MoveBuffer."""
+    pidevice, gateway = fakedevice(funcs=funcs)
+    gateway.answers = MoveBuffer(gateway, rate)
+    points = [[float(i), -float(i)] for i in range(numrows)]
+    feeder = TrajectoryFeeder(pidevice, [1, 2], points, interval=0.001, **kwargs)
+    return feeder, gateway.answers, points
+
+
+def test_refill():
+    """The buffer is kept at the high-water mark, all rows arrive in order and the trajectories are finished."""
+    feeder, device, points = feeddevice(rate=20, numrows=1000, highwater=50)
+    feeder.run()
+    assert feeder.report == {'sent': 1000, 'underruns': 0, 'minlevel': feeder.minlevel, 'exhausted': True}
+    assert feeder.minlevel > 0
+    assert device.values[1] == [row[0] for row in points] and device.values[2] == [row[1] for row in points]
+    assert device.started and device.finished
+    assert max(device.reported) <= 50
+    assert device.reported[len(device.reported) // 2] == 50  # steady state
+
+
+def test_refill_free_space():
+    """With "#11" no more rows are appended than the free space of the buffer allows."""
+    feeder, device, _ = feeddevice(rate=5, numrows=300, highwater=50, funcs=['GetDynamicMoveBufferSize'])
+    device.size = 40
+    feeder.run()
+    assert feeder.sent == 300 and device.finished
+    assert max(device.reported) <= 20
+
+
+def test_underrun_counted():
+    """A device that consumes faster than the feeder refills runs empty, which is counted."""
+    feeder, device, _ = feeddevice(rate=30, numrows=500, highwater=10, pointspercmd=1)
+    feeder.run()
+    assert feeder.sent == 500 and device.finished
+    assert feeder.underruns > 0 and feeder.minlevel == 0
+
+
+def test_underrun_error():
+    """An error of the device, e.g. for an empty buffer, ends the background task and is raised by wait()."""
+    feeder, device, _ = feeddevice(rate=30, numrows=500, highwater=10)
+    device.strict = True
+    feeder.start()
+    with pytest.raises(GCSError) as exc:
+        feeder.wait(timeout=5)
+    assert exc.value == gcserror.E220_PI_CNTR_INTERPOLATION_FIFO_UNDERRUN
+    assert not feeder.running
+    assert feeder.sent < 500 and not device.finished
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the blocking wait for answers of the default PIGateway and of the serial port."""
+
+from threading import Timer
+from time import time
+
+import pytest
+
+from fakegateway import FakeGateway
+from pipython import GCSError, gcserror
+from pipython.gcsmessages import GCSMessages
+
+
+class LateGateway(FakeGateway):
+    """FakeGateway whose answers become available 'delay' seconds after the command has been sent."""
+
+    def __init__(self, answers, delay):
+        super(LateGateway, self).__init__(answers)
+        self.delay = delay
+        self.received = ''
+
+    def send(self, msg):
+        """Handle 'msg' and release the answers after self.delay seconds."""
+        super(LateGateway, self).send(msg)
+        answers = super(LateGateway, self).getanswer(super(LateGateway, self).answersize)
+        Timer(self.delay, self.release, args=(answers,)).start()
+
+    def release(self, answers):
+        """Make 'answers' available."""
+        self.received += answers
+
+    @property
+    def answersize(self):
+        """Get the size of the released answers as integer."""
+        return len(self.received)
+
+    def getanswer(self, bufsize):
+        """Return and remove 'bufsize' characters of the released answers."""
+        answer, self.received = self.received[:bufsize], self.received[bufsize:]
+        return answer
+
+
+def test_gateway_wait():
+    """The default wait returns as soon as an answer arrives and False after the timeout without answer."""
+    gateway = LateGateway({'POS? 1': '1=0.5\n'}, delay=0.05)
+    start = time()
+    assert not gateway.waitforanswer(0.1)
+    assert 0.1 <= time() - start < 0.5
+    gateway.send('POS? 1\n')
+    start = time()
+    assert gateway.waitforanswer(5)
+    assert time() - start < 1
+    assert gateway.getanswer(gateway.answersize) == '1=0.5\n'
+
+
+def test_query_waits_for_late_answer():
+    """A query waits for an answer that arrives later and times out with E_7 if no answer arrives."""
+    messages = GCSMessages(LateGateway({'POS? 1': '1=0.5\n'}, delay=0.05))
+    messages.timeout = 1000
+    messages.errcheck = False
+    assert messages.read('POS? 1\n') == '1=0.5\n'
+    messages.timeout = 200
+    start = time()
+    with pytest.raises(GCSError) as exc:
+        messages.read('POS? 2\n')
+    assert exc.value.val == gcserror.E_7_COM_TIMEOUT
+    assert 0.2 <= time() - start < 1
+
+
+def test_serial_wait_restores_timeout(monkeypatch):
+    """PISerial.waitforanswer() blocks on the port and restores the timeout of the port afterwards."""
+    serial = pytest.importorskip('serial')
+    from pipython.interfaces.piserial import PISerial
+    monkeypatch.setattr(serial, 'Serial', lambda port, baudrate: serial.serial_for_url('loop://', timeout=2.5))
+    with PISerial(port='loop', baudrate=115200) as gateway:
+        start = time()
+        assert not gateway.waitforanswer(0.1)
+        assert time() - start < 1
+        gateway.send(b'1=0.5\n')
+        assert gateway.waitforanswer(1)
+        assert gateway.getanswer(6) == b'1=0.5\n'
+        assert gateway._PISerial__ser.timeout == 2.5  # pylint: disable=protected-access